@@ -0,0 +1,424 @@
+import numpy as np
+from typing import Dict, Iterator, List, Tuple
+
+from src.utils import ModelParams, REPORT_FIELDS, DERIVED_FIELDS, core_fields, derive_field, short_sin, short_cos, long_sin, long_cos
+from src.simulation import Simulation
+from src.rolling import Lags
+from src.rng import market_stream
+
+
+# Reward rate tiers, same thresholds and rates as rr_framework
+RR_SUPPLY_TIERS = np.array([1_000_000, 10_000_000, 100_000_000, 1_000_000_000, 10_000_000_000, 100_000_000_000, 1_000_000_000_000], dtype=float)
+RR_TIER_RATES = np.array([0.3058 * 3 / 100, 0.1587 * 3 / 100, 0.1183 * 3 / 100, 0.0458 * 3 / 100, 0.0148 * 3 / 100, 0.0039 * 3 / 100, 0.0019 * 3 / 100, 0.0009 * 3 / 100])
+
+
+# Per-lane view of a set of ModelParams. Every lane is one trial.
+# uniforms / net_flow_shocks, when given, are (days, lanes[, 3]) arrays indexed like self.uniforms (day - 2).
+class BatchParams():
+    def __init__(self, params_list:List[ModelParams], uniforms:np.ndarray=None, net_flow_shocks:np.ndarray=None):
+        if len(params_list) == 0:
+            raise ValueError('BatchParams needs at least one ModelParams')
+
+        first = params_list[0]
+        for params in params_list:
+            if params.horizon != first.horizon:
+                raise ValueError('All the trials of a batch must share the same horizon')
+            if params.target_ma != first.target_ma or params.reinstate_window != first.reinstate_window:
+                raise ValueError('All the trials of a batch must share target_ma and reinstate_window')
+            if params.target_price_function != 'price_moving_avg':
+                raise ValueError(f'Unsupported target_price_function for batch simulations: {params.target_price_function}')
+            if params.netflow_type not in ('random', 'waves'):
+                raise ValueError(f'Unsupported netflow_type for batch simulations: {params.netflow_type}')
+
+        self.params_list = params_list
+        self.lanes = len(params_list)
+        self.horizon = first.horizon
+        self.target_ma = first.target_ma
+        self.reinstate_window = first.reinstate_window
+
+        def column(name):
+            return np.array([getattr(params, name) for params in params_list], dtype=float)
+
+        self.seed = [params.seed for params in params_list]
+        self.max_liq_ratio = column('max_liq_ratio')
+        self.min_premium_target = column('min_premium_target')
+        self.max_outflow_rate = column('max_outflow_rate')
+        self.demand_factor = column('demand_factor')
+        self.supply_factor = column('supply_factor')
+        self.lower_wall = column('lower_wall')
+        self.upper_wall = column('upper_wall')
+        self.lower_cushion = column('lower_cushion')
+        self.upper_cushion = column('upper_cushion')
+        self.bid_factor = column('bid_factor')
+        self.ask_factor = column('ask_factor')
+        self.cushion_factor = column('cushion_factor')
+        self.min_counter_reinstate = column('min_counter_reinstate')
+        self.arb_factor = column('arb_factor')
+
+        self.initial_supply = column('initial_supply')
+        self.initial_reserves = column('initial_reserves')
+        self.initial_liq_usd = column('initial_liq_usd')
+        self.initial_price = column('initial_price')
+        self.initial_target = column('initial_target')
+
+        self.without_reinstate_window = np.array([params.with_reinstate_window == 'No' for params in params_list])
+        self.with_dynamic_reward_rate = np.array([params.with_dynamic_reward_rate != 'No' for params in params_list])
+        self.waves = np.array([params.netflow_type == 'waves' for params in params_list])
+
+        # Market behavior draws: uniforms[day - 2, lane] is the (net flow, demand, supply) row of that day
+        self.uniforms = market_uniforms(params_list) if uniforms is None else uniforms
+        self.net_flow_shocks = net_flow_shocks  # what-if shocks on top of the market (see src/fork.py)
+        self.wave_factors = wave_factors(params_list) if self.waves.any() else None
+
+
+# Draws of every lane's MarketStream. Lanes sharing a stream (same seed, mode and draws per day) generate it once.
+def market_uniforms(params_list:List[ModelParams]):
+    days = params_list[0].horizon - 2
+    uniforms = np.zeros((max(days, 0), len(params_list), 3))
+    streams = {}
+    for lane, params in enumerate(params_list):
+        stream = market_stream(params)
+        key = (stream.seed, stream.mode, stream.draws_per_day)
+        if key not in streams:
+            streams[key] = stream.draws(days)
+        uniforms[:, lane] = streams[key]
+    return uniforms
+
+
+# Demand/supply wave multipliers for the 'waves' netflow type, as (short, long) pairs of (day, lane) arrays
+def wave_factors(params_list:List[ModelParams]):
+    days = range(2, params_list[0].horizon)
+    factors = np.ones((4, len(days), len(params_list)))
+    cache = {}
+    for lane, params in enumerate(params_list):
+        if params.netflow_type != 'waves':
+            continue
+        key = (params.short_cycle, params.long_cycle, params.long_sin_offset, params.long_cos_offset, params.supply_amplitude)
+        if key not in cache:
+            cache[key] = np.array([
+                [short_sin(day, params.short_cycle) for day in days],
+                [long_sin(day, params.long_cycle, params.long_sin_offset) for day in days],
+                [short_cos(day, params.short_cycle) for day in days],
+                [long_cos(day, params.long_cycle, params.long_cos_offset, params.supply_amplitude) for day in days],
+            ])
+        factors[:, :, lane] = cache[key]
+    return factors
+
+
+# Rolling state shared by the days of a batch, one lane per trial
+def batch_lags(params:BatchParams):
+    return Lags(params.target_ma, params.reinstate_window, params.initial_price, lanes=params.lanes)
+
+
+# Vectorized gOHM volatility (see calc_gohm_volatility)
+def gohm_volatility_batch(lags:Lags, lanes:int):
+    if lags.gohm_prices.count <= 7:
+        return np.zeros(lanes)
+    mean = lags.gohm_prices.mean()
+    return np.where(mean == 0, 0, lags.gohm_prices.std() / np.where(mean == 0, 1, mean))
+
+
+# Vectorized reward rate framework (controller v1)
+def rr_framework_batch(supply:np.ndarray, with_dynamic_reward_rate:np.ndarray, rr_controller:np.ndarray):
+    r = RR_TIER_RATES[np.searchsorted(RR_SUPPLY_TIERS, supply, side='right')]
+    dynamic = np.select([rr_controller == -3, rr_controller == -2, rr_controller == -1, rr_controller == 2, rr_controller == 1], [0 * r, r * (0.5), r * (0.75), r * (1.25), r * (1.125)], r)
+    return np.where(with_dynamic_reward_rate, dynamic, r)
+
+
+# `x and y or 0` over arrays
+def _guard(x:np.ndarray, y:np.ndarray):
+    return np.where(x != 0, y, 0)
+
+
+def _pow(x, y:float):
+    return np.float_power(x, y)  # matches python's float ** (libm pow) bit by bit
+
+
+# Vectorized counterpart of Day: every attribute is an array with one lane per trial
+class BatchDay():
+    def __init__(self, params:BatchParams, lags:Lags, prev_day=None):
+        with np.errstate(all='ignore'):
+            if prev_day is None:
+                self._first_day(params)
+            else:
+                self._next_day(params, lags, prev_day)
+            self._report(params, lags)
+
+    # Batch day with every lane set to the state of a single Day (Day.state()), e.g. to branch a simulation into lanes
+    @classmethod
+    def from_state(cls, state:dict, lanes:int):
+        day = cls.__new__(cls)
+        for name, value in state.items():
+            setattr(day, name, value if name == 'day' else np.full(lanes, value))
+        return day
+
+    # Derived reporting fields are computed on access, as on Day
+    def __getattr__(self, name:str):
+        if name in DERIVED_FIELDS:
+            return derive_field(name, self.__getattribute__)
+        raise AttributeError(name)
+
+    def _first_day(self, params:BatchParams):
+        zeros = np.zeros(params.lanes)
+        self.day = 1
+        self.supply = params.initial_supply.copy()
+        self.reward_rate = rr_framework_batch(self.supply, params.with_dynamic_reward_rate, np.zeros(params.lanes))
+        self.price = params.initial_price.copy()
+        self.liq_usd = params.initial_liq_usd.copy()
+        self.liq_ohm = self.liq_usd / self.price
+        self.k = _pow(self.liq_usd, 2) / self.price
+
+        self.reserves_in = zeros
+        self.reserves_out = zeros
+        self.ohm_traded = zeros
+        self.cum_ohm_purchased = zeros
+        self.cum_ohm_burnt = zeros
+        self.cum_ohm_minted = zeros
+        self.reserves = params.initial_reserves.copy()
+        self.prev_reserves = params.initial_reserves.copy()
+
+        self.ma_target = params.initial_target.copy()
+        self.lower_target_wall = self.ma_target * (1 - params.lower_wall)
+        self.upper_target_wall = self.ma_target * (1 + params.upper_wall)
+        self.lower_target_cushion = self.ma_target * (1 - params.lower_cushion)
+        self.upper_target_cushion = self.ma_target * (1 + params.upper_cushion)
+
+        self.bid_capacity_target = params.bid_factor * self.reserves
+        self.ask_capacity_target = params.ask_factor * self.reserves / self.upper_target_wall * (1 + params.lower_wall + params.upper_wall)
+        self.bid_capacity_target_cushion = self.bid_capacity_target * params.cushion_factor
+        self.ask_capacity_target_cushion = self.ask_capacity_target * params.cushion_factor
+        self.bid_capacity = self.bid_capacity_target
+        self.ask_capacity = self.ask_capacity_target
+        self.bid_capacity_cushion = self.bid_capacity_target_cushion
+        self.ask_capacity_cushion = self.ask_capacity_target_cushion
+        self.ask_change_ohm = zeros
+        self.bid_change_ohm = zeros
+
+        self.market_demand = params.demand_factor.copy()
+        self.market_supply = params.supply_factor.copy()
+        self.net_flow = zeros
+
+        self.control_bid = np.zeros(params.lanes, dtype=np.int64)
+        self.control_ask = np.zeros(params.lanes, dtype=np.int64)
+
+    def _next_day(self, params:BatchParams, lags:Lags, prev_day):
+        self.day = prev_day.day + 1
+        step = self.day - 2
+
+        # -- SUPPLY ---------------------------------------------------------------------------------------
+
+        # Reward Rate
+        rr_controller = np.select(
+            [prev_day.fmcap_treasury_ratio < 1, prev_day.price < prev_day.lower_target_wall, prev_day.price < prev_day.lower_target_cushion, prev_day.fmcap_treasury_ratio > 3, prev_day.price > prev_day.lower_target_wall],
+            [-3, -2, -1, 2, 1], 0)
+        self.reward_rate = rr_framework_batch(prev_day.supply, params.with_dynamic_reward_rate, rr_controller)
+
+        # Floating Supply Rebase
+        self.floating_supply = np.maximum(prev_day.floating_supply * (1 + self.reward_rate) + prev_day.ask_change_ohm - prev_day.bid_change_ohm, 0)
+
+
+        # -- LIQUIDITY POOL ---------------------------------------------------------------------------------
+
+        # Treasury Rebalance - Reserve Intake
+        if self.day % 7 == 0:  # Rebalance once a week
+            reserves_in = prev_day.liq_usd - prev_day.treasury * params.max_liq_ratio
+            max_outflow = (-1) * prev_day.reserves * params.max_outflow_rate
+            reserves_in = np.where(reserves_in < max_outflow, max_outflow, reserves_in)
+            self.reserves_in = np.where(reserves_in < (-1) * prev_day.reserves, (-1) * prev_day.reserves, reserves_in)
+        else:
+            self.reserves_in = np.zeros(params.lanes)
+
+        # AMM k
+        k = _pow(prev_day.liq_usd - self.reserves_in, 2) / prev_day.price
+        k = np.where(prev_day.fmcap_treasury_ratio > params.min_premium_target, k * _pow(1 + self.reward_rate, 2), k)
+        self.k = _guard(prev_day.price, k)
+
+
+        # -- RBS PRICE ---------------------------------------------------------------------------------------
+
+        # Price Target
+        self.ma_target = prev_day.ma_target if lags.prices.count == 1 else lags.moving_average()
+        self.prev_price = prev_day.price
+
+        # Walls
+        self.lower_target_wall = self.ma_target * (1 - params.lower_wall)
+        self.upper_target_wall = self.ma_target * (1 + params.upper_wall)
+
+        # Cushions
+        self.lower_target_cushion = self.ma_target * (1 - params.lower_cushion)
+        self.upper_target_cushion = self.ma_target * (1 + params.upper_cushion)
+
+        # Reinstate Window --> Inside the range counters
+        self.control_bid = lags.bid_window.push((prev_day.price > prev_day.ma_target).astype(np.int64))
+        self.control_ask = lags.ask_window.push((prev_day.price < prev_day.ma_target).astype(np.int64))
+
+
+        # -- MARKET BEHAVIOR (MODEL INPUT) ---------------------------------------------------------------------------------------
+
+        uniforms = params.uniforms[step]
+        low = prev_day.treasury * prev_day.total_supply
+        high = prev_day.treasury * prev_day.total_demand
+        self.net_flow = (low + (high - low) * uniforms[:, 0]) - (prev_day.supply * prev_day.reward_rate * prev_day.price / 10)
+
+        self.market_demand = params.demand_factor * (0.5 + 2.5 * uniforms[:, 1])
+        self.market_supply = params.supply_factor * (0.5 + 2.5 * uniforms[:, 2])
+        if params.wave_factors is not None:
+            short_demand, long_demand, short_supply, long_supply = params.wave_factors[:, step]
+            self.market_demand = np.where(params.waves, params.demand_factor * short_demand * long_demand, self.market_demand)
+            self.market_supply = np.where(params.waves, params.supply_factor * short_supply * long_supply, self.market_supply)
+
+        if params.net_flow_shocks is not None:
+            shocks = params.net_flow_shocks[step]
+            self.net_flow = np.where(shocks != 0, self.net_flow + shocks, self.net_flow)
+
+
+        # -- TREASURY MARKET OPERATIONS ---------------------------------------------------------------------------------------
+
+        # Target capacities
+        self.bid_capacity_target = params.bid_factor * prev_day.reserves
+        self.ask_capacity_target = _guard(prev_day.upper_target_wall, params.ask_factor * prev_day.reserves * (1 + 2 * params.upper_wall) / prev_day.upper_target_wall)
+        self.bid_capacity_target_cushion = self.bid_capacity_target * params.cushion_factor
+        self.ask_capacity_target_cushion = self.ask_capacity_target * params.cushion_factor
+
+        pool_usd = self.net_flow - self.reserves_in + prev_day.liq_usd
+        natural_price = _guard(self.k, _pow(pool_usd, 2) / self.k)  # Price without any treasury market operations
+
+        bid_reinstate = (self.control_bid >= params.min_counter_reinstate) | params.without_reinstate_window
+        ask_reinstate = (self.control_ask >= params.min_counter_reinstate) | params.without_reinstate_window
+
+        # BID: Real Bid Capacity - Cushion
+        bid_refill = bid_reinstate & (natural_price > self.lower_target_cushion)
+        bid_capacity_cushion = np.where(bid_refill, self.bid_capacity_target_cushion,
+                               np.where((natural_price < self.lower_target_cushion) & (natural_price >= self.lower_target_wall),
+                                        prev_day.bid_capacity_cushion + self.net_flow - self.reserves_in + prev_day.liq_usd - _pow(self.k * self.lower_target_cushion, (1/2)),
+                                        prev_day.bid_capacity_cushion))
+        bid_capacity_cushion = np.where(bid_capacity_cushion < 0, 0, np.where(bid_capacity_cushion > self.bid_capacity_target_cushion, self.bid_capacity_target_cushion, bid_capacity_cushion))
+
+        # BID: Effective Bid Capacity Changes - Cushion
+        bid_cushion_used = (natural_price <= self.lower_target_cushion) & (natural_price > self.lower_target_wall)
+        self.bid_change_cushion_usd = np.where(bid_cushion_used, prev_day.bid_capacity_cushion - bid_capacity_cushion, 0)
+        self.bid_change_cushion_ohm = np.where(bid_cushion_used, _guard(self.lower_target_cushion, (prev_day.bid_capacity_cushion - bid_capacity_cushion) / self.lower_target_cushion), 0)
+
+        exceeded = self.bid_change_cushion_ohm > prev_day.bid_capacity_cushion  # Ensure that change is smaller than capacity left
+        self.bid_change_cushion_usd = np.where(exceeded, prev_day.bid_capacity_cushion, self.bid_change_cushion_usd)
+        self.bid_change_cushion_ohm = np.where(exceeded, _guard(self.lower_target_cushion, prev_day.bid_capacity_cushion / self.lower_target_cushion), self.bid_change_cushion_ohm)
+
+        # BID: Real Bid Capacity - Totals
+        bid_capacity = np.where(bid_refill, self.bid_capacity_target,
+                       np.where(natural_price < self.lower_target_wall,
+                                prev_day.bid_capacity + self.net_flow - self.reserves_in + prev_day.liq_usd - _pow(self.k * self.lower_target_wall, (1/2)),
+                                prev_day.bid_capacity - self.bid_change_cushion_usd))
+        self.bid_capacity = np.where(bid_capacity < 0, 0, np.where(bid_capacity > self.bid_capacity_target, self.bid_capacity_target, bid_capacity))
+        self.bid_capacity_cushion = np.where(bid_capacity_cushion > self.bid_capacity, self.bid_capacity, bid_capacity_cushion)
+
+        # BID: Effective Bid Capacity Changes - Totals
+        wall_unused = natural_price >= self.lower_target_wall  # If wall wasn't used, update with cushion
+        self.bid_change_usd = np.where(wall_unused, self.bid_change_cushion_usd, prev_day.bid_capacity - self.bid_capacity)
+        self.bid_change_ohm = np.where(wall_unused, self.bid_change_cushion_ohm, _guard(self.lower_target_wall, self.bid_change_cushion_ohm + (prev_day.bid_capacity - self.bid_capacity - self.bid_change_cushion_usd) / self.lower_target_wall))
+
+        exceeded = self.bid_change_usd > prev_day.bid_capacity  # Ensure that change is smaller than capacity left
+        self.bid_change_usd = np.where(exceeded, prev_day.bid_capacity, self.bid_change_usd)
+        self.bid_change_ohm = np.where(exceeded, _guard(self.lower_target_wall, prev_day.bid_capacity / self.lower_target_wall), self.bid_change_ohm)
+
+
+        # ASK: Real Ask Capacity - Cushion
+        ask_refill = ask_reinstate & (natural_price < self.upper_target_cushion)
+        ask_cushion_used = (natural_price > self.upper_target_cushion) & (natural_price <= self.upper_target_wall)
+        ask_capacity_cushion = np.where(ask_refill, self.ask_capacity_target_cushion,
+                               np.where(ask_cushion_used,
+                                        _guard(self.upper_target_cushion, prev_day.ask_capacity_cushion - pool_usd / self.upper_target_cushion + _pow(self.k / self.upper_target_cushion, (1/2))),
+                                        prev_day.ask_capacity_cushion))
+        ask_capacity_cushion = np.where(ask_capacity_cushion < 0, 0, np.where(ask_capacity_cushion > self.ask_capacity_target_cushion, self.ask_capacity_target_cushion, ask_capacity_cushion))
+
+        # ASK: Effective Ask Capacity Changes - Cushion
+        self.ask_change_cushion_ohm = np.where(ask_cushion_used, prev_day.ask_capacity_cushion - ask_capacity_cushion, 0)
+        self.ask_change_cushion_usd = np.where(ask_cushion_used, self.upper_target_cushion * (prev_day.ask_capacity_cushion - ask_capacity_cushion), 0)
+
+        exceeded = self.ask_change_cushion_ohm > prev_day.ask_capacity_cushion  # ensure that change is smaller than capacity left
+        self.ask_change_cushion_ohm = np.where(exceeded, prev_day.ask_capacity_cushion, self.ask_change_cushion_ohm)
+        self.ask_change_cushion_usd = np.where(exceeded, prev_day.ask_capacity_cushion * self.upper_target_cushion, self.ask_change_cushion_usd)
+
+        # ASK: Real Ask Capacity - Totals
+        ask_capacity = np.where(ask_refill, self.ask_capacity_target,
+                       np.where(natural_price > self.upper_target_wall,
+                                _guard(self.upper_target_wall, prev_day.ask_capacity - pool_usd / self.upper_target_wall + _pow(self.k / self.upper_target_wall, (1/2))),
+                                prev_day.ask_capacity - self.ask_change_cushion_ohm))  # update capacity total to account for the cushion
+        self.ask_capacity = np.where(ask_capacity < 0, 0, np.where(ask_capacity > self.ask_capacity_target, self.ask_capacity_target, ask_capacity))
+        self.ask_capacity_cushion = np.where(ask_capacity_cushion > self.ask_capacity, self.ask_capacity, ask_capacity_cushion)
+
+        # ASK: Effective Ask Capacity Changes - Totals
+        wall_unused = natural_price <= self.upper_target_wall  # if wall wasn't used, update with cushion
+        self.ask_change_ohm = np.where(wall_unused, self.ask_change_cushion_ohm, prev_day.ask_capacity - self.ask_capacity)
+        self.ask_change_usd = np.where(wall_unused, self.ask_change_cushion_usd, self.ask_change_cushion_usd + (prev_day.ask_capacity - self.ask_capacity - self.ask_change_cushion_ohm) * self.upper_target_wall)
+
+        exceeded = self.ask_change_ohm > prev_day.ask_capacity  # ensure that change is smaller than capacity left
+        self.ask_change_ohm = np.where(exceeded, prev_day.ask_capacity, self.ask_change_ohm)
+        self.ask_change_usd = np.where(exceeded, prev_day.ask_capacity * self.upper_target_wall, self.ask_change_usd)
+
+
+        # -- TREASURY ---------------------------------------------------------------------------------------
+
+        # Liquidity
+        self.liq_usd = np.maximum(prev_day.liq_usd + self.net_flow - self.reserves_in + self.bid_change_usd - self.ask_change_usd, 0)
+        self.liq_ohm = _guard(self.liq_usd, self.k / self.liq_usd)  # ensure that if liq_usd is 0 then liq_ohm is 0 as well
+        self.price = _guard(self.liq_ohm, self.liq_usd / self.liq_ohm)  # ensure that if liq_ohm is 0 then price is 0 as well
+
+        # Reserves
+        self.reserves_out = self.liq_usd - prev_day.liq_usd - self.net_flow - self.reserves_in
+        self.reserves = np.maximum(prev_day.reserves - self.reserves_out, 0)
+        self.prev_reserves = prev_day.reserves
+
+        self.ohm_traded = _guard(self.price + prev_day.price, (-2) * self.reserves_out / (self.price + prev_day.price))
+        self.cum_ohm_purchased = prev_day.cum_ohm_purchased - self.ohm_traded
+        self.cum_ohm_burnt = prev_day.cum_ohm_burnt + prev_day.bid_change_ohm
+        self.cum_ohm_minted = prev_day.cum_ohm_minted + prev_day.ask_change_ohm
+
+    def _report(self, params:BatchParams, lags:Lags):
+
+        # -- PROTOCOL VARIABLES (FOR REPORTING) ---------------------------------------------------------------------------------------
+
+        if self.day == 1:
+            self.floating_supply = self.supply - self.liq_ohm
+        else:
+            self.supply = self.floating_supply + self.liq_ohm
+
+        self.treasury = self.liq_usd + self.reserves
+        self.fmcap_treasury_ratio = _guard(self.treasury, self.floating_supply * self.price / self.treasury)
+
+        self.total_demand = self.market_demand
+        self.total_supply = self.market_supply
+
+        lags.push(self.price, self.price * (1 + self.reward_rate))
+        self.gohm_volatility = gohm_volatility_batch(lags, params.lanes)
+
+
+# Step a batch of trials one day at a time (days 1 to horizon - 1). Only the previous BatchDay is kept alive.
+def simulate_batch_iter(params_list:List[ModelParams]) -> Iterator[BatchDay]:
+    return step_batch(BatchParams(params_list))
+
+
+# Steps from prev_day (day 1 when it is None) to the horizon
+def step_batch(params:BatchParams, lags:Lags=None, prev_day:BatchDay=None) -> Iterator[BatchDay]:
+    lags = batch_lags(params) if lags is None else lags
+    day = prev_day
+    for i in range(0 if day is None else day.day, max(params.horizon - 1, 1)):
+        day = BatchDay(params=params, lags=lags, prev_day=day)
+        yield day
+
+
+# Reported fields of the days stepped by `days`, one Simulation per lane, all of them views over a single (fields, lanes, days) block
+def collect_batch(days:Iterator[BatchDay], params:BatchParams, fields:Tuple[str, ...]=REPORT_FIELDS, first_day:int=1) -> List[Simulation]:
+    fields = core_fields(fields)
+    out = np.empty((len(fields), max(max(params.horizon - 1, 1) - first_day + 1, 0), params.lanes))
+    for i, day in enumerate(days):
+        for j, field in enumerate(fields):
+            out[j, i] = getattr(day, field)
+
+    out = np.ascontiguousarray(out.transpose(0, 2, 1))
+    return [Simulation(out[:, lane, :], fields, first_day) for lane in range(params.lanes)]
+
+
+# Simulate a batch of trials at once. Returns one Simulation per trial.
+def simulate_batch(params_list:List[ModelParams], fields:Tuple[str, ...]=REPORT_FIELDS) -> List[Simulation]:
+    params = BatchParams(params_list)
+    return collect_batch(step_batch(params), params, fields)
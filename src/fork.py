@@ -0,0 +1,88 @@
+import numpy as np
+from typing import Dict, List, Tuple
+
+from src.utils import ModelParams, REPORT_FIELDS
+from src.rolling import Lags
+from src.rng import MarketStream
+from src.simulation import Simulation, SimulationRun
+from src.batch import BatchParams, BatchDay, step_batch, collect_batch
+
+
+# Params that are baked into the state at the fork day (rolling windows, random stream, initial values), so a branch can't change them
+FORK_FIXED_PARAMS = ('seed', 'random_stream', 'netflow_type', 'horizon', 'target_ma', 'target_price_function', 'reinstate_window',
+                     'initial_supply', 'initial_reserves', 'initial_liq_usd', 'initial_price', 'initial_target')
+
+
+# What-if branch of a forked simulation, applied from the day after the fork:
+#  - params: ModelParams overrides, e.g. {'lower_wall': 0.3}
+#  - net_flow_shocks: {day: extra net flow}, e.g. {fork.day + 1: -5_000_000} for a large outflow or a liquidity pull
+class Variant():
+    def __init__(self, params:Dict[str, object]=None, net_flow_shocks:Dict[int, float]=None, name:str=None):
+        self.params = params or {}
+        self.net_flow_shocks = net_flow_shocks or {}
+        self.name = name
+
+        fixed = [name for name in self.params if name in FORK_FIXED_PARAMS]
+        if fixed:
+            raise ValueError(f'Params fixed at the fork day cannot change in a branch: {fixed}')
+
+
+# A simulation run once up to `day`. Its state is shared by all the branches, and every branch only copies it
+# (O(window) values) when it starts stepping: the shared prefix is never simulated again.
+class Fork():
+    def __init__(self, params:ModelParams, day:int, historical_net_flows:List[float]=None, fields:Tuple[str, ...]=REPORT_FIELDS):
+        run = SimulationRun(params, historical_net_flows)
+        self.params = params
+        self.historical_net_flows = historical_net_flows
+        self.fields = fields
+        self.prefix = run.simulate(fields, until=day)  # days 1..day, shared by every branch
+        self.day = run.day
+        self.state = run.snapshot()
+
+    def variant_params(self, variant:Variant) -> ModelParams:
+        return ModelParams(**{**vars(self.params), **variant.params})
+
+    # Days after the fork for every variant, as Simulations starting at fork.day + 1 (fork.prefix.extend(branch) is the full trajectory).
+    # Branches are stepped as one batch when the batch engine supports the scenario, one by one otherwise.
+    def branch(self, variants:List[Variant], batch:bool=True) -> List[Simulation]:
+        params_list = [self.variant_params(variant) for variant in variants]
+        if batch and self.batchable():
+            return self._branch_batch(variants, params_list)
+        return [SimulationRun.from_snapshot(self.state, historical_net_flows=self.historical_net_flows, params=params, net_flow_shocks=variant.net_flow_shocks).simulate(self.fields)
+                for variant, params in zip(variants, params_list)]
+
+    def batchable(self) -> bool:
+        return (self.historical_net_flows is None and self.state['day'] is not None and self.params.netflow_type in ('random', 'waves')
+                and self.params.target_price_function == 'price_moving_avg')
+
+    def _branch_batch(self, variants:List[Variant], params_list:List[ModelParams]) -> List[Simulation]:
+        lanes = len(variants)
+        days = max(self.params.horizon - 2, 0)  # rows of day 2..horizon-1, indexed by day - 2
+
+        # Every branch continues the same random stream from the fork day
+        draws = list(self.state['draws'])
+        needed = days - (self.day - 1)
+        if needed > len(draws):
+            draws.extend(MarketStream.from_state(self.state['stream']).draws(needed - len(draws)).tolist())
+        uniforms = np.zeros((days, lanes, 3))
+        if needed > 0:
+            uniforms[self.day - 1:] = np.asarray(draws[:needed])[:, None, :]
+
+        shocks = None
+        if any(variant.net_flow_shocks for variant in variants):
+            shocks = np.zeros((days, lanes))
+            for lane, variant in enumerate(variants):
+                for day, shock in variant.net_flow_shocks.items():
+                    if self.day < day <= days + 1:
+                        shocks[day - 2, lane] += shock
+
+        params = BatchParams(params_list, uniforms=uniforms, net_flow_shocks=shocks)
+        lags = Lags.from_state(self.state['lags'], lanes)
+        prev_day = BatchDay.from_state(self.state['day'], lanes)
+        return collect_batch(step_batch(params, lags, prev_day), params, self.fields, first_day=self.day + 1)
+
+
+# Run `params` up to `day` once and branch it into `variants`
+def fork(params:ModelParams, day:int, variants:List[Variant], historical_net_flows:List[float]=None, fields:Tuple[str, ...]=REPORT_FIELDS, batch:bool=True) -> Tuple[Simulation, List[Simulation]]:
+    shared = Fork(params, day, historical_net_flows, fields)
+    return shared.prefix, shared.branch(variants, batch)
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+from typing import TYPE_CHECKING, Dict
+
+if TYPE_CHECKING:  # annotations only, the code imports them lazily
+    import pandas as pd
+    import pyarrow as pa
+
+
+# Columns of a frame laid out in one shared memory segment, so a worker process hands rows to the runner without pickling them:
+# the worker creates the segment and fills the columns in place, and only this descriptor (segment name, row count, dtypes,
+# categories) goes through the pool's result pipe. The runner maps the same segment and reads the columns as they are.
+# Categorical columns (the trial keys of the daily rows) are stored as int32 codes into `categories`.
+class SharedFrame():
+    ALIGNMENT = 64
+
+    def __init__(self, rows:int, dtypes:Dict[str, str], categories:Dict[str, list]=None):
+        self.rows = rows
+        self.dtypes = dict(dtypes)
+        self.categories = {column: list(values) for column, values in (categories or {}).items()}
+        for column in self.categories:
+            self.dtypes[column] = 'int32'
+        self.offsets = {}
+        size = 0
+        for column, dtype in self.dtypes.items():
+            self.offsets[column] = size
+            size += -(-rows * np.dtype(dtype).itemsize // self.ALIGNMENT) * self.ALIGNMENT
+        self.segment = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.name = self.segment.name
+
+    # Writable view of a column in the segment
+    def column(self, column:str) -> np.ndarray:
+        return np.ndarray(self.rows, dtype=self.dtypes[column], buffer=self.segment.buf, offset=self.offsets[column])
+
+    # DataFrame over the segment: numeric columns are views, categorical columns are looked up (one object pointer per row).
+    # It is only valid until release().
+    def frame(self) -> pd.DataFrame:
+        import pandas as pd  # only the runner builds frames: workers fill the columns
+        columns = {}
+        for column in self.dtypes:
+            values = self.column(column)
+            if column in self.categories:
+                values = np.asarray(self.categories[column], dtype=object)[values]
+            columns[column] = values
+        return pd.DataFrame(columns, copy=False)
+
+    # pyarrow Table over the segment: numeric columns are wrapped without a copy and categorical columns stay dictionary-encoded,
+    # so no Python object is created per row. Also only valid until release().
+    def table(self) -> pa.Table:
+        import pyarrow as pa
+        columns = {}
+        for column in self.dtypes:
+            values = pa.array(self.column(column))
+            if column in self.categories:
+                values = pa.DictionaryArray.from_arrays(values, pa.array(self.categories[column], type=pa.string()))
+            columns[column] = values
+        return pa.table(columns)
+
+    # Free the segment once its rows are consumed
+    def release(self):
+        self.segment.unlink()
+        try:
+            self.segment.close()
+        except BufferError:
+            pass  # a view of the rows is still alive: the mapping goes away with it
+
+    def __len__(self):
+        return self.rows
+
+    def __getstate__(self):
+        return {key: value for key, value in vars(self).items() if key != 'segment'}
+
+    def __setstate__(self, state:dict):
+        vars(self).update(state)
+        self.segment = shared_memory.SharedMemory(self.name)  # registered again with the tracker shared with the workers: a no-op
+
+
+# Rows of a worker output, whether handed over through shared memory, as plain columns ({column: values}, small outputs)
+# or as a frame
+def output_frame(output) -> pd.DataFrame:
+    if isinstance(output, SharedFrame):
+        return output.frame()
+    if isinstance(output, dict):
+        import pandas as pd
+        return pd.DataFrame(output)
+    return output
+
+
+# Bytes of the rows of a worker output
+def output_nbytes(output) -> int:
+    if isinstance(output, SharedFrame):
+        return output.segment.size
+    if isinstance(output, dict):
+        return sum(np.asarray(values).nbytes for values in output.values())
+    return int(output.memory_usage(index=False).sum())
+
+
+# Rows of a worker output as a pyarrow Table
+def output_table(output) -> pa.Table:
+    import pyarrow as pa
+    if isinstance(output, SharedFrame):
+        return output.table()
+    if isinstance(output, dict):
+        return pa.table(output)
+    if isinstance(output, pa.Table):
+        return output
+    return pa.Table.from_pandas(output, preserve_index=False)
+
+
+# Rows of a worker output in the form a sink encodes: a pyarrow Table for the sinks with `arrow = True`, a DataFrame otherwise
+def sink_rows(sink, output):
+    return output_table(output) if getattr(sink, 'arrow', False) else output_frame(output)
+
+
+def release_output(output):
+    if isinstance(output, SharedFrame):
+        output.release()
+
+
+# Start the resource tracker before the pool forks its workers, so they register their segments with the same tracker
+# the runner unregisters them from
+def share_with_workers():
+    resource_tracker.ensure_running()
@@ -1,4 +1,3 @@
-import pandas as pd
 import json
 import math
 from typing import Dict, List, Tuple
@@ -7,6 +6,7 @@ from typing import Dict, List, Tuple
 def initial_params(netflow_type:str, netflow_data:str=None, initial_date:str=None, initial_supply:float=None, initial_reserves:float=None, initial_liq_usd:float=None, initial_price:float=None, initial_target:float=None):
     if netflow_type == 'historical':
         if initial_date is not None:
+            import pandas as pd  # only the data-driven net flows read files: simulation workers start without it
             historical_df = pd.read_csv('data/historical_ohm_data.csv', usecols= ['date','net_flows', 'price', 'supply','liquidity','reserves'])
             initial_index = historical_df[historical_df == initial_date]['date'].dropna().index[0]
             historical_net_flows = historical_df[historical_df.index >= initial_index]['net_flows'].tolist()
@@ -16,6 +16,7 @@ def initial_params(netflow_type:str, netflow_data:str=None, initial_date:str=Non
             return netflow_type, historical_net_flows, price, target, supply, reserves, liq_usd
 
     elif netflow_type == 'enforced':
+            import pandas as pd
             f = open(f'./data/sim-vs-testnet/sim-results-{netflow_data}.json')
             data = json.load(f)
             df = pd.json_normalize(data)
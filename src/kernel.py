@@ -0,0 +1,534 @@
+import math
+import ctypes
+import ctypes.util
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from src.utils import ModelParams, REPORT_FIELDS
+from src.rng import market_draws
+from src.simulation import Simulation, simulation_days
+
+
+# Compiled day update. The whole trial runs inside one numba function with nogil=True, so several threads can step trials in parallel.
+# The compiled code is cached on disk (cache=True): it goes to src/__pycache__, or to $NUMBA_CACHE_DIR when it is set, so the
+# sweep workers load it instead of compiling it again. Without numba the same functions run as plain Python.
+try:
+    from numba import njit, types
+    from numba.core import cgutils
+    from numba.extending import intrinsic
+    from llvmlite import ir
+    import llvmlite.binding as llvm
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
+
+def _pow(x, y):
+    return x ** y
+
+
+# LLVM rewrites pow(x, 2.0) as x * x and pow(x, 0.5) as sqrt(x), which don't always round like the libm pow behind python's **.
+# The kernel calls libm pow under a symbol name LLVM doesn't know, so it stays bit-identical to Day and the cache keeps working
+# (the symbol is resolved by name when a cached kernel is loaded).
+if HAVE_NUMBA:
+    _libm = ctypes.CDLL(ctypes.util.find_library('m') or ctypes.util.find_library('c'))
+    llvm.add_symbol('liquidity_olympus_pow', ctypes.cast(_libm.pow, ctypes.c_void_p).value)
+
+    @intrinsic
+    def _pow(typingctx, x, y):
+        def codegen(context, builder, signature, args):
+            fnty = ir.FunctionType(ir.DoubleType(), [ir.DoubleType(), ir.DoubleType()])
+            fn = cgutils.get_or_insert_function(builder.module, fnty, 'liquidity_olympus_pow')
+            return builder.call(fn, [context.cast(builder, arg, ty, types.float64) for arg, ty in zip(args, signature.args)])
+        return types.float64(x, y), codegen
+
+
+# Order of the rows written by run_trial. Same as REPORT_FIELDS.
+KERNEL_FIELDS = REPORT_FIELDS
+
+# Float params of a trial, packed in this order by pack_params
+KERNEL_PARAMS = ('initial_supply', 'initial_price', 'initial_liq_usd', 'initial_reserves', 'initial_target', 'lower_wall', 'upper_wall', 'lower_cushion', 'upper_cushion',
+                 'bid_factor', 'ask_factor', 'cushion_factor', 'demand_factor', 'supply_factor', 'max_liq_ratio', 'max_outflow_rate', 'min_premium_target', 'min_counter_reinstate',
+                 'target_ma', 'short_cycle', 'long_cycle', 'long_sin_offset', 'long_cos_offset', 'supply_amplitude')
+
+TARGET_FUNCTIONS = {'price_moving_avg': 0, 'price_cycle_avg': 1}
+MARKET_RANDOM, MARKET_WAVES, MARKET_FLOWS = 0, 1, 2
+
+
+# Same tiers and controller as rr_framework (v1)
+@njit(nogil=True, cache=True)
+def _reward_rate(supply, with_dynamic_reward_rate, rr_controller):
+    if supply < 1_000_000:
+        r = 0.3058 * 3 / 100
+    elif supply < 10_000_000:
+        r = 0.1587 * 3 / 100
+    elif supply < 100_000_000:
+        r = 0.1183 * 3 / 100
+    elif supply < 1_000_000_000:
+        r = 0.0458 * 3 / 100
+    elif supply < 10_000_000_000:
+        r = 0.0148 * 3 / 100
+    elif supply < 100_000_000_000:
+        r = 0.0039 * 3 / 100
+    elif supply < 1_000_000_000_000:
+        r = 0.0019 * 3 / 100
+    else:
+        r = 0.0009 * 3 / 100
+
+    if not with_dynamic_reward_rate:
+        return r
+    if rr_controller == -3:  # below backing
+        return 0.0
+    elif rr_controller == -2:  # below wall
+        return r * (0.5)
+    elif rr_controller == -1:  # below cushion
+        return r * (0.75)
+    elif rr_controller == 2:  # above premium of 3
+        return r * (1.25)
+    elif rr_controller == 1:  # above wall
+        return r * (1.125)
+    return r
+
+
+# max(x, 0) with the semantics of the python builtin
+@njit(nogil=True, cache=True)
+def _max0(x):
+    return 0.0 if 0.0 > x else x
+
+
+# Runs a whole trial and writes one column per day into out (KERNEL_FIELDS rows).
+#  p: float params (KERNEL_PARAMS order). draws[d - 2]: (net flow, demand, supply) uniforms of day d. flows[d - 1]: net flow of day d (MARKET_FLOWS).
+#  price_window / reinstate_window: sizes of the rolling windows, as in initial_lags.
+@njit(nogil=True, cache=True)
+def run_trial(p, target_function, market, without_reinstate_window, with_dynamic_reward_rate, reinstate_window, price_window, draws, flows, out):
+    initial_supply, initial_price, initial_liq_usd, initial_reserves, initial_target = p[0], p[1], p[2], p[3], p[4]
+    lower_wall, upper_wall, lower_cushion, upper_cushion = p[5], p[6], p[7], p[8]
+    bid_factor, ask_factor, cushion_factor, demand_factor, supply_factor = p[9], p[10], p[11], p[12], p[13]
+    max_liq_ratio, max_outflow_rate, min_premium_target, min_counter_reinstate = p[14], p[15], p[16], p[17]
+    target_ma, short_cycle, long_cycle, long_sin_offset, long_cos_offset, supply_amplitude = p[18], p[19], p[20], p[21], p[22], p[23]
+    days = out.shape[1]
+
+    # Rolling windows (see src/rolling.py)
+    prices = np.zeros(price_window)
+    gohm_prices = np.zeros(6)
+    window = max(reinstate_window, 1)
+    bid_bits = np.zeros(window, dtype=np.int64)
+    ask_bits = np.zeros(window, dtype=np.int64)
+    control_bid = 0
+    control_ask = 0
+
+    # -- DAY 1 ---------------------------------------------------------------------------------------
+    day = 1
+    supply = initial_supply
+    reward_rate = _reward_rate(supply, with_dynamic_reward_rate, 0)
+    price = initial_price
+    liq_usd = initial_liq_usd
+    liq_ohm = liq_usd / price
+    k = _pow(liq_usd, 2.0) / price
+
+    reserves_in = 0.0
+    reserves_out = 0.0
+    ohm_traded = 0.0
+    cum_ohm_purchased = 0.0
+    cum_ohm_burnt = 0.0
+    cum_ohm_minted = 0.0
+    reserves = initial_reserves
+    prev_reserves = initial_reserves
+
+    ma_target = initial_target
+    lower_target_wall = ma_target * (1 - lower_wall)
+    upper_target_wall = ma_target * (1 + upper_wall)
+    lower_target_cushion = ma_target * (1 - lower_cushion)
+    upper_target_cushion = ma_target * (1 + upper_cushion)
+
+    bid_capacity_target = bid_factor * reserves
+    ask_capacity_target = ask_factor * reserves / upper_target_wall * (1 + lower_wall + upper_wall)
+    bid_capacity_target_cushion = bid_capacity_target * cushion_factor
+    ask_capacity_target_cushion = ask_capacity_target * cushion_factor
+    bid_capacity = bid_capacity_target
+    ask_capacity = ask_capacity_target
+    bid_capacity_cushion = bid_capacity_target_cushion
+    ask_capacity_cushion = ask_capacity_target_cushion
+    ask_change_ohm = 0.0
+    bid_change_ohm = 0.0
+
+    market_demand = demand_factor
+    market_supply = supply_factor
+    net_flow = 0.0
+    floating_supply = supply - liq_ohm
+    treasury = fmcap_treasury_ratio = total_demand = total_supply = 0.0  # set by the reporting section of day 1
+
+    for i in range(days):
+        if i > 0:
+            p_day, p_price, p_supply, p_floating_supply, p_reward_rate = day, price, supply, floating_supply, reward_rate
+            p_liq_usd, p_reserves, p_treasury, p_fmcap_treasury_ratio = liq_usd, reserves, treasury, fmcap_treasury_ratio
+            p_ma_target, p_lower_target_wall, p_upper_target_wall, p_lower_target_cushion = ma_target, lower_target_wall, upper_target_wall, lower_target_cushion
+            p_total_demand, p_total_supply = total_demand, total_supply
+            p_bid_capacity, p_bid_capacity_cushion, p_ask_capacity, p_ask_capacity_cushion = bid_capacity, bid_capacity_cushion, ask_capacity, ask_capacity_cushion
+            p_bid_change_ohm, p_ask_change_ohm = bid_change_ohm, ask_change_ohm
+            p_cum_ohm_purchased, p_cum_ohm_burnt, p_cum_ohm_minted = cum_ohm_purchased, cum_ohm_burnt, cum_ohm_minted
+            day = p_day + 1
+
+            # -- SUPPLY ---------------------------------------------------------------------------------------
+
+            if p_fmcap_treasury_ratio < 1:  # below backing
+                reward_rate = _reward_rate(p_supply, with_dynamic_reward_rate, -3)
+            elif p_price < p_lower_target_wall:  # below wall
+                reward_rate = _reward_rate(p_supply, with_dynamic_reward_rate, -2)
+            elif p_price < p_lower_target_cushion:  # below cushion
+                reward_rate = _reward_rate(p_supply, with_dynamic_reward_rate, -1)
+            elif p_fmcap_treasury_ratio > 3:  # above 3x premium
+                reward_rate = _reward_rate(p_supply, with_dynamic_reward_rate, 2)
+            elif p_price > p_lower_target_wall:  # above wall
+                reward_rate = _reward_rate(p_supply, with_dynamic_reward_rate, 1)
+            else:  # inside the range
+                reward_rate = _reward_rate(p_supply, with_dynamic_reward_rate, 0)
+
+            floating_supply = _max0(p_floating_supply * (1 + reward_rate) + p_ask_change_ohm - p_bid_change_ohm)
+
+            # -- LIQUIDITY POOL ---------------------------------------------------------------------------------
+
+            if day % 7 == 0:  # Rebalance once a week
+                reserves_in = p_liq_usd - p_treasury * max_liq_ratio
+                max_outflow = (-1) * p_reserves * max_outflow_rate
+                if reserves_in < max_outflow:
+                    reserves_in = max_outflow
+                if reserves_in < (-1) * p_reserves:
+                    reserves_in = (-1) * p_reserves
+            else:
+                reserves_in = 0.0
+
+            if p_fmcap_treasury_ratio > min_premium_target:
+                k = (_pow(p_liq_usd - reserves_in, 2.0) / p_price) * _pow(1 + reward_rate, 2.0) if p_price != 0 else 0.0
+            else:
+                k = (_pow(p_liq_usd - reserves_in, 2.0) / p_price) if p_price != 0 else 0.0
+
+            # -- RBS PRICE ---------------------------------------------------------------------------------------
+
+            count = day - 1  # prices pushed so far
+            if target_function == 0:
+                if count == 1:
+                    ma_target = p_ma_target
+                else:
+                    lag_days = count - 1
+                    days_ma = int(target_ma)
+                    if lag_days > target_ma:
+                        s = 0.0
+                        for j in range(count - 1 - days_ma, count - 1):
+                            s = s + prices[j % price_window]
+                        ma_target = s / days_ma
+                    else:
+                        s = 0.0
+                        for j in range(count - 1 - lag_days, count - 1):
+                            s = s + prices[j % price_window]
+                        ma_target = (s + initial_price * (target_ma - lag_days)) / target_ma
+            else:
+                ma_target = p_ma_target
+                if p_day % (short_cycle) == 0 and count - 1 > short_cycle:
+                    days_reweight = int(short_cycle)
+                    s = 0.0
+                    for j in range(count - 2 - days_reweight, count - 2):
+                        s = s + prices[j % price_window]
+                    ma_target = s / days_reweight
+
+            lower_target_wall = ma_target * (1 - lower_wall)
+            upper_target_wall = ma_target * (1 + upper_wall)
+            lower_target_cushion = ma_target * (1 - lower_cushion)
+            upper_target_cushion = ma_target * (1 + upper_cushion)
+
+            # Reinstate Window --> Inside the range counters
+            slot = (i - 1) % window
+            bit = 1 if p_price > p_ma_target else 0
+            control_bid = control_bid + bit - bid_bits[slot]
+            bid_bits[slot] = bit
+            bit = 1 if p_price < p_ma_target else 0
+            control_ask = control_ask + bit - ask_bits[slot]
+            ask_bits[slot] = bit
+
+            # -- MARKET BEHAVIOR (MODEL INPUT) ---------------------------------------------------------------------------------------
+
+            if market == MARKET_FLOWS:
+                net_flow = flows[i]
+                market_demand = 0.0
+                market_supply = 0.0
+            else:
+                low = p_treasury * p_total_supply
+                high = p_treasury * p_total_demand
+                net_flow = (low + (high - low) * draws[i - 1, 0]) - (p_supply * p_reward_rate * p_price / 10)
+                if market == MARKET_WAVES:
+                    short_sin = 1.5 + (0.5 * math.sin((day + 1.5 * short_cycle) / (short_cycle / (2*math.pi))))
+                    long_sin = 1 + (0.5 * math.sin(((day + long_cycle * long_sin_offset) % long_cycle) / (long_cycle / (2*math.pi)))) * (10 - (day / long_cycle)) / 10
+                    short_cos = 1.55 + (0.5 * math.cos((day + 0.5 * short_cycle) / (short_cycle / (2*math.pi))))
+                    long_cos = supply_amplitude * (1 + (0.5 * math.cos(((day + 2 * long_cycle * long_cos_offset) % (2 * long_cycle)) / (long_cycle / math.pi))) * (10 - (day / (2 * long_cycle))) / 10 )
+                    market_demand = demand_factor * short_sin * long_sin
+                    market_supply = supply_factor * short_cos * long_cos
+                else:
+                    market_demand = demand_factor * (0.5 + 2.5 * draws[i - 1, 1])
+                    market_supply = supply_factor * (0.5 + 2.5 * draws[i - 1, 2])
+
+            # -- TREASURY MARKET OPERATIONS ---------------------------------------------------------------------------------------
+
+            bid_capacity_target = bid_factor * p_reserves
+            ask_capacity_target = ask_factor * p_reserves * (1 + 2 * upper_wall) / p_upper_target_wall if p_upper_target_wall != 0 else 0.0
+            bid_capacity_target_cushion = bid_capacity_target * cushion_factor
+            ask_capacity_target_cushion = ask_capacity_target * cushion_factor
+
+            natural_price = _pow(net_flow - reserves_in + p_liq_usd, 2.0) / k if k != 0 else 0.0
+            bid_reinstated = control_bid >= min_counter_reinstate or without_reinstate_window
+            ask_reinstated = control_ask >= min_counter_reinstate or without_reinstate_window
+
+            # BID: Real Bid Capacity - Cushion
+            if bid_reinstated and natural_price > lower_target_cushion:
+                bid_capacity_cushion = bid_capacity_target_cushion
+            elif natural_price < lower_target_cushion and natural_price >= lower_target_wall:
+                bid_capacity_cushion = p_bid_capacity_cushion + net_flow - reserves_in + p_liq_usd - _pow(k * lower_target_cushion, 0.5)
+            else:
+                bid_capacity_cushion = p_bid_capacity_cushion
+
+            if bid_capacity_cushion < 0:
+                bid_capacity_cushion = 0.0
+            elif bid_capacity_cushion > bid_capacity_target_cushion:
+                bid_capacity_cushion = bid_capacity_target_cushion
+
+            # BID: Effective Bid Capacity Changes - Cushion
+            if natural_price <= lower_target_cushion and natural_price > lower_target_wall:
+                bid_change_cushion_usd = p_bid_capacity_cushion - bid_capacity_cushion
+                bid_change_cushion_ohm = (p_bid_capacity_cushion - bid_capacity_cushion) / lower_target_cushion if lower_target_cushion != 0 else 0.0
+            else:
+                bid_change_cushion_usd = 0.0
+                bid_change_cushion_ohm = 0.0
+
+            if bid_change_cushion_ohm > p_bid_capacity_cushion:
+                bid_change_cushion_usd = p_bid_capacity_cushion
+                bid_change_cushion_ohm = p_bid_capacity_cushion / lower_target_cushion if lower_target_cushion != 0 else 0.0
+
+            # BID: Real Bid Capacity - Totals
+            if bid_reinstated and natural_price > lower_target_cushion:
+                bid_capacity = bid_capacity_target
+            elif natural_price < lower_target_wall:
+                bid_capacity = p_bid_capacity + net_flow - reserves_in + p_liq_usd - _pow(k * lower_target_wall, 0.5)
+            else:
+                bid_capacity = p_bid_capacity - bid_change_cushion_usd
+
+            if bid_capacity < 0:
+                bid_capacity = 0.0
+            elif bid_capacity > bid_capacity_target:
+                bid_capacity = bid_capacity_target
+
+            if bid_capacity_cushion > bid_capacity:
+                bid_capacity_cushion = bid_capacity
+
+            # BID: Effective Bid Capacity Changes - Totals
+            if natural_price >= lower_target_wall:
+                bid_change_usd = bid_change_cushion_usd
+                bid_change_ohm = bid_change_cushion_ohm
+            else:
+                bid_change_usd = p_bid_capacity - bid_capacity
+                bid_change_ohm = bid_change_cushion_ohm + (p_bid_capacity - bid_capacity - bid_change_cushion_usd) / lower_target_wall if lower_target_wall != 0 else 0.0
+
+            if bid_change_usd > p_bid_capacity:
+                bid_change_usd = p_bid_capacity
+                bid_change_ohm = p_bid_capacity / lower_target_wall if lower_target_wall != 0 else 0.0
+
+            # ASK: Real Ask Capacity - Cushion
+            if ask_reinstated and natural_price < upper_target_cushion:
+                ask_capacity_cushion = ask_capacity_target_cushion
+            elif natural_price > upper_target_cushion and natural_price <= upper_target_wall:
+                ask_capacity_cushion = p_ask_capacity_cushion - (net_flow - reserves_in + p_liq_usd) / upper_target_cushion + _pow(k / upper_target_cushion, 0.5) if upper_target_cushion != 0 else 0.0
+            else:
+                ask_capacity_cushion = p_ask_capacity_cushion
+
+            if ask_capacity_cushion < 0:
+                ask_capacity_cushion = 0.0
+            elif ask_capacity_cushion > ask_capacity_target_cushion:
+                ask_capacity_cushion = ask_capacity_target_cushion
+
+            # ASK: Effective Ask Capacity Changes - Cushion
+            if natural_price > upper_target_cushion and natural_price <= upper_target_wall:
+                ask_change_cushion_ohm = p_ask_capacity_cushion - ask_capacity_cushion
+                ask_change_cushion_usd = upper_target_cushion * (p_ask_capacity_cushion - ask_capacity_cushion)
+            else:
+                ask_change_cushion_ohm = 0.0
+                ask_change_cushion_usd = 0.0
+
+            if ask_change_cushion_ohm > p_ask_capacity_cushion:
+                ask_change_cushion_ohm = p_ask_capacity_cushion
+                ask_change_cushion_usd = p_ask_capacity_cushion * upper_target_cushion
+
+            # ASK: Real Ask Capacity - Totals
+            if ask_reinstated and natural_price < upper_target_cushion:
+                ask_capacity = ask_capacity_target
+            elif natural_price > upper_target_wall:
+                ask_capacity = p_ask_capacity - (net_flow - reserves_in + p_liq_usd) / upper_target_wall + _pow(k / upper_target_wall, 0.5) if upper_target_wall != 0 else 0.0
+            else:
+                ask_capacity = p_ask_capacity - ask_change_cushion_ohm
+
+            if ask_capacity < 0:
+                ask_capacity = 0.0
+            elif ask_capacity > ask_capacity_target:
+                ask_capacity = ask_capacity_target
+
+            if ask_capacity_cushion > ask_capacity:
+                ask_capacity_cushion = ask_capacity
+
+            # ASK: Effective Ask Capacity Changes - Totals
+            if natural_price <= upper_target_wall:
+                ask_change_ohm = ask_change_cushion_ohm
+                ask_change_usd = ask_change_cushion_usd
+            else:
+                ask_change_ohm = p_ask_capacity - ask_capacity
+                ask_change_usd = ask_change_cushion_usd + (p_ask_capacity - ask_capacity - ask_change_cushion_ohm) * upper_target_wall
+
+            if ask_change_ohm > p_ask_capacity:
+                ask_change_ohm = p_ask_capacity
+                ask_change_usd = p_ask_capacity * upper_target_wall
+
+            # -- TREASURY ---------------------------------------------------------------------------------------
+
+            liq_usd = _max0(p_liq_usd + net_flow - reserves_in + bid_change_usd - ask_change_usd)
+            liq_ohm = k / liq_usd if liq_usd != 0 else 0.0
+            price = liq_usd / liq_ohm if liq_ohm != 0 else 0.0
+
+            reserves_out = liq_usd - p_liq_usd - net_flow - reserves_in
+            reserves = _max0(p_reserves - reserves_out)
+            prev_reserves = p_reserves
+
+            ohm_traded = (-2) * reserves_out / (price + p_price) if (price + p_price) != 0 else 0.0
+            cum_ohm_purchased = p_cum_ohm_purchased - ohm_traded
+            cum_ohm_burnt = p_cum_ohm_burnt + p_bid_change_ohm
+            cum_ohm_minted = p_cum_ohm_minted + p_ask_change_ohm
+
+            supply = floating_supply + liq_ohm
+
+        # -- PROTOCOL VARIABLES (FOR REPORTING) ---------------------------------------------------------------------------------------
+
+        treasury = liq_usd + reserves
+        mcap = supply * price
+        floating_mcap = floating_supply * price
+
+        liq_ratio = liq_usd / treasury if treasury != 0 else 0.0
+        reserves_ratio = reserves / liq_usd if liq_usd != 0 else 0.0
+        fmcap_treasury_ratio = floating_mcap / treasury if treasury != 0 else 0.0
+        liq_fmcap_ratio = liq_usd / floating_mcap if floating_mcap != 0 else 0.0
+
+        total_demand = market_demand
+        total_supply = market_supply
+        total_net = total_demand + total_supply
+
+        prices[i % price_window] = price
+        gohm_prices[i % 6] = price * (1 + reward_rate)
+        gohm_volatility = 0.0
+        if i + 1 > 7:
+            s = 0.0
+            for j in range(i - 5, i + 1):
+                s = s + gohm_prices[j % 6]
+            mean = s / 6
+            if mean != 0:
+                s = 0.0
+                for j in range(i - 5, i + 1):
+                    d = gohm_prices[j % 6] - mean
+                    s = s + d * d
+                gohm_volatility = math.sqrt(s / 6) / mean
+
+        # KERNEL_FIELDS order
+        out[0, i] = day
+        out[1, i] = net_flow
+        out[2, i] = price
+        out[3, i] = ma_target
+        out[4, i] = lower_target_cushion
+        out[5, i] = upper_target_cushion
+        out[6, i] = lower_target_wall
+        out[7, i] = upper_target_wall
+        out[8, i] = liq_usd
+        out[9, i] = liq_ohm
+        out[10, i] = k
+        out[11, i] = reserves
+        out[12, i] = prev_reserves
+        out[13, i] = reserves_in
+        out[14, i] = reserves_out
+        out[15, i] = ohm_traded
+        out[16, i] = treasury
+        out[17, i] = supply
+        out[18, i] = mcap
+        out[19, i] = floating_supply
+        out[20, i] = floating_mcap
+        out[21, i] = liq_ratio
+        out[22, i] = reserves_ratio
+        out[23, i] = liq_fmcap_ratio
+        out[24, i] = fmcap_treasury_ratio
+        out[25, i] = cum_ohm_purchased
+        out[26, i] = cum_ohm_burnt
+        out[27, i] = cum_ohm_minted
+        out[28, i] = bid_capacity
+        out[29, i] = ask_capacity
+        out[30, i] = bid_capacity_cushion
+        out[31, i] = ask_capacity_cushion
+        out[32, i] = bid_capacity_target_cushion
+        out[33, i] = ask_capacity_target_cushion
+        out[34, i] = bid_capacity_target
+        out[35, i] = ask_capacity_target
+        out[36, i] = control_ask
+        out[37, i] = control_bid
+        out[38, i] = market_demand
+        out[39, i] = market_supply
+        out[40, i] = total_net
+        out[41, i] = gohm_volatility
+        out[42, i] = reward_rate
+
+
+def pack_params(params:ModelParams) -> np.ndarray:
+    return np.array([getattr(params, name) for name in KERNEL_PARAMS], dtype=float)
+
+
+# Simulate scenario with market operations using the compiled kernel. Same inputs and trajectory as simulate().
+def simulate_kernel(params:ModelParams, historical_net_flows:List[float]=None, fields:Tuple[str, ...]=REPORT_FIELDS) -> Simulation:
+    if params.target_price_function not in TARGET_FUNCTIONS:
+        raise ValueError(f'Unknown target_price_function: {params.target_price_function}')
+    missing = [field for field in fields if field not in KERNEL_FIELDS]
+    if missing:
+        raise ValueError(f'Fields not produced by the kernel: {missing}')
+
+    days = simulation_days(params, historical_net_flows)
+    if params.netflow_type == 'historical' or params.netflow_type == 'enforced' and historical_net_flows is not None:
+        if historical_net_flows is None:
+            raise ValueError("netflow_type 'historical' needs historical_net_flows")
+        market = MARKET_FLOWS
+        flows = np.asarray(historical_net_flows[:days], dtype=float)
+        draws = np.zeros((0, 3))
+    else:
+        market = MARKET_WAVES if params.netflow_type == 'waves' else MARKET_RANDOM
+        flows = np.zeros(0)
+        draws = market_draws(params, days - 1)
+
+    price_window = int(params.target_ma) + 1
+    if params.target_price_function == 'price_cycle_avg':
+        price_window = max(price_window, int(params.short_cycle) + 2)
+
+    out = np.empty((len(KERNEL_FIELDS), days))
+    run_trial(pack_params(params), TARGET_FUNCTIONS[params.target_price_function], market, params.with_reinstate_window == 'No', params.with_dynamic_reward_rate != 'No',
+              int(params.reinstate_window), price_window, draws, flows, out)
+
+    if tuple(fields) != KERNEL_FIELDS:
+        out = out[[KERNEL_FIELDS.index(field) for field in fields]]
+    return Simulation(out, fields)
+
+
+# Simulate many trials on a thread pool. The kernel releases the GIL, so the threads run in parallel when numba is installed.
+def simulate_kernel_many(params_list:List[ModelParams], fields:Tuple[str, ...]=REPORT_FIELDS, threads:int=None) -> List[Simulation]:
+    if not HAVE_NUMBA or threads == 1:
+        return [simulate_kernel(params, fields=fields) for params in params_list]
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(lambda params: simulate_kernel(params, fields=fields), params_list))
+
+
+# Compile (or load from the on-disk cache) the kernel once, e.g. before forking sweep workers
+def warm_up():
+    if HAVE_NUMBA:
+        out = np.empty((len(KERNEL_FIELDS), 2))
+        run_trial(np.ones(len(KERNEL_PARAMS)), 0, MARKET_RANDOM, False, True, 7, 31, np.full((1, 3), 0.5), np.zeros(0), out)
@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import glob
+import io
+import json
+import os
+import socket
+import time
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from src.ledger import LedgerTask, tasks_fingerprint
+
+if TYPE_CHECKING:  # annotations only, the code imports them lazily
+    import pyarrow as pa
+
+
+# Several hosts running the same sweep through a shared directory (NFS, SMB, a mounted bucket...), with no broker:
+#   plan.json            task list, written by the first host and checked by the others
+#   leases/<task>.json   {host, expires}: the task is being simulated. Renewed while it runs, free to take once expired.
+#   done/<task>          host whose output of the task is kept
+#   failed/<task>        {host, error}
+#   outputs/<host>/      rows of every task completed by a host (one file per output and part), merged into the sinks once every task is done
+#   merged/<task>        the outputs of the task are in the sinks. Tasks that failed are merged by a later run that completes them.
+#                        merged/<task>.<output>.<part> while the task is merged: that output file is in the sinks
+#   merging              {host, expires}: the host writing outputs into the sinks, one at a time. Renewed while it merges, taken over once expired.
+# Files are created with a link of a complete temporary file, so they appear atomically and only once. Two hosts racing for
+# an expired lease may both run the chunk, the done marker keeps a single output. Host clocks are assumed to be in sync (NTP).
+class LeaseBoard():
+    def __init__(self, directory:str, host:str=None, ttl:float=600.0):
+        self.directory = directory
+        self.host = host or socket.gethostname()
+        self.ttl = ttl
+        self.heartbeat_interval = ttl / 3
+        self.tasks = []
+        for folder in ('leases', 'done', 'failed', 'merged', os.path.join('outputs', self.host)):
+            os.makedirs(os.path.join(directory, folder), exist_ok=True)
+
+    def plan(self, tasks:List[Tuple[int, list]], label:str='', config:dict=None):
+        plan = {'fingerprint': tasks_fingerprint(tasks, label, config), 'label': label, 'tasks': [[int(seed), list(items)] for seed, items in tasks]}
+        path = os.path.join(self.directory, 'plan.json')
+        try:
+            self._create(path, json.dumps(plan))
+        except FileExistsError:
+            stored = self._read(path)
+            if stored is None or stored['fingerprint'] != plan['fingerprint']:
+                raise ValueError(f'The shared directory {self.directory} belongs to another sweep. Use a new directory to start this one')
+            plan = stored
+        self.tasks = [LedgerTask(task_id, seed, items) for task_id, (seed, items) in enumerate(plan['tasks'])]
+
+    # Tasks planned while the sweep runs, from a stream of trials (the plan has no tasks): every host streams the same tasks in
+    # the same order, so they get the same ids. Leases and failures of this host from a previous run are released, as in reset_unfinished().
+    def add(self, tasks:List[Tuple[int, list]]):
+        for seed, items in tasks:
+            task = LedgerTask(len(self.tasks), int(seed), list(items))
+            self.tasks.append(task)
+            self._reset(task)
+
+    # Leases and failures left by a previous run of this host are released, so it doesn't wait for them to expire
+    def reset_unfinished(self) -> int:
+        return sum(self._reset(task) for task in self.tasks)
+
+    def _reset(self, task:LedgerTask) -> int:
+        released = 0
+        if self._holder(self._path('leases', task.id, '.json')) == self.host:
+            self._remove(self._path('leases', task.id, '.json'))
+            released += 1
+        if self._holder(self._path('failed', task.id)) == self.host:
+            self._remove(self._path('failed', task.id))
+            released += 1
+        return released
+
+    # First task that is not done, failed or leased by a live host. None if there is none right now.
+    def claim(self) -> LedgerTask:
+        for task in self.tasks:
+            if os.path.exists(self._path('done', task.id)) or os.path.exists(self._path('failed', task.id)):
+                continue
+            if self._acquire(self._path('leases', task.id, '.json')):
+                return task
+        return None
+
+    # Renew the leases of the tasks still running on this host
+    def heartbeat(self, tasks:List[LedgerTask]):
+        for task in tasks:
+            path = self._path('leases', task.id, '.json')
+            if self._holder(path) == self.host:
+                self._write(path, self._lease())
+
+    # Parts are kept in the outputs of a host (and dropped when it runs the task again): a task always runs whole
+    def unwritten(self, task:LedgerTask) -> list:
+        return task.items
+
+    def part_written(self, task_id:int, items:list):
+        pass
+
+    # The rows of a task are kept in this host's outputs until the merge. The first part of a task drops the parts left by an
+    # earlier attempt of this host, which may have been split differently.
+    def task_sinks(self, task:LedgerTask, sinks:dict, part:int=0) -> Dict[str, '_TaskOutput']:
+        if part == 0:
+            for path in glob.glob(self._output(self.host, task.id, '*', '*')):
+                os.remove(path)
+        return {name: _TaskOutput(self._output(self.host, task.id, name, part)) for name in sinks}
+
+    # Once the outputs of a task are written. The first host to mark the task done wins, the others drop their outputs.
+    def done(self, task_id:int):
+        try:
+            self._create(self._path('done', task_id), json.dumps({'host': self.host}))
+        except FileExistsError:
+            for path in glob.glob(self._output(self.host, task_id, '*', '*')):
+                os.remove(path)
+        self._release(task_id)
+
+    def fail(self, task_id:int, error:str):
+        try:
+            self._create(self._path('failed', task_id), json.dumps({'host': self.host, 'error': error}))
+        except FileExistsError:
+            pass
+        self._release(task_id)
+
+    def finished(self) -> bool:
+        return all(os.path.exists(self._path('done', task.id)) or os.path.exists(self._path('failed', task.id)) for task in self.tasks)
+
+    def counts(self) -> Dict[str, int]:
+        counts = {'pending': 0, 'running': 0, 'done': 0, 'failed': 0}
+        for task in self.tasks:
+            if os.path.exists(self._path('done', task.id)):
+                counts['done'] += 1
+            elif os.path.exists(self._path('failed', task.id)):
+                counts['failed'] += 1
+            elif os.path.exists(self._path('leases', task.id, '.json')):
+                counts['running'] += 1
+            else:
+                counts['pending'] += 1
+        return counts
+
+    # Once every task is done or failed, write the kept outputs of the done tasks not merged yet to their sinks: a later run that
+    # completes the failed tasks merges their outputs then. One host merges at a time, under a lock renewed like a lease: a merge
+    # interrupted on this host is taken over by its next run, and by any host once the lock expires. Each output file is marked
+    # once written, so a merge taken over writes the files not marked yet. A merge stopped between a write and its mark writes
+    # that file again: an append-only sink (CSV, Parquet) then has its rows twice, BigQuery merges them on their keys.
+    # Returns the line to print: what was merged, or who merges instead of this host (None if there was nothing to merge).
+    def merge(self, sinks:dict) -> str:
+        if not self.finished():
+            return None
+        lock = os.path.join(self.directory, 'merging')
+        if not self._acquire(lock):
+            holder = self._holder(lock)
+            if holder != self.host:
+                return f'{holder or "another host"} is merging the outputs into the sinks: skipped on {self.host}'
+            self._write(lock, self._lease())  # left by an interrupted run of this host
+        import pandas as pd  # only the merging host reads the outputs back
+        merged = 0
+        renewed = time.time()
+        try:
+            for task in self.tasks:
+                host = self._holder(self._path('done', task.id))
+                if host is None or os.path.exists(self._path('merged', task.id)):
+                    continue
+                marks = []
+                for name, sink in sinks.items():
+                    for path in sorted(glob.glob(self._output(host, task.id, name, '*')), key=lambda path: int(path.rsplit('.', 2)[1])):
+                        mark = self._path('merged', task.id, f".{name}.{path.rsplit('.', 2)[1]}")
+                        marks.append(mark)
+                        if os.path.exists(mark):
+                            continue
+                        if time.time() - renewed >= self.heartbeat_interval:
+                            if self._holder(lock) != self.host:
+                                return f'the merge expired and was taken over by {self._holder(lock) or "another host"}: stopped on {self.host}'
+                            self._write(lock, self._lease())
+                            renewed = time.time()
+                        sink.write(pd.read_parquet(path))
+                        self._write(mark, json.dumps({'host': self.host}))
+                self._write(self._path('merged', task.id), json.dumps({'host': self.host}))
+                for mark in marks:
+                    self._remove(mark)
+                merged += 1
+        finally:
+            if self._holder(lock) == self.host:
+                self._remove(lock)
+        return 'merged the outputs of every host into the sinks' if merged else None
+
+    # Lease file (a task's, or the merging lock) created for this host, or taken over once expired
+    def _acquire(self, path:str) -> bool:
+        try:
+            self._create(path, self._lease())
+            return True
+        except FileExistsError:
+            pass
+        lease = self._read(path)
+        if lease is None or lease['expires'] > time.time():
+            return False
+        # Expired: its host died or lost the shared directory. Only one host can rename the stale lease away.
+        stale = f'{path}.{self.host}.stale'
+        try:
+            os.rename(path, stale)
+        except FileNotFoundError:
+            return False
+        os.remove(stale)
+        try:
+            self._create(path, self._lease())
+            return True
+        except FileExistsError:
+            return False
+
+    def _release(self, task_id:int):
+        path = self._path('leases', task_id, '.json')
+        if self._holder(path) == self.host:
+            self._remove(path)
+
+    # Output file of a part of a task, name and part may be '*' to glob
+    def _output(self, host:str, task_id:int, name:str, part) -> str:
+        return os.path.join(self.directory, 'outputs', host, f'task-{task_id}.{name}.{part}.parquet')
+
+    def _lease(self) -> str:
+        return json.dumps({'host': self.host, 'expires': time.time() + self.ttl})
+
+    def _path(self, folder:str, task_id:int, suffix:str='') -> str:
+        return os.path.join(self.directory, folder, f'{task_id}{suffix}')
+
+    def _holder(self, path:str) -> str:
+        content = self._read(path)
+        return content and content['host']
+
+    # Exclusive creation of a complete file
+    def _create(self, path:str, content:str):
+        tmp = f'{path}.{self.host}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(content)
+        try:
+            os.link(tmp, path)
+        finally:
+            os.remove(tmp)
+
+    def _write(self, path:str, content:str):
+        tmp = f'{path}.{self.host}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _read(path:str) -> dict:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    @staticmethod
+    def _remove(path:str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# Parquet file of one output of a task, replaced atomically
+class _TaskOutput():
+    arrow = True
+
+    def __init__(self, path:str):
+        self.path = path
+
+    def encode(self, table:pa.Table) -> bytes:
+        import pyarrow.parquet as pq
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer)
+        return buffer.getvalue()
+
+    def upload(self, payload:bytes):
+        with open(self.path + '.tmp', 'wb') as f:
+            f.write(payload)
+        os.replace(self.path + '.tmp', self.path)
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Dict, List, Tuple
+
+
+TASK_STATUSES = ('pending', 'running', 'done', 'failed')
+
+
+# One work unit of a sweep: the trials (or daily-row keys) of a seed
+class LedgerTask():
+    def __init__(self, task_id:int, seed:int, items:list):
+        self.id = task_id
+        self.seed = seed
+        self.items = items
+
+    def __repr__(self):
+        return f'LedgerTask({self.id}, seed={self.seed}, items={len(self.items)})'
+
+
+# Fingerprint of a sweep configuration and its task list, so a ledger is never resumed by a different sweep
+def tasks_fingerprint(tasks:List[Tuple[int, list]], label:str='', config:dict=None) -> str:
+    return hashlib.sha1(json.dumps([label, config, [[int(seed), list(items)] for seed, items in tasks]], default=str).encode()).hexdigest()
+
+
+# Local SQLite record of the tasks of a sweep (pending -> running -> done | failed). The runner claims the next pending
+# task whenever a worker is idle, and a restarted sweep with the same ledger only runs the tasks that are not done.
+# path ':memory:' keeps the ledger for the current run only. src/leases.py has the multi-host equivalent.
+# The parts of a task simulated in several parts (memory budget) go to the sinks as they are simulated: each written part is
+# recorded, and a task run again (resumed, or failed after some parts) only simulates the items of the parts not written yet,
+# so its rows are not appended to the sinks twice.
+class SweepLedger():
+    heartbeat_interval = None  # a local ledger needs no lease renewal
+
+    def __init__(self, path:str=':memory:'):
+        self.path = path
+        self.added = 0  # tasks of a stream added in this run
+        self.connection = sqlite3.connect(path, isolation_level=None)  # explicit transactions
+        self.connection.executescript("""
+            create table if not exists meta (name text primary key, value text);
+            create table if not exists tasks (
+                id integer primary key,
+                seed integer not null,
+                items text not null,
+                status text not null default 'pending',
+                attempts integer not null default 0,
+                started_at real,
+                finished_at real,
+                error text
+            );
+            create index if not exists tasks_status on tasks (status, id);
+            create table if not exists parts (task_id integer not null, items text not null);
+        """)
+
+    # Record the tasks of a new sweep, or check that an existing ledger belongs to the same sweep
+    def plan(self, tasks:List[Tuple[int, list]], label:str='', config:dict=None):
+        fingerprint = tasks_fingerprint(tasks, label, config)
+        with self._transaction():
+            row = self.connection.execute("select value from meta where name = 'fingerprint'").fetchone()
+            if row is None:
+                self.connection.execute("insert into meta values ('fingerprint', ?), ('label', ?)", (fingerprint, label))
+                self.connection.executemany('insert into tasks (seed, items) values (?, ?)', [(int(seed), json.dumps(list(items))) for seed, items in tasks])
+            elif row[0] != fingerprint:
+                raise ValueError(f'The ledger {self.path} belongs to another sweep. Use a new ledger path to start this one')
+
+    # Record tasks planned while the sweep runs, from a stream of trials (the plan of such a sweep has no tasks). A resumed sweep
+    # streams the same tasks in the same order: the n-th task added in a run is the n-th task of the ledger, recorded only once.
+    def add(self, tasks:List[Tuple[int, list]]):
+        with self._transaction():
+            for task_id, (seed, items) in enumerate(tasks, self.added + 1):
+                items = json.dumps(list(items))
+                row = self.connection.execute('select seed, items from tasks where id = ?', (task_id,)).fetchone()
+                if row is None:
+                    self.connection.execute('insert into tasks (id, seed, items) values (?, ?, ?)', (task_id, int(seed), items))
+                elif row != (int(seed), items):
+                    raise ValueError(f'The ledger {self.path} has another task {task_id}: the stream of trials changed since it was started')
+        self.added += len(tasks)
+
+    # Tasks left running or failed by a previous run go back to pending
+    def reset_unfinished(self) -> int:
+        with self._transaction():
+            return self.connection.execute("update tasks set status = 'pending', started_at = null where status in ('running', 'failed')").rowcount
+
+    # Next pending task, marked as running. None once every task has been claimed.
+    def claim(self) -> LedgerTask:
+        with self._transaction():
+            row = self.connection.execute("""
+                update tasks set status = 'running', attempts = attempts + 1, started_at = ?
+                where id = (select id from tasks where status = 'pending' order by id limit 1)
+                returning id, seed, items""", (time.time(),)).fetchone()
+        return row and LedgerTask(row[0], row[1], json.loads(row[2]))
+
+    def done(self, task_id:int):
+        self._finish(task_id, 'done', None)
+
+    # Items of a task whose rows are not in the sinks yet
+    def unwritten(self, task:LedgerTask) -> list:
+        written = {item for (items,) in self.connection.execute('select items from parts where task_id = ?', (task.id,)) for item in json.loads(items)}
+        return [item for item in task.items if item not in written] if written else task.items
+
+    # The rows of a part of a task (its items) are in the sinks
+    def part_written(self, task_id:int, items:list):
+        with self._transaction():
+            self.connection.execute('insert into parts values (?, ?)', (task_id, json.dumps(list(items))))
+
+    # Sinks of the rows of a task (or of its part-th part): the sweep sinks themselves
+    def task_sinks(self, task:LedgerTask, sinks:dict, part:int=0) -> dict:
+        return sinks
+
+    def heartbeat(self, tasks:List[LedgerTask]):
+        pass
+
+    # The rows are already in the sinks
+    def merge(self, sinks:dict) -> str:
+        return None
+
+    def fail(self, task_id:int, error:str):
+        self._finish(task_id, 'failed', error)
+
+    # {status: number of tasks}
+    def counts(self) -> Dict[str, int]:
+        counts = dict(self.connection.execute('select status, count(*) from tasks group by status').fetchall())
+        return {status: counts.get(status, 0) for status in TASK_STATUSES}
+
+    def finished(self) -> bool:
+        counts = self.counts()
+        return counts['pending'] == 0 and counts['running'] == 0
+
+    def failures(self) -> List[Tuple[int, int, str]]:
+        return self.connection.execute("select id, seed, error from tasks where status = 'failed' order by id").fetchall()
+
+    def close(self):
+        self.connection.close()
+
+    def _finish(self, task_id:int, status:str, error:str):
+        with self._transaction():
+            self.connection.execute('update tasks set status = ?, finished_at = ?, error = ? where id = ?', (status, time.time(), error, task_id))
+            if status == 'done':
+                self.connection.execute('delete from parts where task_id = ?', (task_id,))
+
+    def _transaction(self):
+        return _Transaction(self.connection)
+
+
+class _Transaction():
+    def __init__(self, connection:sqlite3.Connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('begin immediate')
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.execute('rollback' if exc_type else 'commit')
+        return False
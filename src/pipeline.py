@@ -0,0 +1,238 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List
+
+from src.ledger import LedgerTask
+from src.handoff import release_output, sink_rows
+from src.sinks import payload_size
+
+
+IDLE_FLUSH = 1.0  # seconds
+PUT_POLL = 0.1  # seconds between the checks for written tasks of a blocked put()
+
+
+# Output stages of a sweep, connected by bounded queues:
+#   simulate -> columnarize   worker processes of the pool (a task returns {output name: columns, frame or SharedFrame})
+#   compress                  one thread: sink.encode(rows) (CSV text, Parquet bytes...), rows as a frame or an Arrow table (handoff.sink_rows)
+#   write / upload            one thread per output: sink.upload(payload) (or its loader threads, BigQuerySink)
+# The runner keeps simulating while earlier tasks are encoded and uploaded, so upload latency hides behind simulation.
+# When a sink is slower than the simulations the queues fill up, put() blocks and the runner stops claiming tasks,
+# so memory stays bounded by the queue sizes instead of growing with the unwritten rows.
+# A task is written once every one of its outputs is uploaded; written() hands those back to the runner thread,
+# which marks them done in the ledger (the ledger is only used from that thread). A task simulated in several parts (memory
+# budget of the workers) is put once per part, and is written once the outputs of its last part are uploaded. Such a part is put
+# with its items, and written_parts() hands each part back once its outputs are uploaded, so the runner can record it in the
+# ledger before the whole task is done.
+class OutputPipeline():
+    def __init__(self, outputs:List[str], queue_size:int=4, telemetry=None):
+        self.telemetry = telemetry  # SweepTelemetry: rows, bytes and seconds of every encode and upload
+        self.queue_size = queue_size
+        self.encode_queue = queue.Queue(queue_size)
+        self.write_queues = {name: queue.Queue(queue_size) for name in outputs}
+        self.written_queue = queue.Queue()
+        self.parts_queue = queue.Queue()
+        self.parts = {}  # part id -> [outputs not uploaded yet, task, items] of the parts put with their items
+        self.next_part = 0
+        self.tasks = {}  # task id -> task, from put() until written() returns it
+        self.remaining = {}  # task id -> outputs not uploaded yet
+        self.unfinished = set()  # ids of the tasks whose last part is not put yet
+        self.abandoned = set()  # ids of the failed tasks whose earlier parts are still being uploaded
+        self.lock = threading.Lock()
+        self.changed_future = Future()
+        self.threads = [threading.Thread(target=self._encode, name='sweep-compress', daemon=True)]
+        self.threads += [threading.Thread(target=self._write, args=(name,), name=f'sweep-write-{name}', daemon=True) for name in outputs]
+        for thread in self.threads:
+            thread.start()
+
+    # Hand the outputs of a simulated task (or of a part of it, last=False until its last part) over to the compress stage.
+    # `items`: those of a part, to get it back from written_parts() once uploaded.
+    # Blocks while the stage is full; returns False if it still is after `timeout` seconds, or once a task or a part is written
+    # meanwhile (the caller records them, renews its leases and tries again).
+    def put(self, task:LedgerTask, sinks:Dict[str, object], outputs:Dict[str, object], timeout:float=None, last:bool=True, items:list=None) -> bool:
+        with self.lock:
+            first = task.id not in self.tasks
+            self.tasks[task.id] = task
+            self.remaining[task.id] = self.remaining.get(task.id, 0) + len(outputs)
+            if not last:
+                self.unfinished.add(task.id)
+            part = None
+            if items is not None:
+                part, self.next_part = self.next_part, self.next_part + 1
+                self.parts[part] = [len(outputs), task, items]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                self.encode_queue.put((task, part, sinks, outputs), timeout=PUT_POLL if deadline is None else max(0, min(PUT_POLL, deadline - time.monotonic())))
+                break
+            except queue.Full:
+                if self.written_queue.empty() and self.parts_queue.empty() and (deadline is None or time.monotonic() < deadline):
+                    continue
+            with self.lock:
+                self.remaining[task.id] -= len(outputs)
+                self.parts.pop(part, None)
+                if first:
+                    del self.tasks[task.id], self.remaining[task.id]
+                    self.unfinished.discard(task.id)
+            return False
+        if last:
+            with self.lock:
+                written = task.id in self.unfinished and self.remaining[task.id] == 0  # every part is uploaded already: the writers left it to this call
+                self.unfinished.discard(task.id)
+                if written:
+                    del self.remaining[task.id]
+            if written:
+                self._notify(self.written_queue, (task, None))
+        return True
+
+    # A task failed after some of its parts were put: they are still uploaded, but the task is never returned by written()
+    def abandon(self, task:LedgerTask):
+        with self.lock:
+            if task.id not in self.tasks:
+                return
+            del self.tasks[task.id]
+            self.unfinished.discard(task.id)
+            if self.remaining[task.id]:
+                self.abandoned.add(task.id)
+            else:
+                del self.remaining[task.id]
+
+    def full(self) -> bool:
+        return self.encode_queue.full()
+
+    # Items waiting in each stage queue
+    def depths(self) -> Dict[str, int]:
+        return {'compress': self.encode_queue.qsize(), **{f'write:{name}': write_queue.qsize() for name, write_queue in self.write_queues.items()}}
+
+    # Tasks handed over and not returned by written() yet
+    def pending(self) -> List[LedgerTask]:
+        with self.lock:
+            return list(self.tasks.values())
+
+    # Tasks whose outputs are all uploaded, waiting up to `timeout` seconds for the first one (no wait by default).
+    # An exception raised by a sink is raised again here.
+    def written(self, timeout:float=0) -> List[LedgerTask]:
+        tasks = []
+        try:
+            item = self.written_queue.get(timeout=timeout) if timeout else self.written_queue.get_nowait()
+            while True:
+                task, error = item
+                if error is not None:
+                    raise error
+                with self.lock:
+                    del self.tasks[task.id]
+                tasks.append(task)
+                item = self.written_queue.get_nowait()
+        except queue.Empty:
+            return tasks
+
+    # (task, items) of the parts put with their items whose outputs are all uploaded since the last call
+    def written_parts(self) -> List[tuple]:
+        parts = []
+        while True:
+            try:
+                parts.append(self.parts_queue.get_nowait())
+            except queue.Empty:
+                return parts
+
+    # A Future completed once a task or a part is written (at once if one is waiting already): the runner waits on it
+    # along with the simulations, so it records what is written right away
+    def changed(self) -> Future:
+        with self.lock:
+            if self.changed_future.done():
+                self.changed_future = Future()
+            if not (self.written_queue.empty() and self.parts_queue.empty()):
+                self.changed_future.set_result(None)
+            return self.changed_future
+
+    # Stop the stages once the queued outputs are written
+    def close(self):
+        self.encode_queue.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def _encode(self):
+        while True:
+            item = self.encode_queue.get()
+            if item is None:
+                break
+            task, part, sinks, outputs = item
+            for name, output in outputs.items():
+                try:
+                    start = time.perf_counter()
+                    rows = sink_rows(sinks[name], output)
+                    payload = sinks[name].encode(rows)
+                    if self.telemetry:
+                        self.telemetry.encoded(name, len(rows), payload_size(payload), time.perf_counter() - start)
+                    del rows
+                except Exception as error:
+                    self._notify(self.written_queue, (task, error))
+                    continue
+                finally:
+                    release_output(output)  # the payload holds the rows from here
+                self.write_queues[name].put((task, part, sinks[name], payload))
+        for write_queue in self.write_queues.values():
+            write_queue.put(None)
+
+    # Uploads of a sink returning a Future (BigQuerySink) complete later, on its own threads: the rows it holds are flushed
+    # once this stage has been idle for IDLE_FLUSH seconds, and at close() (waiting for the loads)
+    def _write(self, name:str):
+        deferred = {}  # id -> sinks holding rows not loaded yet
+        while True:
+            try:
+                item = self.write_queues[name].get(timeout=IDLE_FLUSH) if deferred else self.write_queues[name].get()
+            except queue.Empty:
+                for sink in deferred.values():
+                    sink.flush()
+                deferred.clear()
+                continue
+            if item is None:
+                for sink in deferred.values():
+                    sink.flush(wait=True)
+                break
+            task, part, sink, payload = item
+            try:
+                start = time.perf_counter()
+                loaded = sink.upload(payload)
+            except Exception as error:
+                self._notify(self.written_queue, (task, error))
+                continue
+            if isinstance(loaded, Future):
+                deferred[id(sink)] = sink
+                loaded.add_done_callback(lambda loaded, task=task, part=part, size=payload_size(payload): self._uploaded(name, task, part, size, loaded))
+            else:
+                self._uploaded(name, task, part, payload_size(payload), time.perf_counter() - start)
+
+    def _notify(self, to:queue.Queue, item:tuple):
+        to.put(item)
+        with self.lock:
+            if not self.changed_future.done():
+                self.changed_future.set_result(None)
+
+    # An output of a task (or of its part `part`) is uploaded (seconds, or the Future of a deferred upload, with its seconds as result)
+    def _uploaded(self, name:str, task:LedgerTask, part:int, size:int, seconds):
+        if isinstance(seconds, Future):
+            if seconds.exception() is not None:
+                self._notify(self.written_queue, (task, seconds.exception()))
+                return
+            seconds = seconds.result()
+        if self.telemetry:
+            self.telemetry.uploaded(name, size, seconds)
+        items = None
+        with self.lock:
+            if part is not None:
+                self.parts[part][0] -= 1
+                if self.parts[part][0] == 0:
+                    _, _, items = self.parts.pop(part)
+            self.remaining[task.id] -= 1
+            written = self.remaining[task.id] == 0 and task.id not in self.unfinished and task.id not in self.abandoned
+            if self.remaining[task.id] == 0 and task.id in self.abandoned:
+                self.abandoned.discard(task.id)
+                del self.remaining[task.id]
+            elif written:
+                del self.remaining[task.id]
+        if items is not None:
+            self._notify(self.parts_queue, (task, items))  # before the task itself: the runner records the part first
+        if written:
+            self._notify(self.written_queue, (task, None))
@@ -0,0 +1,148 @@
+import copy
+import time
+from typing import Dict, List, Tuple
+
+from src.sinks import payload_size
+
+
+# -- COST MODEL ---
+# Reference costs used to size the tasks of a sweep (seconds on one core, measured with the default presets). Only their ratios
+# matter, and they are constants rather than measurements so that every host of a shared sweep computes the same task list.
+DAY_SECONDS = {'batch': 3e-6, 'scalar': 1e-5}  # simulating one trial-day
+CELL_SECONDS = 5e-8  # building and compressing one output value
+TASK_SECONDS = 1.0  # target cost of a task: claims and writes stay negligible, and workers still finish close together
+MIN_TASKS = 32  # sweeps with few trials are still split, so work stealing balances them over the workers,
+MIN_TASK_SECONDS = 0.1  # but not into tasks too small to amortize a batch
+
+
+# Reference cost of one trial: horizon x simulated day, plus the volume of its output rows
+def trial_cost(sweep, outputs:List[str]) -> float:
+    cost = sweep.params['horizon'] * DAY_SECONDS['batch' if sweep.batchable() and sweep.sampling != 'optuna' else 'scalar']
+    for output in outputs:
+        rows, columns = sweep.output_size(output)
+        cost += rows * columns * CELL_SECONDS
+    return cost
+
+
+# Trials per task so that a task costs about TASK_SECONDS (horizon x trials x output volume)
+def task_size(sweep, outputs:List[str], trials:int) -> int:
+    cost = trial_cost(sweep, outputs)
+    size = min(int(TASK_SECONDS // cost), max(-(-trials // MIN_TASKS), int(MIN_TASK_SECONDS // cost)))
+    return max(1, size)
+
+
+# Items split in parts of at most `size` items and equal lengths (+-1), rather than full parts and a small remainder
+def split_evenly(items:list, size:int) -> List[list]:
+    if not len(items):
+        return []
+    parts = -(-len(items) // size)
+    base, extra = divmod(len(items), parts)
+    bounds = [i * base + min(i, extra) for i in range(parts + 1)]
+    return [items[start:stop] for start, stop in zip(bounds, bounds[1:])]
+
+
+# Most expensive tasks first, so the last tasks to finish are the cheap ones (the ledger hands tasks out in this order)
+def order_by_cost(tasks:List[Tuple[int, list]]) -> List[Tuple[int, list]]:
+    return sorted(tasks, key=lambda task: -len(task[1]))
+
+
+# -- MEMORY BUDGET ---
+# Trials a worker simulates at once, so that its buffers (trajectories and output rows) stay within `budget` bytes whatever
+# the size of the tasks. A larger task is simulated in parts: the rows of each part are written as soon as it is simulated
+# while the rest of the task goes back to the pool. The task list, and so the ledger, doesn't depend on the budget.
+class WorkerBudget():
+    def __init__(self, budget:int=None, trial_bytes:float=1.0):
+        self.budget = budget
+        self.trial_bytes = trial_bytes  # estimated (Sweep.trial_bytes), raised when a worker reports larger buffers
+
+    # (items of the next part, items left for the parts after it)
+    def split(self, items:list) -> Tuple[list, list]:
+        if self.budget is None:
+            return items, items[:0]
+        size = max(1, int(self.budget // self.trial_bytes))
+        return items[:size], items[size:]
+
+    # A worker simulated `trials` trials into `buffer_bytes` bytes of output rows
+    def measured(self, trials:int, buffer_bytes:int):
+        if trials:
+            self.trial_bytes = max(self.trial_bytes, buffer_bytes / trials)
+
+
+# -- DRY RUN ---
+# Cost of one trial on this machine, measured on the first trials of the first seed (as many as a task has, since a batch
+# gets cheaper per trial with its size, up to SAMPLE_TRIALS):
+# {'seconds': simulation and rows of a trial, 'rows', 'bytes' and 'encode_seconds': per output and trial}
+SAMPLE_TRIALS = {'batch': 256, 'scalar': 32}
+
+
+def measure_trial(sweep, outputs:List[str], encoders:Dict[str, object], task_trials:int) -> dict:
+    probe = sweep
+    if sweep.sampling == 'optuna':  # a study runs its trials one by one: as many scalar simulations of sampled configurations
+        probe = copy.copy(sweep)
+        probe.sampling = 'random'
+        probe.batchable = lambda: False
+    sample = min(task_trials, SAMPLE_TRIALS['batch' if probe.batchable() else 'scalar'])
+    seed, trials = sweep.seeds[0], list(sweep.trials[:sample])
+    run = (lambda trials: {'summary': probe.summary(seed, trials)}) if outputs == ['summary'] else (lambda trials: probe.summary_and_daily(seed, trials))
+    run(trials[:1])  # imports and caches
+
+    start = time.perf_counter()
+    frames = run(trials)
+    measured = {'seconds': (time.perf_counter() - start) / len(trials), 'trials': len(trials), 'seed': seed, 'rows': {}, 'bytes': {}, 'encode_seconds': {}}
+    for output in outputs:
+        start = time.perf_counter()
+        payload = encoders[output](frames[output])
+        measured['encode_seconds'][output] = (time.perf_counter() - start) / len(trials)
+        measured['rows'][output] = len(frames[output]) / len(trials)
+        measured['bytes'][output] = payload_size(payload) / len(trials)
+    return measured
+
+
+# What a sweep will do, extrapolated from measure_trial(). Compression runs on one thread next to the workers (src/pipeline.py),
+# so the wall clock is the slowest of the two. Upload time depends on the network and is not included.
+class SweepPlan():
+    def __init__(self, sweep, outputs:List[str], tasks:List[Tuple[int, list]], workers:int, measured:dict):
+        self.sweep = sweep
+        self.outputs = outputs
+        self.tasks = tasks
+        self.workers = workers
+        self.measured = measured
+        self.simulations = sum(len(items) for _, items in tasks)
+        self.day_steps = self.simulations * (sweep.params['horizon'] - 1)
+        self.rows = {output: round(self.simulations * measured['rows'][output]) for output in outputs}
+        self.bytes = {output: self.simulations * measured['bytes'][output] for output in outputs}
+        self.simulate_seconds = self.simulations * measured['seconds']
+        self.encode_seconds = self.simulations * sum(measured['encode_seconds'].values())
+        largest_task = max((len(items) for _, items in tasks), default=0) * measured['seconds']
+        self.seconds = max(self.simulate_seconds / workers, largest_task, self.encode_seconds)
+
+    def report(self) -> str:
+        sizes = [len(items) for _, items in self.tasks]
+        lines = [
+            f"sweep {self.sweep.name or ''} | outputs {', '.join(self.outputs)} | {len(self.sweep.seeds)} seeds, horizon {self.sweep.params['horizon']}, "
+            f"{self.sweep.sampling} sampling, {self.sweep.netflow_type} net flows",
+            f"tasks        {len(self.tasks)} of {min(sizes, default=0)}-{max(sizes, default=0)} trials on {self.workers} workers",
+            f"simulations  {self.simulations:,} ({self.day_steps:,} day steps)",
+        ]
+        lines += [f"{output + ' rows':<12} {self.rows[output]:,} ({_format_bytes(self.bytes[output])})" for output in self.outputs]
+        lines += [
+            f"time         {_format_seconds(self.seconds)} (simulation {_format_seconds(self.simulate_seconds)} of CPU, compression {_format_seconds(self.encode_seconds)}, uploads not included)",
+            f"             measured on {self.measured['trials']} trials of seed {self.measured['seed']}",
+        ]
+        return '\n'.join(lines)
+
+
+def _format_bytes(size:float) -> str:
+    for unit in ('B', 'kB', 'MB', 'GB'):
+        if size < 1000:
+            return f'{size:.1f} {unit}'
+        size /= 1000
+    return f'{size:.1f} TB'
+
+
+def _format_seconds(seconds:float) -> str:
+    if seconds < 60:
+        return f'{seconds:.1f}s'
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}h{minutes:02d}m' if hours else f'{minutes}m{seconds:02d}s'
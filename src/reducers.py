@@ -0,0 +1,133 @@
+import numpy as np
+from typing import Dict, Iterable, List
+
+from src.utils import is_absorbed
+
+
+# Reducers fold a simulation day by day without keeping its history. They accept a Day (one trial)
+# or a BatchDay (one lane per trial), so the same reducer works on simulate_iter and simulate_batch_iter.
+# absorbable: update() leaves the result unchanged on the days after an absorbed day (price at 0, see is_absorbed),
+# so the analytic contribution of that tail is nothing and the days don't need to be stepped.
+class Reducer():
+    name = None
+    absorbable = False
+
+    def update(self, day):
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+
+# Objective of the random sweeps and the optuna studies: sum of treasury * mcap / (1 + gOHM volatility)
+# Absorbed tail: mcap = supply * 0, every day adds exactly 0
+class Objective(Reducer):
+    name = 'objective'
+    absorbable = True
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, day):
+        self.value += day.treasury * day.mcap / (1 + day.gohm_volatility)
+
+    def result(self):
+        return self.value
+
+
+# Share of the days that the price closes between the lower and the upper wall
+class TimeInsideWalls(Reducer):
+    name = 'time_inside_walls'
+
+    def __init__(self):
+        self.days = 0
+        self.days_inside = 0
+
+    def update(self, day):
+        self.days += 1
+        self.days_inside = self.days_inside + ((day.price >= day.lower_target_wall) & (day.price <= day.upper_target_wall))
+
+    def result(self):
+        return self.days_inside / self.days if self.days else 0
+
+
+# Largest relative fall of the price from its running peak. Absorbed tail: the drawdown already reached 1 on the absorbed day
+class MaxDrawdown(Reducer):
+    name = 'max_drawdown'
+    absorbable = True
+
+    def __init__(self):
+        self.peak = 0
+        self.value = 0
+
+    def update(self, day):
+        self.peak = np.maximum(self.peak, day.price)
+        with np.errstate(all='ignore'):
+            drawdown = np.where(self.peak > 0, (self.peak - day.price) / self.peak, 0)
+        self.value = np.maximum(self.value, drawdown)
+
+    def result(self):
+        return self.value
+
+
+class MinReserves(Reducer):
+    name = 'min_reserves'
+
+    def __init__(self):
+        self.value = np.inf
+
+    def update(self, day):
+        self.value = np.minimum(self.value, day.reserves)
+
+    def result(self):
+        return self.value
+
+
+# Days the price trades below the treasury backing of the floating supply (floating mcap < treasury)
+class DaysBelowBacking(Reducer):
+    name = 'days_below_backing'
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, day):
+        self.value = self.value + (day.floating_mcap < day.treasury)
+
+    def result(self):
+        return self.value
+
+
+# First day the price closes at 0 (the trial is absorbed from there), 0 if it never does
+class AbsorbedDay(Reducer):
+    name = 'absorbed_day'
+    absorbable = True
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, day):
+        self.value = self.value + (self.value == 0) * (day.price == 0) * day.day
+
+    def result(self):
+        return self.value
+
+
+REDUCERS = {reducer.name: reducer for reducer in (Objective, TimeInsideWalls, MaxDrawdown, MinReserves, DaysBelowBacking, AbsorbedDay)}
+
+
+# Objective of a stored trajectory (a Simulation), equal to folding Objective over its days: the daily terms are added in order
+def simulation_objective(simulation) -> float:
+    terms = simulation.column('treasury') * simulation.column('mcap') / (1 + simulation.column('gohm_volatility'))
+    return float(np.cumsum(terms)[-1]) if len(terms) else 0
+
+
+# Run several reducers over the same days in a single pass. Returns {reducer name: result}.
+# Stops pulling days once the trial (every lane of a batch) is absorbed, if all the reducers are absorbable.
+def reduce_days(days:Iterable, reducers:List[Reducer], stop_when_absorbed:bool=True) -> Dict[str, float]:
+    stop_when_absorbed = stop_when_absorbed and all(reducer.absorbable for reducer in reducers)
+    for day in days:
+        for reducer in reducers:
+            reducer.update(day)
+        if stop_when_absorbed and is_absorbed(day):
+            break
+    return {reducer.name: reducer.result() for reducer in reducers}
@@ -0,0 +1,67 @@
+import random
+import numpy as np
+
+
+# Market randomness of a simulation. Each day after the first one uses up to three uniform draws in [0, 1):
+# the net flow draw and the market demand and supply multipliers.
+DRAWS_PER_DAY = 3
+RANDOM_STREAMS = ('seedsequence', 'legacy')
+
+
+# Random stream owned by one simulation, so several simulations can share a process or a thread.
+#  - 'seedsequence': numpy Generator derived from SeedSequence(seed), always 3 draws per day.
+#  - 'legacy': replays the global `random` module after random.seed(seed), as the old model_inputs did.
+#    'waves' simulations only drew the net flow uniform, so they use 1 draw per day (the other columns are 0).
+class MarketStream():
+    def __init__(self, seed:int, mode:str='seedsequence', draws_per_day:int=DRAWS_PER_DAY):
+        if mode == 'seedsequence':
+            self.generator = np.random.default_rng(np.random.SeedSequence(seed))
+        elif mode == 'legacy':
+            self.generator = random.Random(seed)
+        else:
+            raise ValueError(f'Unknown random_stream: {mode}. Expected one of {RANDOM_STREAMS}')
+        self.seed = seed
+        self.mode = mode
+        self.draws_per_day = draws_per_day if mode == 'legacy' else DRAWS_PER_DAY
+
+    # Draws of the next `days` days as a (days, 3) block
+    def draws(self, days:int) -> np.ndarray:
+        days = max(days, 0)
+        if self.mode == 'seedsequence':
+            return self.generator.random((days, DRAWS_PER_DAY))
+
+        block = np.zeros((days, DRAWS_PER_DAY))
+        block[:, :self.draws_per_day] = np.array([self.generator.random() for _ in range(days * self.draws_per_day)]).reshape(days, self.draws_per_day)
+        return block
+
+    # Generator state as plain python values, so a simulation snapshot can continue the exact same sequence
+    def state(self) -> dict:
+        if self.mode == 'seedsequence':
+            generator = self.generator.bit_generator.state
+        else:
+            version, internal, gauss_next = self.generator.getstate()
+            generator = [version, list(internal), gauss_next]
+        return {'seed': self.seed, 'mode': self.mode, 'draws_per_day': self.draws_per_day, 'generator': generator}
+
+    @classmethod
+    def from_state(cls, state:dict):
+        stream = cls(state['seed'], state['mode'], state['draws_per_day'])
+        if stream.mode == 'seedsequence':
+            stream.generator.bit_generator.state = state['generator']
+        else:
+            version, internal, gauss_next = state['generator']
+            stream.generator.setstate((version, tuple(internal), gauss_next))
+        return stream
+
+
+def market_stream(params) -> MarketStream:
+    mode = params.random_stream
+    draws_per_day = 1 if mode == 'legacy' and params.netflow_type == 'waves' else DRAWS_PER_DAY
+    return MarketStream(params.seed, mode, draws_per_day)
+
+
+# Draws of days 2..horizon-1 of a simulation: row i feeds day i + 2
+def market_draws(params, days:int=None) -> np.ndarray:
+    if days is None:
+        days = params.horizon - 2
+    return market_stream(params).draws(days)
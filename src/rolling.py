@@ -0,0 +1,153 @@
+import numpy as np
+
+
+# Rolling-window state of a simulation. Every structure takes either python floats (one trial)
+# or numpy arrays with one lane per trial (batch), and costs O(window) memory whatever the horizon.
+# state() returns plain python values (JSON-serializable) and from_state() rebuilds the exact same structure.
+
+
+def _plain(value):
+    return value.tolist() if isinstance(value, np.ndarray) else value
+
+
+# With lanes, a single-trial value is broadcast to every lane
+def _restore(value, lanes:int=None, dtype=float):
+    return value if lanes is None else np.broadcast_to(np.asarray(value, dtype=dtype), (lanes,)).copy()
+
+
+# Fixed-size ring buffer that keeps the last `size` pushed values
+class RingBuffer():
+    def __init__(self, size:int):
+        self.size = max(size, 1)
+        self.values = [0.0] * self.size
+        self.count = 0  # number of values pushed since the start of the simulation
+
+    def push(self, value):
+        slot = self.count % self.size
+        oldest = self.values[slot]
+        self.values[slot] = value
+        self.count += 1
+        return oldest
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    # Value pushed `i` pushes ago (0 = last one)
+    def recent(self, i:int=0):
+        return self.values[(self.count - 1 - i) % self.size]
+
+    # Sum of `n` consecutive values, leaving out the `skip` most recent ones. Added oldest first, as the dict-based lags did.
+    def sum(self, n:int, skip:int=0):
+        s = 0
+        for i in range(self.count - skip - n, self.count - skip):
+            s = s + self.values[i % self.size]
+        return s
+
+    def state(self):
+        return {'size': self.size, 'count': self.count, 'values': [_plain(value) for value in self.values]}
+
+    @classmethod
+    def from_state(cls, state:dict, lanes:int=None):
+        buffer = cls(state['size'])
+        buffer.count = state['count']
+        buffer.values = [_restore(value, lanes) for value in state['values']]
+        return buffer
+
+
+# Mean and standard deviation of the last `size` values (population std, like np.std)
+class RollingStats():
+    def __init__(self, size:int):
+        self.buffer = RingBuffer(size)
+        self.size = self.buffer.size
+
+    def push(self, value):
+        return self.buffer.push(value)
+
+    @property
+    def count(self):
+        return self.buffer.count
+
+    def mean(self):
+        return self.buffer.sum(len(self.buffer)) / len(self.buffer)
+
+    def std(self):
+        n = len(self.buffer)
+        mean = self.mean()
+        s = 0
+        for i in range(n):
+            d = self.buffer.recent(n - 1 - i) - mean
+            s = s + d * d
+        return np.sqrt(s / n)
+
+    def state(self):
+        return self.buffer.state()
+
+    @classmethod
+    def from_state(cls, state:dict, lanes:int=None):
+        stats = cls(state['size'])
+        stats.buffer = RingBuffer.from_state(state, lanes)
+        return stats
+
+
+# Number of 1s among the last `size` pushed bits. The window is packed into an integer bitmask
+# and the count is updated with the bit that enters and the one that leaves, so a push is O(1).
+class BitWindow():
+    def __init__(self, size:int, lanes:int=None):
+        self.size = max(size, 1)  # a 0-day window behaves as a 1-day window, as the old list-based counters did
+        self.full_mask = (1 << self.size) - 1
+        self.mask = 0 if lanes is None else np.zeros(lanes, dtype=np.int64)
+        self.count = 0 if lanes is None else np.zeros(lanes, dtype=np.int64)
+
+    def push(self, bit):
+        oldest = (self.mask >> (self.size - 1)) & 1
+        self.mask = ((self.mask << 1) | bit) & self.full_mask
+        self.count = self.count + bit - oldest
+        return self.count
+
+    def state(self):
+        return {'size': self.size, 'mask': _plain(self.mask), 'count': _plain(self.count)}
+
+    @classmethod
+    def from_state(cls, state:dict, lanes:int=None):
+        window = cls(state['size'], lanes)
+        window.mask = _restore(state['mask'], lanes, np.int64)
+        window.count = _restore(state['count'], lanes, np.int64)
+        return window
+
+
+# Lags needed by the model: prices for the price target, gOHM prices for the volatility and the reinstate windows
+class Lags():
+    def __init__(self, target_ma:float, reinstate_window:int, initial_price, price_window:int=None, lanes:int=None):
+        self.target_ma = target_ma
+        self.initial_price = initial_price
+        self.prices = RingBuffer(price_window or int(target_ma) + 1)
+        self.gohm_prices = RollingStats(6)
+        self.bid_window = BitWindow(reinstate_window, lanes)
+        self.ask_window = BitWindow(reinstate_window, lanes)
+
+    def push(self, price, gohm_price):
+        self.prices.push(price)
+        self.gohm_prices.push(gohm_price)
+
+    def state(self):
+        return {'target_ma': self.target_ma, 'initial_price': _plain(self.initial_price), 'prices': self.prices.state(), 'gohm_prices': self.gohm_prices.state(),
+                'bid_window': self.bid_window.state(), 'ask_window': self.ask_window.state()}
+
+    @classmethod
+    def from_state(cls, state:dict, lanes:int=None):
+        lags = cls.__new__(cls)
+        lags.target_ma = state['target_ma']
+        lags.initial_price = _restore(state['initial_price'], lanes)
+        lags.prices = RingBuffer.from_state(state['prices'], lanes)
+        lags.gohm_prices = RollingStats.from_state(state['gohm_prices'], lanes)
+        lags.bid_window = BitWindow.from_state(state['bid_window'], lanes)
+        lags.ask_window = BitWindow.from_state(state['ask_window'], lanes)
+        return lags
+
+    # Moving average of the target_ma prices before the last one. Missing days are filled with the initial price.
+    def moving_average(self):
+        days = self.prices.count - 1
+        days_ma = int(self.target_ma)
+        if days > self.target_ma:
+            return self.prices.sum(days_ma, skip=1) / days_ma
+        return (self.prices.sum(days, skip=1) + self.initial_price * (self.target_ma - days)) / self.target_ma
@@ -0,0 +1,202 @@
+import json
+import numpy as np
+from collections import deque
+from typing import Dict, Iterator, List, Tuple
+
+from src.utils import ModelParams, Day, REPORT_FIELDS, DERIVED_FIELDS, core_fields, derive_field, initial_lags
+from src.rolling import Lags
+from src.rng import MarketStream, market_stream
+
+
+# Read-only view over one day of a Simulation: sim[day].price
+class SimulationDay():
+    __slots__ = ('_simulation', '_index')
+
+    def __init__(self, simulation, index:int):
+        self._simulation = simulation
+        self._index = index
+
+    def __getattr__(self, name:str):
+        try:
+            return self._simulation.column(name)[self._index]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self):
+        return f'SimulationDay(day={self._simulation.first_day + self._index})'
+
+
+# Trajectory of a simulation. Every stored field is a contiguous float64 column indexed by day (first_day -> position 0).
+# Derived fields (DERIVED_FIELDS) are computed from the stored columns the first time they are read.
+class Simulation():
+    def __init__(self, data:np.ndarray, fields:Tuple[str, ...]=REPORT_FIELDS, first_day:int=1):
+        if data.ndim != 2 or data.shape[0] != len(fields):
+            raise ValueError(f'Expected data of shape ({len(fields)}, days), got {data.shape}')
+        self.data = data
+        self.fields = tuple(fields)
+        self.first_day = first_day
+        self._columns = {field: i for i, field in enumerate(self.fields)}
+        self._derived = {}
+
+    @property
+    def days(self):
+        return self.data.shape[1]
+
+    def __len__(self):
+        return self.days
+
+    def __getitem__(self, day):
+        if isinstance(day, str) and day.startswith('day'):  # legacy 'day{i}' keys
+            day = int(day[3:])
+        if not isinstance(day, (int, np.integer)) or not self.first_day <= day < self.first_day + self.days:
+            raise KeyError(day)
+        return SimulationDay(self, int(day) - self.first_day)
+
+    def __iter__(self):
+        for i in range(self.days):
+            yield SimulationDay(self, i)
+
+    def items(self):
+        for i in range(self.days):
+            yield f'day{self.first_day + i}', SimulationDay(self, i)
+
+    # Zero-copy access to a whole field
+    def column(self, name:str) -> np.ndarray:
+        if name in self._columns:
+            return self.data[self._columns[name]]
+        if name not in self._derived:
+            if name not in DERIVED_FIELDS or any(source not in self._columns for source in DERIVED_FIELDS[name]):
+                raise KeyError(name)
+            self._derived[name] = derive_field(name, self.column)
+        return self._derived[name]
+
+    # First day the price closes at 0 (see is_absorbed): every later day keeps a price, k and mcap of 0. None if it never happens.
+    @property
+    def absorbed_day(self):
+        absorbed = np.flatnonzero(self.column('price') == 0)
+        return int(self.first_day + absorbed[0]) if len(absorbed) else None
+
+    # This trajectory followed by the days of `other`, e.g. the days added by resume()
+    def extend(self, other):
+        if other.fields != self.fields or other.first_day != self.first_day + self.days:
+            raise ValueError(f'Cannot extend days {self.first_day}-{self.first_day + self.days - 1} with days starting at {other.first_day}')
+        return Simulation(np.concatenate([self.data, other.data], axis=1), self.fields, self.first_day)
+
+
+# Number of days simulated for a horizon (day 1 to horizon - 1). historical_net_flows[i-1] drives day i, so the flows can shorten it.
+def simulation_days(params:ModelParams, historical_net_flows:List[float]=None) -> int:
+    if historical_net_flows is None:
+        return max(params.horizon - 1, 1)
+    return max(min(params.horizon, len(historical_net_flows) - 1) - 1, 1)
+
+
+# A running simulation: the last simulated day, the rolling windows and the market stream, which is all the next day needs.
+# Only that state is kept alive, so memory is O(window) whatever the horizon. A snapshot can be taken after any day and resumed
+# later, even with a longer horizon, giving the same days as an uninterrupted run.
+# The market randomness comes from the simulation's own stream (params.random_stream), never from the global `random` state.
+class SimulationRun():
+    def __init__(self, params:ModelParams, historical_net_flows:List[float]=None, net_flow_shocks:Dict[int, float]=None):
+        self.params = params
+        self.historical_net_flows = historical_net_flows
+        self.net_flow_shocks = net_flow_shocks or {}  # {day: extra net flow}, see src/fork.py
+        self.lags = initial_lags(params)
+        self.stream = market_stream(params)
+        self.draws = deque()  # market draws already taken from the stream, for the next days
+        self.last_day = None
+
+    # Last simulated day (0 before the first step)
+    @property
+    def day(self) -> int:
+        return 0 if self.last_day is None else self.last_day.day
+
+    # Last day of the horizon
+    @property
+    def days(self) -> int:
+        return simulation_days(self.params, self.historical_net_flows)
+
+    def step(self) -> Day:
+        i = self.day
+        draws = None
+        if i > 0:
+            if not self.draws:  # draw the rest of the horizon at once
+                self.draws.extend(self.stream.draws(max(self.days - i, 1)).tolist())
+            draws = self.draws.popleft()
+
+        self.last_day = Day(params=self.params, lags=self.lags, prev_day=self.last_day, historical_net_flows=None if self.historical_net_flows is None else self.historical_net_flows[i], draws=draws,
+                            net_flow_shock=self.net_flow_shocks.get(i + 1))
+        return self.last_day
+
+    # Steps up to the horizon, or up to day `until`
+    def iterate(self, until:int=None) -> Iterator[Day]:
+        last = self.days if until is None else min(until, self.days)
+        while self.day < last:
+            yield self.step()
+
+    def __iter__(self) -> Iterator[Day]:
+        return self.iterate()
+
+    # Simulates the remaining days (or up to day `until`) and keeps their reported fields
+    def simulate(self, fields:Tuple[str, ...]=REPORT_FIELDS, until:int=None) -> Simulation:
+        fields = core_fields(fields)
+        first_day = self.day + 1
+        last = self.days if until is None else min(until, self.days)
+        data = np.empty((len(fields), max(last - self.day, 0)))
+        for i, day in enumerate(self.iterate(until)):
+            for j, field in enumerate(fields):
+                data[j, i] = getattr(day, field)
+
+        return Simulation(data, fields, first_day)
+
+    # State after the last simulated day, as plain python values (JSON-serializable). The historical net flows are an input and are not stored.
+    def snapshot(self) -> dict:
+        return {
+            'params': {name: value.item() if isinstance(value, np.generic) else value for name, value in vars(self.params).items()},
+            'day': None if self.last_day is None else self.last_day.state(),
+            'lags': self.lags.state(),
+            'stream': self.stream.state(),
+            'draws': [list(row) for row in self.draws],
+        }
+
+    # Run restored from a snapshot. `horizon` extends (or shortens) the horizon of the snapshot params.
+    # `params` replaces the snapshot params (what-if branches, see src/fork.py).
+    @classmethod
+    def from_snapshot(cls, snapshot:dict, horizon:int=None, historical_net_flows:List[float]=None, params:ModelParams=None, net_flow_shocks:Dict[int, float]=None):
+        params = ModelParams(**(snapshot['params'] if params is None else vars(params)))
+        if horizon is not None:
+            params.horizon = horizon
+
+        run = cls.__new__(cls)
+        run.params = params
+        run.historical_net_flows = historical_net_flows
+        run.net_flow_shocks = net_flow_shocks or {}
+        run.lags = Lags.from_state(snapshot['lags'])
+        run.stream = MarketStream.from_state(snapshot['stream'])
+        run.draws = deque(snapshot['draws'])
+        run.last_day = None if snapshot['day'] is None else Day.from_state(snapshot['day'])
+        return run
+
+
+def save_snapshot(snapshot:dict, path:str):
+    with open(path, 'w') as f:
+        json.dump(snapshot, f)
+
+
+def load_snapshot(path:str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+# Step a simulation one day at a time
+def simulate_iter(params:ModelParams, historical_net_flows:List[float]=None) -> Iterator[Day]:
+    return iter(SimulationRun(params, historical_net_flows))
+
+
+# Simulate scenario with market operations and keep the reported fields of every day
+def simulate(params:ModelParams, historical_net_flows:List[float]=None, fields:Tuple[str, ...]=REPORT_FIELDS) -> Simulation:
+    return SimulationRun(params, historical_net_flows).simulate(fields)
+
+
+# Simulate the days after a snapshot, up to `horizon` (the snapshot's own horizon by default). Bit-identical to the same days of an uninterrupted run,
+# so a stored 365-day sweep can be extended to 730 days by simulating only the new days: sim.extend(resume(snapshot, horizon=730)).
+def resume(snapshot:dict, horizon:int=None, historical_net_flows:List[float]=None, fields:Tuple[str, ...]=REPORT_FIELDS) -> Simulation:
+    return SimulationRun.from_snapshot(snapshot, horizon, historical_net_flows).simulate(fields)
@@ -0,0 +1,694 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+import re
+import sqlite3
+import string
+import threading
+import time
+import uuid
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_for
+from typing import TYPE_CHECKING, Dict, Iterator, List, Tuple
+
+from src.handoff import sink_rows
+
+if TYPE_CHECKING:  # annotations only, the code imports them lazily
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+
+# -- SINKS ---
+# A sink writes rows in two steps, so the runner can run them on separate pipeline stages (src/pipeline.py):
+# encode(rows) -> payload (CPU: serialization, compression) and upload(payload) (I/O). Rows come as a DataFrame, or as a
+# pyarrow Table for the sinks with arrow = True (no conversion from pandas, trial keys stay dictionary-encoded).
+# Every call gets the rows of a whole task (or part of a task), so each sink writes a batch at a time: one appended block of
+# CSV text, one Parquet file, one SQLite transaction. The payload has a length in bytes, or an nbytes size.
+# upload() returns once the rows are written, or returns a Future done once they are (BigQuerySink, which loads the rows of
+# several tasks at once in the background): such a sink also has flush(wait=False), which starts loading the rows it holds.
+class Sink():
+    arrow = False
+
+    # Rows in any form (DataFrame, Arrow table, worker output), e.g. the outputs merged by a LeaseBoard
+    def write(self, rows):
+        self.upload(self.encode(sink_rows(self, rows)))
+
+
+class CsvSink(Sink):
+    def __init__(self, path:str):
+        self.path = path
+
+    @staticmethod
+    def encode(frame:pd.DataFrame) -> str:
+        return frame.to_csv(index=False)
+
+    # Appends the rows, with the header line only if the file is new
+    def upload(self, text:str):
+        new = not os.path.exists(self.path)
+        with open(self.path, 'a') as f:
+            f.write(text if new else text.partition('\n')[2])
+
+
+# Loads into a BigQuery table with a schema generated from the result columns (no autodetection). Loads are idempotent: a batch
+# goes to a staging table first and is merged into the table on key (and day), so the rows of a task written again (resumed or
+# repeated sweep, task taken over from another host) replace the earlier ones instead of being appended twice. A merge fails
+# instead when a stored row of the same key has other values in the `guard` columns (the seed and configuration of a summary
+# row): the rows come from another sweep whose keys collide with these, and replacing them would lose its results.
+# The rows of several tasks go in one Parquet load job of up to `batch_bytes` (load jobs per table and day are limited), started
+# once the batch is full, `max_wait` seconds after its first rows, or when the pipeline has nothing else to write. Up to
+# `concurrency` batches are serialized and loaded at once on background threads, and upload() blocks while they all are, so
+# the pipeline queues fill up. The merges into the table run one at a time (concurrent DML statements on a table conflict).
+# `client` is a BigQueryTables (the default) or anything with the same methods, e.g. a LocalBigQuery.
+BIGQUERY_BATCH_BYTES = 64_000_000  # of Arrow rows
+BIGQUERY_LOADS = 3
+BIGQUERY_MAX_WAIT = 30.0  # seconds
+BIGQUERY_MERGE_KEYS = ('key', 'day')
+BIGQUERY_STAGING_TTL = 24 * 3600  # seconds: staging tables left by a crash expire
+
+
+class BigQuerySink(Sink):
+    arrow = True
+
+    def __init__(self, table_id:str, batch_bytes:int=BIGQUERY_BATCH_BYTES, concurrency:int=BIGQUERY_LOADS, max_wait:float=BIGQUERY_MAX_WAIT, client=None,
+                 guard:List[str]=()):
+        self.table_id = table_id
+        self.guard = list(guard)
+        self.batch_bytes = batch_bytes
+        self.max_wait = max_wait
+        self.client = client or BigQueryTables()
+        self.loaders = ThreadPoolExecutor(concurrency, thread_name_prefix='bigquery-load')
+        self.slots = threading.Semaphore(concurrency)
+        self.lock = threading.Lock()
+        self.merge_lock = threading.Lock()
+        self.batch = []  # (Arrow IPC buffer, Future of its upload) of the batch not loaded yet
+        self.batch_size = 0
+        self.batch_start = None
+        self.loads = set()  # futures of the running loads
+        self.created = False  # the target table exists
+
+    # A copy of the rows (worker rows are released once encoded): the loader serializes its batch to Parquet
+    @staticmethod
+    def encode(table:pa.Table) -> pa.Buffer:
+        return arrow_buffer(table)
+
+    # Future of the load of the payload, with the seconds of its share of the load as result
+    def upload(self, payload:pa.Buffer) -> Future:
+        loaded = Future()
+        with self.lock:
+            self.batch.append((payload, loaded))
+            self.batch_size += payload.size
+            self.batch_start = self.batch_start or time.time()
+            full = self.batch_size >= self.batch_bytes or time.time() - self.batch_start >= self.max_wait
+        if full:
+            self.flush()
+        return loaded
+
+    # Start loading the rows of the batch (blocks while `concurrency` loads run), and wait for every load when `wait`
+    def flush(self, wait:bool=False):
+        with self.lock:
+            batch, self.batch, self.batch_size, self.batch_start = self.batch, [], 0, None
+        if batch:
+            self.slots.acquire()
+            load = self.loaders.submit(self._load, batch)
+            with self.lock:
+                self.loads.add(load)
+            load.add_done_callback(self._loaded)
+        if wait:
+            with self.lock:
+                loads = list(self.loads)
+            wait_for(loads)
+
+    # Rows in any form, loaded before returning (the merge of a LeaseBoard)
+    def write(self, rows):
+        loaded = self.upload(self.encode(sink_rows(self, rows)))
+        self.flush()
+        loaded.result()
+
+    def _load(self, batch:List[Tuple[pa.Buffer, Future]]):
+        try:
+            start = time.perf_counter()
+            tables = [read_arrow_buffer(payload) for payload, _ in batch]
+            parquet = parquet_batch(tables, 'snappy')
+            schema = bigquery_schema(tables[0].schema)
+            columns = [name for name, _ in schema]
+            keys = [column for column in BIGQUERY_MERGE_KEYS if column in columns]
+            guard = [column for column in self.guard if column in columns]
+            staging = f'{self.table_id}_staging_{uuid.uuid4().hex[:12]}'
+            self.client.create_table(staging, schema, expires=BIGQUERY_STAGING_TTL)
+            try:
+                self.client.load_parquet(parquet, staging, schema)
+                with self.merge_lock:
+                    if not self.created:
+                        self.client.create_table(self.table_id, schema, clustering=keys)
+                        self.created = True
+                    self.client.merge(staging, self.table_id, columns, keys, guard)
+            finally:
+                self.client.delete_table(staging)
+        except Exception as error:
+            for _, loaded in batch:
+                loaded.set_exception(error)
+            return
+        finally:
+            self.slots.release()
+        seconds, size = time.perf_counter() - start, sum(payload.size for payload, _ in batch)
+        for payload, loaded in batch:
+            loaded.set_result(seconds * payload.size / size)
+
+    def _loaded(self, load:Future):
+        with self.lock:
+            self.loads.discard(load)
+
+
+# The BigQuery operations of a BigQuerySink, over a google.cloud.bigquery client. Schemas are [(column, BigQuery type)].
+class BigQueryTables():
+    def __init__(self, client=None, location:str='US'):
+        from google.cloud import bigquery  # only needed to upload
+        self.bigquery = bigquery
+        self.client = client or bigquery.Client()
+        self.location = location
+
+    # Create the table unless it exists, and add the columns of `schema` that an existing table lacks (a table written before
+    # a result column was added, e.g. absorbedDay). expires: seconds
+    def create_table(self, table_id:str, schema:List[Tuple[str, str]], clustering:List[str]=None, expires:float=None):
+        import datetime
+        table = self.bigquery.Table(table_id, schema=self._schema(schema))
+        if clustering:
+            table.clustering_fields = list(clustering)
+        if expires:
+            table.expires = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=expires)
+        table = self.client.create_table(table, exists_ok=True)
+        names = {field.name for field in table.schema}
+        missing = [field for field in self._schema(schema) if field.name not in names]
+        if missing:
+            table.schema = list(table.schema) + missing
+            self.client.update_table(table, ['schema'])
+
+    def load_parquet(self, payload:bytes, table_id:str, schema:List[Tuple[str, str]]):
+        job_config = self.bigquery.LoadJobConfig(schema=self._schema(schema), source_format=self.bigquery.SourceFormat.PARQUET, write_disposition='WRITE_APPEND')
+        self.client.load_table_from_file(io.BytesIO(payload), table_id, job_config=job_config, location=self.location).result()
+
+    def merge(self, staging_id:str, table_id:str, columns:List[str], keys:List[str], guard:List[str]=()):
+        self.client.query(merge_query(staging_id, table_id, columns, keys, guard), location=self.location).result()
+
+    def delete_table(self, table_id:str):
+        self.client.delete_table(table_id, not_found_ok=True)
+
+    def _schema(self, schema:List[Tuple[str, str]]) -> list:
+        return [self.bigquery.SchemaField(name, kind) for name, kind in schema]
+
+
+# Rows of `staging_id` replace the rows of `table_id` with the same keys, and are inserted where there are none. Rows repeated in
+# the staging table (a batch with the same task twice) are merged once: MERGE fails when several rows match a row of the table.
+# With `guard` columns, an assert first fails the script (and nothing is merged) when a matched row has other values in them.
+def merge_query(staging_id:str, table_id:str, columns:List[str], keys:List[str], guard:List[str]=()) -> str:
+    on = ' and '.join(f'target.`{key}` = staging.`{key}`' for key in keys)
+    partition = ', '.join(f'`{key}`' for key in keys)
+    updates = ', '.join(f'`{column}` = staging.`{column}`' for column in columns if column not in keys)
+    assertion = ''
+    if guard:
+        differs = ' or '.join(f'target.`{column}` is distinct from staging.`{column}`' for column in guard)
+        assertion = (f"assert not exists (select 1 from `{table_id}` target join `{staging_id}` staging on {on} where {differs})\n"
+                     f"as 'Rows of {table_id} have other values of {', '.join(guard)} under the same keys: they come from another sweep';\n")
+    return (assertion + f"merge `{table_id}` target\n"
+            f"using (select * from `{staging_id}` where true qualify row_number() over (partition by {partition}) = 1) staging\n"
+            f"on {on}\n"
+            + (f"when matched then update set {updates}\n" if updates else '')
+            + f"when not matched then insert ({', '.join(f'`{column}`' for column in columns)}) values ({', '.join(f'staging.`{column}`' for column in columns)})")
+
+
+# A BigQuery project in this process, with the methods of BigQueryTables: tests and offline runs of a BigQuerySink.
+# Tables are Arrow tables; loads are checked against the schema of their table, and merges replace the rows with the same keys.
+class LocalBigQuery():
+    def __init__(self):
+        self.tables = {}  # table id -> pa.Table, None while empty
+        self.schemas = {}
+        self.jobs = []  # (operation, table id), in order
+        self.lock = threading.Lock()
+
+    def create_table(self, table_id:str, schema:List[Tuple[str, str]], clustering:List[str]=None, expires:float=None):
+        import pyarrow as pa
+        with self.lock:
+            self.jobs.append(('create', table_id))
+            if table_id not in self.tables:
+                self.tables[table_id], self.schemas[table_id] = None, list(schema)
+                return
+            missing = [(name, kind) for name, kind in schema if name not in dict(self.schemas[table_id])]
+            self.schemas[table_id] += missing
+            table = self.tables[table_id]
+            for name, kind in missing if table is not None else ():
+                table = table.append_column(name, pa.nulls(len(table), pa.type_for_alias(LOCAL_BIGQUERY_TYPES[kind])))
+            self.tables[table_id] = table
+
+    def load_parquet(self, payload:bytes, table_id:str, schema:List[Tuple[str, str]]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pq.read_table(pa.BufferReader(payload))
+        with self.lock:
+            self.jobs.append(('load', table_id))
+            if table_id not in self.tables:
+                raise ValueError(f'Not found: table {table_id}')
+            if bigquery_schema(table.schema) != self.schemas[table_id] or list(schema) != self.schemas[table_id]:
+                raise ValueError(f'Schema of the rows {bigquery_schema(table.schema)} does not match the table {table_id}: {self.schemas[table_id]}')
+            self.tables[table_id] = table if self.tables[table_id] is None else pa.concat_tables([self.tables[table_id], table])
+
+    def merge(self, staging_id:str, table_id:str, columns:List[str], keys:List[str], guard:List[str]=()):
+        import pandas as pd
+        import pyarrow as pa
+        with self.lock:
+            self.jobs.append(('merge', table_id))
+            frames = [self.tables[table_id].to_pandas()] if self.tables[table_id] is not None else []
+            if guard and frames and self.tables[staging_id] is not None:
+                matched = frames[0][keys + guard].merge(self.tables[staging_id].to_pandas()[keys + guard], on=keys)
+                if any((matched[f'{column}_x'] != matched[f'{column}_y']).any() for column in guard):
+                    raise ValueError(f'Rows of {table_id} have other values of {", ".join(guard)} under the same keys: they come from another sweep')
+            if self.tables[staging_id] is not None:
+                frames.append(self.tables[staging_id].to_pandas()[columns].drop_duplicates(keys))
+            if frames:
+                merged = pd.concat(frames, ignore_index=True).drop_duplicates(keys, keep='last')
+                self.tables[table_id] = pa.Table.from_pandas(merged, preserve_index=False)
+
+    def delete_table(self, table_id:str):
+        with self.lock:
+            self.jobs.append(('delete', table_id))
+            self.tables.pop(table_id, None)
+            self.schemas.pop(table_id, None)
+
+    def table(self, table_id:str) -> pa.Table:
+        return self.tables[table_id]
+
+
+LOCAL_BIGQUERY_TYPES = {'BOOL': 'bool', 'INT64': 'int64', 'FLOAT64': 'float64', 'STRING': 'string', 'TIMESTAMP': 'timestamp[us]', 'DATE': 'date32'}
+
+
+# BigQuery schema of Arrow columns: [(column, type)]. Dictionary-encoded columns have the type of their values.
+def bigquery_schema(schema:pa.Schema) -> List[Tuple[str, str]]:
+    import pyarrow as pa
+    columns = []
+    for field in schema:
+        kind = field.type.value_type if pa.types.is_dictionary(field.type) else field.type
+        for is_type, name in ((pa.types.is_boolean, 'BOOL'), (pa.types.is_integer, 'INT64'), (pa.types.is_floating, 'FLOAT64'), (pa.types.is_string, 'STRING'),
+                              (pa.types.is_large_string, 'STRING'), (pa.types.is_timestamp, 'TIMESTAMP'), (pa.types.is_date, 'DATE')):
+            if is_type(kind):
+                columns.append((field.name, name))
+                break
+        else:
+            raise ValueError(f'No BigQuery type for the column {field.name} ({field.type})')
+    return columns
+
+
+# A directory of Parquet files, one per batch. Files appear atomically, and every run writes its own files, so a resumed
+# sweep adds to the directory. Read back with pandas.read_parquet(directory) or src.sinks.read_trials('parquet:<directory>').
+class ParquetSink(Sink):
+    arrow = True
+
+    def __init__(self, directory:str):
+        self.directory = directory
+        self.prefix = f"part-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self.files = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def encode(table:pa.Table) -> bytes:
+        return parquet_bytes(table, 'snappy')
+
+    def upload(self, payload:bytes):
+        _write_atomic(os.path.join(self.directory, f'{self.prefix}-{self.files:06d}.parquet'), payload)
+        self.files += 1
+
+
+# A table of a SQLite database, created from the columns of the first batch. Each batch is inserted in one transaction
+# (executemany over the columns of the batch), on a connection of its own so the write stage can run on any thread.
+class SqliteSink(Sink):
+    def __init__(self, path:str, table:str):
+        self.path = path
+        self.table = table
+
+    @staticmethod
+    def encode(frame:pd.DataFrame) -> SqliteBatch:
+        types = {column: SQLITE_TYPES.get(dtype.kind, 'TEXT') for column, dtype in frame.dtypes.items()}
+        rows = list(zip(*(frame[column].tolist() for column in frame.columns)))
+        return SqliteBatch(types, rows, int(frame.memory_usage(index=False).sum()))
+
+    def upload(self, batch:SqliteBatch):
+        table = _quote(self.table)
+        columns = ', '.join(_quote(column) for column in batch.types)
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                connection.execute(f"create table if not exists {table} ({', '.join(f'{_quote(column)} {kind}' for column, kind in batch.types.items())})")
+                connection.executemany(f"insert into {table} ({columns}) values ({', '.join('?' * len(batch.types))})", batch.rows)
+        finally:
+            connection.close()
+
+
+SQLITE_TYPES = {'i': 'INTEGER', 'u': 'INTEGER', 'b': 'INTEGER', 'f': 'REAL'}
+
+
+# Rows of a batch to insert, with the SQLite type of each column
+class SqliteBatch():
+    def __init__(self, types:Dict[str, str], rows:List[tuple], nbytes:int):
+        self.types = types
+        self.rows = rows
+        self.nbytes = nbytes
+
+
+# Keeps the rows in this process, as Arrow IPC buffers (a copy, since worker rows are released once encoded):
+# tests, notebooks and sweeps too small to store
+class MemorySink(Sink):
+    arrow = True
+
+    def __init__(self):
+        self.batches = []
+
+    @staticmethod
+    def encode(table:pa.Table) -> pa.Buffer:
+        return arrow_buffer(table)
+
+    def upload(self, payload:pa.Buffer):
+        self.batches.append(payload)
+
+    # Every row written so far, dictionary-encoded columns decoded
+    def table(self) -> pa.Table:
+        import pyarrow as pa
+        tables = [read_arrow_buffer(batch) for batch in self.batches]
+        tables = [table.cast(pa.schema([pa.field(field.name, field.type.value_type if pa.types.is_dictionary(field.type) else field.type) for field in table.schema]))
+                  for table in tables]
+        return pa.concat_tables(tables, promote_options='permissive')
+
+    def frame(self) -> pd.DataFrame:
+        return self.table().to_pandas()
+
+
+# A Parquet dataset of one result table, laid out for the slices the analyses read ("trial t of seeds 0-1000"):
+#   <root>/_dataset.json                                   layout (seeds per bucket, sort order)
+#   <root>/sweep=<sweep name>/seed_bucket=<seed // seeds per bucket>/part-....parquet
+# Files are zstd-compressed, sorted by (trial, seed, day) and cut in small row groups, and integer seed and trial columns
+# (parsed from the keys with the sweep key format) follow the string key. read_dataset() skips the directories of other
+# sweeps and seed buckets, then the row groups whose trial and seed statistics don't match.
+DATASET_SEEDS_PER_BUCKET = 100
+DATASET_ROW_GROUP = 4096  # rows: about 11 trials of daily rows, the unit read for a one-trial slice
+DATASET_SORT = ('trial', 'seed', 'day')
+
+
+class DatasetSink(Sink):
+    arrow = True
+
+    def __init__(self, root:str, sweep:str=None, key_format:str='{seed}_{trial}', seeds_per_bucket:int=DATASET_SEEDS_PER_BUCKET):
+        self.root = root
+        self.sweep = sweep or 'sweep'
+        self.key_pattern = key_pattern(key_format)
+        self.seeds_per_bucket = seeds_per_bucket
+        self.prefix = f"part-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self.files = 0
+        layout = _read_layout(root)
+        if layout is not None and layout['seeds_per_bucket'] != seeds_per_bucket:
+            raise ValueError(f"The dataset {root} has {layout['seeds_per_bucket']} seeds per bucket, not {seeds_per_bucket}")
+
+    # One sorted zstd Parquet file per seed bucket of the rows
+    def encode(self, table:pa.Table) -> DatasetBatch:
+        table = self.with_ids(table)
+        sort = [(column, 'ascending') for column in DATASET_SORT if column in table.column_names]
+        buckets = table['seed'].to_numpy() // self.seeds_per_bucket
+        distinct = np.unique(buckets)
+        files = {}
+        for bucket in distinct:
+            rows = table if len(distinct) == 1 else table.filter(buckets == bucket)  # a task has a single seed
+            files[int(bucket)] = parquet_bytes(rows.sort_by(sort), 'zstd', DATASET_ROW_GROUP)
+        return DatasetBatch(files)
+
+    def upload(self, batch:DatasetBatch):
+        if _read_layout(self.root) is None:
+            os.makedirs(self.root, exist_ok=True)
+            _write_atomic(os.path.join(self.root, '_dataset.json'), json.dumps({'seeds_per_bucket': self.seeds_per_bucket, 'sort': DATASET_SORT}).encode())
+        for bucket, payload in batch.files.items():
+            directory = os.path.join(self.root, f'sweep={self.sweep}', f'seed_bucket={bucket}')
+            os.makedirs(directory, exist_ok=True)
+            _write_atomic(os.path.join(directory, f'{self.prefix}-{self.files:06d}.parquet'), payload)
+            self.files += 1
+
+    # Rows with integer seed and trial columns after the key (dictionary-encoded: each distinct key is parsed once)
+    def with_ids(self, table:pa.Table) -> pa.Table:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        key = table['key'].combine_chunks()
+        if not pa.types.is_dictionary(key.type):
+            key = pc.dictionary_encode(key)
+        ids = np.array([self._parse(name) for name in key.dictionary.to_pylist()], dtype=np.int64).reshape(-1, 2)
+        codes = key.indices.to_numpy(zero_copy_only=False)
+        columns = {'key': key, 'seed': ids[codes, 0], 'trial': ids[codes, 1]}
+        columns.update({name: table[name] for name in table.column_names if name not in columns})
+        return pa.table(columns)
+
+    def _parse(self, key:str) -> Tuple[int, int]:
+        match = self.key_pattern.fullmatch(key)
+        if match is None:
+            raise ValueError(f'Key {key!r} does not match the key format of the sweep ({self.key_pattern.pattern})')
+        return int(match['seed']), int(match['trial'])
+
+
+# Parquet files of a batch, by seed bucket
+class DatasetBatch():
+    def __init__(self, files:Dict[int, bytes]):
+        self.files = files
+        self.nbytes = sum(len(payload) for payload in files.values())
+
+
+# Regular expression of the keys of a key format, e.g. '{seed}_{trial:03d}' -> (?P<seed>-?\d+)_(?P<trial>-?\d+)
+def key_pattern(key_format:str) -> re.Pattern:
+    pattern = ''
+    for literal, field, _, _ in string.Formatter().parse(key_format):
+        pattern += re.escape(literal)
+        if field is not None:
+            if field not in ('seed', 'trial'):
+                raise ValueError(f'Unknown field {field!r} in the key format {key_format!r}. Expected seed and trial')
+            pattern += f'(?P<{field}>-?\\d+)'
+    return re.compile(pattern)
+
+
+def _read_layout(root:str) -> dict:
+    try:
+        with open(os.path.join(root, '_dataset.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+# Write a complete file under its final name in one step (the temporary file is hidden from dataset readers)
+def _write_atomic(path:str, payload:bytes):
+    directory, name = os.path.split(path)
+    tmp = os.path.join(directory, f'.{name}.{os.getpid()}.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp, path)
+
+
+# Bytes of an encoded payload: its nbytes size when it has one, its length otherwise (bytes, text, Arrow buffers)
+def payload_size(payload) -> int:
+    return payload.nbytes if hasattr(payload, 'nbytes') else len(payload)
+
+
+def parquet_bytes(table:pa.Table, compression:str, row_group_size:int=None) -> bytes:
+    import pyarrow.parquet as pq
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression=compression, row_group_size=row_group_size)
+    return buffer.getvalue()
+
+
+# One Parquet file of several tables with the same columns, dictionary-encoded columns decoded (the tables of different tasks
+# have different dictionaries)
+def parquet_batch(tables:List[pa.Table], compression:str) -> bytes:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = pa.schema([pa.field(field.name, field.type.value_type if pa.types.is_dictionary(field.type) else field.type) for field in tables[0].schema])
+    buffer = io.BytesIO()
+    with pq.ParquetWriter(buffer, schema, compression=compression) as writer:
+        for table in tables:
+            writer.write_table(table.cast(schema))
+    return buffer.getvalue()
+
+
+# A copy of the rows as one Arrow IPC stream
+def arrow_buffer(table:pa.Table) -> pa.Buffer:
+    import pyarrow as pa
+    stream = pa.BufferOutputStream()
+    with pa.ipc.new_stream(stream, table.schema) as writer:
+        writer.write_table(table)
+    return stream.getvalue()
+
+
+def read_arrow_buffer(buffer:pa.Buffer) -> pa.Table:
+    import pyarrow as pa
+    return pa.ipc.open_stream(buffer).read_all()
+
+
+def _quote(name:str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+SINK_TYPES = {'bigquery': BigQuerySink, 'csv': CsvSink, 'parquet': ParquetSink, 'dataset': DatasetSink, 'sqlite': SqliteSink, 'memory': MemorySink}
+SINK_SPECS = 'bigquery[:<table id>], csv:<path>, parquet:<directory>, dataset:<directory>, sqlite:<path>[#<table>] or memory'
+
+
+# Sink of a spec: 'bigquery' (the sweep table), 'bigquery:<table id>', 'csv:<path>', 'parquet:<directory>', 'dataset:<directory>'
+# (partitioned by the name of `sweep`, keys parsed with its key format), 'sqlite:<path>' (a table named after the sweep table),
+# 'sqlite:<path>#<table>' or 'memory'. batch_bytes and concurrency: loads of a BigQuerySink, guarded by the seed and configuration
+# columns of `sweep`
+def open_sink(spec:str, table_id:str, sweep=None, batch_bytes:int=BIGQUERY_BATCH_BYTES, concurrency:int=BIGQUERY_LOADS) -> Sink:
+    kind, _, target = spec.partition(':')
+    if kind not in SINK_TYPES or (not target and kind in ('csv', 'parquet', 'dataset', 'sqlite')):
+        raise ValueError(f'Unknown sink: {spec}. Expected {SINK_SPECS}')
+    if kind == 'bigquery':
+        return BigQuerySink(target or table_id, batch_bytes, concurrency, guard=sweep.config_columns if sweep else ())
+    if kind == 'dataset':
+        return DatasetSink(target, sweep and sweep.name, sweep.key_format if sweep else '{seed}_{trial}')
+    if kind == 'sqlite':
+        path, _, table = target.partition('#')
+        return SqliteSink(path, table or table_id.rsplit('.', 1)[-1])
+    if kind == 'memory':
+        return MemorySink()
+    return SINK_TYPES[kind](target)
+
+
+# Encoding of a sink spec, without connecting to it (dry runs)
+def sink_encoder(spec:str, sweep=None):
+    kind = spec.partition(':')[0]
+    if kind not in SINK_TYPES:
+        raise ValueError(f'Unknown sink: {spec}. Expected {SINK_SPECS}')
+    sink = open_sink(spec, '', sweep) if kind == 'dataset' else SINK_TYPES[kind]  # the dataset encoding depends on the key format, opening it writes nothing
+    return lambda rows: sink.encode(sink_rows(sink, rows))
+
+
+# -- SOURCES ---
+# Rows of a DatasetSink dataset, as a pyarrow Table: only the files of `sweep` (every sweep when None) and of the seed buckets of
+# `seeds` are opened, and only their row groups whose statistics may match the seeds and trials are read.
+# `filter` is any further pyarrow.dataset expression, e.g. pyarrow.dataset.field('day') <= 30.
+def read_dataset(root:str, sweep:str=None, seeds:List[int]=None, trials:List[int]=None, columns:List[str]=None, filter=None) -> pa.Table:
+    return dataset_scanner(root, sweep, seeds, trials, columns, filter).to_table()
+
+
+# Scan of the rows of a DatasetSink dataset (see read_dataset), to read as a table or as record batches of up to `batch_rows` rows
+def dataset_scanner(root:str, sweep:str=None, seeds:List[int]=None, trials:List[int]=None, columns:List[str]=None, filter=None,
+                    batch_rows:int=None) -> ds.Scanner:
+    import pyarrow.dataset as ds
+    layout = _read_layout(root)
+    if layout is None:
+        raise ValueError(f'{root} is not a dataset written by DatasetSink (no _dataset.json)')
+    dataset = ds.dataset(root, format='parquet', partitioning='hive')
+    conditions = [] if filter is None else [filter]
+    if sweep is not None:
+        conditions.append(ds.field('sweep') == sweep)
+    if seeds is not None:
+        seeds = [int(seed) for seed in seeds]
+        conditions.append(ds.field('seed_bucket').isin(sorted({seed // layout['seeds_per_bucket'] for seed in seeds})))
+        conditions.append(ds.field('seed').isin(seeds))
+    if trials is not None:
+        conditions.append(ds.field('trial').isin([int(trial) for trial in trials]))
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    columns = columns or [name for name in dataset.schema.names if name not in ('sweep', 'seed_bucket')]
+    return dataset.scanner(columns=columns, filter=expression, **({'batch_size': batch_rows} if batch_rows else {}))
+
+
+# Summary rows of `seeds` as a stream of pyarrow RecordBatches of about `batch_rows` rows, from the same specs as read_trials():
+# the first batches can be used while the next ones are still read. BigQuery rows are queried once for every seed and read
+# with the BigQuery Storage API, ordered by seed and key; local files are read in their order, one block at a time.
+# A generator: nothing is read before the first batch is asked for.
+TRIAL_BATCH_ROWS = 10_000
+
+
+def stream_trials(spec:str, table_id:str, seeds:List[int], sweep:str=None, batch_rows:int=TRIAL_BATCH_ROWS) -> Iterator[pa.RecordBatch]:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    kind, _, target = spec.partition(':')
+    seeds = [int(seed) for seed in seeds]
+    if kind == 'bigquery':
+        batches = _bigquery_batches(target or table_id, seeds)
+    elif kind == 'csv':
+        from pyarrow import csv
+        batches = csv.open_csv(target, read_options=csv.ReadOptions(block_size=batch_rows * 256))  # ~256 bytes per summary row
+    elif kind == 'parquet':
+        import pyarrow.dataset as ds
+        batches = ds.dataset(target, format='parquet').to_batches(filter=ds.field('seed').isin(seeds), batch_size=batch_rows)
+    elif kind == 'dataset':
+        batches = dataset_scanner(target, sweep or 'sweep', seeds, batch_rows=batch_rows).to_batches()
+    elif kind == 'sqlite':
+        batches = _sqlite_batches(target, table_id, batch_rows)
+    else:
+        raise ValueError(f"Unknown source: {spec}. Expected {SINK_SPECS.replace(' or memory', '')}")
+    value_set = pa.array(seeds, type=pa.int64())
+    for batch in batches:
+        if kind in ('csv', 'sqlite'):
+            batch = batch.filter(pc.is_in(batch.column('seed'), value_set=value_set))
+        if batch.num_rows:
+            yield batch
+
+
+# Query the summary rows of the seeds, then read the result table through one ordered read stream of the Storage API
+def _bigquery_batches(table_id:str, seeds:List[int]) -> Iterator[pa.RecordBatch]:
+    from google.cloud import bigquery, bigquery_storage
+    client = bigquery.Client()
+    query = f"""select * from `{table_id}` where seed in unnest(@seeds) order by seed, key asc"""
+    job_config = bigquery.QueryJobConfig(query_parameters=[bigquery.ArrayQueryParameter('seeds', 'INT64', seeds)])
+    job = client.query(query, job_config)
+    job.result()
+    table = job.destination
+    reader = bigquery_storage.BigQueryReadClient()
+    session = reader.create_read_session(
+        parent=f'projects/{client.project}', max_stream_count=1,
+        read_session=bigquery_storage.types.ReadSession(table=f'projects/{table.project}/datasets/{table.dataset_id}/tables/{table.table_id}',
+                                                        data_format=bigquery_storage.types.DataFormat.ARROW))
+    for stream in session.streams:
+        for page in reader.read_rows(stream.name).rows(session).pages:
+            yield page.to_arrow()
+
+
+def _sqlite_batches(target:str, table_id:str, batch_rows:int) -> Iterator[pa.RecordBatch]:
+    import pyarrow as pa
+    path, _, table = target.partition('#')
+    connection = sqlite3.connect(path)
+    try:
+        cursor = connection.execute(f'select * from {_quote(table or table_id.rsplit(".", 1)[-1])}')
+        names = [column[0] for column in cursor.description]
+        while True:
+            rows = cursor.fetchmany(batch_rows)
+            if not rows:
+                break
+            yield pa.RecordBatch.from_arrays([pa.array(values) for values in zip(*rows)], names=names)
+    finally:
+        connection.close()
+
+
+# Summary rows of `seeds` from 'bigquery' (the sweep table), 'bigquery:<table id>', 'csv:<path>', 'parquet:<directory>',
+# 'dataset:<directory>' (rows of the sweep named `sweep`) or 'sqlite:<path>[#<table>]': what a summary sink wrote
+def read_trials(spec:str, table_id:str, seeds:List[int], sweep:str=None) -> pd.DataFrame:
+    kind, _, target = spec.partition(':')
+    if kind == 'bigquery':
+        from google.cloud import bigquery
+        client = bigquery.Client()
+        query = f"""select * from `{target or table_id}` where seed in unnest(@seeds) order by seed, key asc"""
+        job_config = bigquery.QueryJobConfig(query_parameters=[bigquery.ArrayQueryParameter('seeds', 'INT64', list(seeds))])
+        return client.query(query, job_config).result().to_dataframe()
+
+    import pandas as pd
+    if kind == 'csv':
+        trials = pd.read_csv(target)
+    elif kind == 'parquet':
+        trials = pd.read_parquet(target, filters=[('seed', 'in', [int(seed) for seed in seeds])])
+        trials['key'] = trials['key'].astype(str)
+    elif kind == 'dataset':
+        trials = read_dataset(target, sweep or 'sweep', seeds).to_pandas()
+        trials['key'] = trials['key'].astype(str)
+    elif kind == 'sqlite':
+        path, _, table = target.partition('#')
+        connection = sqlite3.connect(path)
+        try:
+            trials = pd.read_sql_query(f'select * from {_quote(table or table_id.rsplit(".", 1)[-1])}', connection)
+        finally:
+            connection.close()
+    else:
+        raise ValueError(f"Unknown source: {spec}. Expected {SINK_SPECS.replace(' or memory', '')}")
+    return trials[trials['seed'].isin(seeds)].sort_values(['seed', 'key'])
@@ -0,0 +1,605 @@
+from __future__ import annotations
+
+import argparse
+import inspect
+import os
+import queue
+import threading
+import time
+import numpy as np
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Dict, Iterator, List, Tuple
+
+from src.utils import REPORT_FIELDS, ModelParams, core_fields
+from src.worker import DAILY_COLUMNS, SUMMARY_COLUMNS, TRIAL_COLUMNS, TRIAL_PARAMS, SweepTrials, daily_task, run_timed, summary_and_daily_task, summary_task
+from src.ledger import LedgerTask, SweepLedger
+from src.leases import LeaseBoard
+from src.pipeline import OutputPipeline
+from src.handoff import share_with_workers
+from src.sinks import BIGQUERY_BATCH_BYTES, BIGQUERY_LOADS, SINK_SPECS, SINK_TYPES, open_sink, sink_encoder, stream_trials
+from src.telemetry import SweepTelemetry, cold_start_line, measure_cold_start
+from src.planner import SweepPlan, WorkerBudget, measure_trial, order_by_cost, split_evenly, task_size
+
+if TYPE_CHECKING:  # annotations only, the code imports them lazily
+    import pandas as pd
+    import pyarrow as pa
+
+
+PRICE_FILE = os.path.join(os.path.dirname(__file__), 'price.txt')
+
+# -- SWEEP CONFIGURATIONS ---
+# ModelParams shared by every sweep (the constants of the old simulation_random_XX.py template)
+BASE_PARAMS = {
+    'random_stream': 'legacy',  # replay the draws of the python `random` module, as the results already stored in BigQuery did
+    'horizon': 365, 'short_cycle': 30, 'cycle_reweights': 1, 'long_cycle': 730, 'long_sin_offset': 2, 'long_cos_offset': 0, 'supply_amplitude': 0.8,
+    'target_price_function': 'price_moving_avg', 'demand_factor': 0.016, 'supply_factor': -0.016, 'arb_factor': 0, 'release_capture': 0,
+    'max_outflow_rate': 0.033, 'reserve_change_speed': 1, 'target_ma': 30, 'reinstate_window': 7, 'min_counter_reinstate': 6,
+}
+
+# Values of every trial column. 'random' sweeps draw one value per column for each (seed, trial), 'grid' sweeps enumerate them all.
+DEFAULT_GRID = {
+    'maxLiqRatio': [i/1000 for i in range(100, 501, 25)],
+    'askFactor': [i/1000 for i in range(10, 101, 5)],
+    'cushionFactor': [i/1000 for i in range(100, 501, 25)],
+    'wall': [i/100 for i in range(20, 31, 1)],
+    'cushion': [i/100 for i in range(10, 21, 1)],
+    'mintSyncPremium': [i for i in range(0, 4, 1)],
+    'withReinstateWindow': ['Yes', 'No'],
+    'withDynamicRR': ['Yes', 'No'],
+}
+
+SAMPLINGS = ('random', 'grid', 'configs', 'optuna')
+
+# The 45 configurations of the random-round2 scripts (simulation_random_a.py ... _zt.py pinned one each, trial j of key {seed}_{j:03d}),
+# as (maxLiqRatio, askFactor, cushionFactor, wall, cushion, mintSyncPremium, withReinstateWindow, withDynamicRR). Some scripts repeated a
+# configuration under another index (4 and 6, 8 and 10, ...): both are kept so the keys line up with the stored rows.
+ROUND2_CONFIGS = {
+    1: (0.2, 0.075, 0.3, 0.28, 0.15, 0, 'Yes', 'No'),
+    2: (0.2, 0.075, 0.3, 0.28, 0.15, 0, 'Yes', 'Yes'),
+    3: (0.2, 0.075, 0.3, 0.28, 0.15, 0, 'No', 'No'),
+    4: (0.2, 0.075, 0.3, 0.3, 0.15, 0, 'Yes', 'No'),
+    5: (0.2, 0.075, 0.3, 0.3, 0.15, 0, 'Yes', 'Yes'),
+    6: (0.2, 0.075, 0.3, 0.3, 0.15, 0, 'Yes', 'No'),
+    7: (0.2, 0.075, 0.3, 0.3, 0.15, 0, 'No', 'No'),
+    8: (0.2, 0.1, 0.3, 0.28, 0.15, 0, 'Yes', 'No'),
+    9: (0.2, 0.1, 0.3, 0.28, 0.15, 0, 'Yes', 'Yes'),
+    10: (0.2, 0.1, 0.3, 0.28, 0.15, 0, 'Yes', 'No'),
+    11: (0.2, 0.1, 0.3, 0.28, 0.15, 0, 'No', 'No'),
+    12: (0.2, 0.1, 0.3, 0.3, 0.15, 0, 'Yes', 'No'),
+    13: (0.2, 0.1, 0.3, 0.3, 0.15, 0, 'Yes', 'Yes'),
+    14: (0.2, 0.1, 0.3, 0.3, 0.15, 0, 'Yes', 'No'),
+    15: (0.2, 0.1, 0.3, 0.3, 0.15, 0, 'No', 'No'),
+    16: (0.225, 0.075, 0.3, 0.28, 0.15, 0, 'Yes', 'No'),
+    17: (0.225, 0.075, 0.3, 0.28, 0.15, 0, 'Yes', 'Yes'),
+    18: (0.225, 0.075, 0.3, 0.28, 0.15, 0, 'No', 'No'),
+    19: (0.225, 0.075, 0.3, 0.3, 0.15, 0, 'Yes', 'No'),
+    20: (0.225, 0.075, 0.3, 0.3, 0.15, 0, 'Yes', 'Yes'),
+    21: (0.225, 0.075, 0.3, 0.3, 0.15, 0, 'Yes', 'No'),
+    22: (0.225, 0.075, 0.3, 0.3, 0.15, 0, 'No', 'No'),
+    23: (0.225, 0.1, 0.3, 0.28, 0.15, 0, 'Yes', 'No'),
+    24: (0.225, 0.1, 0.3, 0.28, 0.15, 0, 'Yes', 'Yes'),
+    25: (0.225, 0.1, 0.3, 0.28, 0.15, 0, 'Yes', 'No'),
+    26: (0.225, 0.1, 0.3, 0.28, 0.15, 0, 'No', 'No'),
+    27: (0.225, 0.1, 0.3, 0.3, 0.15, 0, 'Yes', 'No'),
+    28: (0.225, 0.1, 0.3, 0.3, 0.15, 0, 'Yes', 'Yes'),
+    29: (0.225, 0.1, 0.3, 0.3, 0.15, 0, 'Yes', 'No'),
+    30: (0.225, 0.1, 0.3, 0.3, 0.15, 0, 'No', 'No'),
+    31: (0.3, 0.075, 0.3, 0.28, 0.15, 0, 'Yes', 'No'),
+    32: (0.3, 0.075, 0.3, 0.28, 0.15, 0, 'Yes', 'Yes'),
+    33: (0.3, 0.075, 0.3, 0.28, 0.15, 0, 'No', 'No'),
+    34: (0.3, 0.075, 0.3, 0.3, 0.15, 0, 'Yes', 'No'),
+    35: (0.3, 0.075, 0.3, 0.3, 0.15, 0, 'Yes', 'Yes'),
+    36: (0.3, 0.075, 0.3, 0.3, 0.15, 0, 'Yes', 'No'),  # simulation_random_zj.py dropped the cushion (0.15) and failed with IndexError: no _036 rows
+    37: (0.3, 0.075, 0.3, 0.3, 0.15, 0, 'No', 'No'),
+    38: (0.3, 0.1, 0.3, 0.28, 0.15, 0, 'Yes', 'No'),
+    39: (0.3, 0.1, 0.3, 0.28, 0.15, 0, 'Yes', 'Yes'),
+    40: (0.3, 0.1, 0.3, 0.28, 0.15, 0, 'Yes', 'No'),
+    41: (0.3, 0.1, 0.3, 0.28, 0.15, 0, 'No', 'No'),
+    42: (0.3, 0.1, 0.3, 0.3, 0.15, 0, 'Yes', 'No'),
+    43: (0.3, 0.1, 0.3, 0.3, 0.15, 0, 'Yes', 'Yes'),
+    44: (0.3, 0.1, 0.3, 0.3, 0.15, 0, 'Yes', 'No'),
+    45: (0.3, 0.1, 0.3, 0.3, 0.15, 0, 'No', 'No'),
+}
+
+# Rounds that used to be copy-pasted scripts under simulation-scripts/
+SWEEP_PRESETS = {
+    'default': {'seeds': range(0, 60), 'trials': range(0, 1000)},
+    'random-round1': {'seeds': range(0, 1001), 'trials': range(0, 1000), 'params': {'max_outflow_rate': 0.0033}},
+    'random-round2': {'seeds': range(0, 2000), 'sampling': 'configs', 'configs': ROUND2_CONFIGS, 'key_format': '{seed}_{trial:03d}',
+                      'params': {'max_outflow_rate': 0.05}},
+    'random-curated-seeds': {'trials': range(0, 1000), 'params': {'max_outflow_rate': 0.05},
+                             'seeds': [4, 90, 191, 282, 440, 563, 643, 755, 853, 928, 994, 0, 97, 175, 271, 392, 512, 593, 676, 774, 885, 976,
+                                       2, 82, 173, 307, 455, 497, 547, 609, 868, 908, 961, 6, 99, 162, 236, 374, 460, 597, 694, 812, 944, 997,
+                                       5, 121, 253, 366, 475, 557, 630, 732, 810, 901, 993, 7, 127, 290, 449, 498, 572, 661, 785, 898, 999,
+                                       842, 850, 256, 38, 278, 286, 194, 333, 383, 293, 529, 530, 100, 196, 590, 843, 178, 423, 93, 926, 169, 594, 404, 161,
+                                       403, 648, 919, 896, 80, 744, 920, 871, 185, 60, 521, 596, 907, 779, 917, 860, 394, 400, 377, 580,
+                                       739, 998, 553, 516, 879, 24, 632, 567, 462, 309, 106, 463, 313, 380, 734, 486, 523, 799, 660]},
+    'testnet': {'seeds': [169, 135, 213, 679, 2864, 4626, 47, 107, 124, 3295, 405, 340], 'sampling': 'configs', 'key_format': '{seed}_{trial:03d}',
+                'netflow_type': 'enforced', 'netflow_data': '169', 'netflow_offset': 1, 'params': {'max_outflow_rate': 0.05},
+                'configs': {1: (0.2, 0.075, 0.3, 0.28, 0.15, 0, 'Yes', 'No')}},
+    'optuna': {'seeds': range(0, 1001), 'trials': range(0, 3333), 'sampling': 'optuna', 'summary_table': 'liquidity-simulation.simulations.data',
+               'params': {'horizon': 1000, 'max_outflow_rate': 0.0033, 'initial_price': 30, 'initial_target': 30}},
+}
+
+
+# -- SWEEP SPECS ---
+# A sweep declared in YAML instead of a preset, e.g. sweeps/random-round1.yaml:
+#   name: random-round1
+#   preset: default               optional: start from a preset, the keys below override it
+#   seeds: '0:1001'               range 'start:stop' or list
+#   trials: '0:1000'
+#   sampling: random              random | grid | configs | optuna
+#   horizon: 365
+#   netflow_type: random          random | waves | enforced (with netflow_data)
+#   netflow_offset: 0             enforced net flows: day i replays flow i-1-offset (1 reproduces the old testnet script)
+#   params:                       fixed ModelParams
+#     max_outflow_rate: 0.0033
+#   grid:                         sampled trial columns: list of values, or {start, stop, step} with stop included
+#     maxLiqRatio: {start: 0.1, stop: 0.5, step: 0.025}
+#     withReinstateWindow: ['Yes', 'No']
+#   configs:                      sampling configs: trial -> [maxLiqRatio, askFactor, ..., withDynamicRR], in TRIAL_COLUMNS order
+#     1: [0.2, 0.075, 0.3, 0.28, 0.15, 0, 'Yes', 'No']
+#   outputs: [summary, daily]     tables written by a run of the spec
+#   tables: {summary: ..., daily: ...}
+#   sinks:                        where each output is written (src/sinks.py, --sink and --daily-sink override them)
+#     summary: parquet:results/random-round1-summary
+#     daily: sqlite:results/random-round1.db
+SPEC_KEYS = ('name', 'preset', 'seeds', 'trials', 'sampling', 'horizon', 'netflow_type', 'netflow_data', 'netflow_offset', 'key_format', 'params', 'grid', 'configs', 'outputs', 'tables', 'sinks')
+SWEEP_OUTPUTS = ('summary', 'daily')
+
+
+# (Sweep keyword arguments, outputs, {output: sink spec}) of a YAML spec
+def load_sweep_spec(path:str) -> Tuple[Dict[str, object], List[str], Dict[str, str]]:
+    import yaml  # only the command line reads specs
+    with open(path) as f:
+        spec = yaml.safe_load(f) or {}
+    unknown = [key for key in spec if key not in SPEC_KEYS]
+    if unknown:
+        raise ValueError(f'Unknown keys in the sweep spec {path}: {unknown}. Expected some of {SPEC_KEYS}')
+
+    base = SWEEP_PRESETS[spec['preset']] if 'preset' in spec else {}
+    params = {**base.get('params', {}), **(spec.get('params') or {})}
+    if 'horizon' in spec:
+        params['horizon'] = spec['horizon']
+    fixed_by_trials = [name for name in params if any(name in names for names in TRIAL_PARAMS.values())]
+    unknown = [name for name in params if name not in inspect.signature(ModelParams).parameters or name in ('seed', 'netflow_type')]
+    if fixed_by_trials or unknown:
+        raise ValueError(f'Invalid params in the sweep spec {path}: {unknown + fixed_by_trials}. Trial columns are set through the grid '
+                         f'(a single value fixes them), seed and netflow_type through the spec keys')
+
+    kwargs = {**base, 'params': params, 'name': spec.get('name', spec.get('preset'))}
+    for key in ('seeds', 'trials'):
+        if key in spec:
+            kwargs[key] = parse_ids(spec[key]) if isinstance(spec[key], (str, int)) else spec[key]
+    for key in ('sampling', 'netflow_type', 'netflow_data', 'netflow_offset', 'key_format'):
+        if key in spec:
+            kwargs[key] = spec[key]
+    if spec.get('grid'):
+        kwargs['grid'] = {**base.get('grid', {}), **{column: _grid_values(column, values) for column, values in spec['grid'].items()}}
+    if spec.get('configs'):
+        kwargs['configs'] = {trial: tuple(_grid_values(None, list(values))) for trial, values in spec['configs'].items()}
+    if kwargs.get('sampling') != 'configs':
+        kwargs.pop('configs', None)
+    for output, table in (spec.get('tables') or {}).items():
+        kwargs[f'{output}_table'] = table
+    if 'seeds' not in kwargs:
+        raise ValueError(f'The sweep spec {path} has no seeds (or preset)')
+
+    outputs = list(spec.get('outputs', ['summary']))
+    if not outputs or any(output not in SWEEP_OUTPUTS for output in outputs):
+        raise ValueError(f'Invalid outputs in the sweep spec {path}: {outputs}. Expected some of {SWEEP_OUTPUTS}')
+    sinks = dict(spec.get('sinks') or {})
+    invalid = {output: sink for output, sink in sinks.items() if output not in SWEEP_OUTPUTS or str(sink).partition(':')[0] not in SINK_TYPES}
+    if invalid:
+        raise ValueError(f'Invalid sinks in the sweep spec {path}: {invalid}. Expected {{summary|daily: {SINK_SPECS}}}')
+    return kwargs, outputs, sinks
+
+
+def _grid_values(column:str, values) -> list:
+    if isinstance(values, dict):
+        start, stop, step = values['start'], values['stop'], values.get('step', 1)
+        values = [round(start + i * step, 10) for i in range(int(round((stop - start) / step)) + 1)]
+    elif not isinstance(values, list):
+        values = [values]
+    # YAML 1.1 reads unquoted Yes / No as booleans
+    return [('Yes' if value else 'No') if isinstance(value, bool) else value for value in values]
+
+
+# Table ids and initial protocol variables from src/price.txt
+def read_price_file(path:str=PRICE_FILE) -> Tuple[Dict[str, str], Dict[str, float]]:
+    with open(path) as f:
+        lines = [line.split() for line in f.readlines() if line.strip()]
+    tables = {'summary': lines[0][1], 'daily': lines[1][1]}
+    initial_variables = {name.rstrip(':'): float(value) for name, value in lines[2:]}
+    return tables, initial_variables
+
+
+# Number of CPUs this process may run on (the container quota rather than the host size when they differ)
+def available_cpus() -> int:
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# A sweep: the seeds and trials simulated, and how the configuration of each (seed, trial) is picked (see src/worker.py
+# SweepTrials): from the grid ('random', 'grid' with every combination by default, 'optuna') or from configs ('configs', every
+# config by default).
+class Sweep(SweepTrials):
+    config_columns = ('seed',) + TRIAL_COLUMNS  # what a stored summary row of the same key must agree on (BigQuerySink guard)
+
+    def __init__(self, seeds:List[int], trials:List[int]=None, grid:Dict[str, list]=None, params:Dict[str, object]=None, sampling:str='random',
+                 configs:Dict[int, tuple]=None, netflow_type:str='random', netflow_data:str=None, netflow_offset:int=0, key_format:str='{seed}_{trial}', name:str=None,
+                 summary_table:str=None, daily_table:str=None, price_file:str=PRICE_FILE):
+        if sampling not in SAMPLINGS:
+            raise ValueError(f'Unknown sampling: {sampling}. Expected one of {SAMPLINGS}')
+        unknown = [column for column in (grid or {}) if column not in TRIAL_COLUMNS]
+        if unknown:
+            raise ValueError(f'Unknown trial columns: {unknown}. Expected some of {TRIAL_COLUMNS}')
+        if (sampling == 'configs') != bool(configs) or any(len(values) != len(TRIAL_COLUMNS) for values in (configs or {}).values()):
+            raise ValueError(f"Sampling 'configs' takes configs, {{trial: ({', '.join(TRIAL_COLUMNS)})}}, and only it does")
+        if configs and trials is not None and any(trial not in configs for trial in trials):
+            raise ValueError(f'Trials without a config: {[trial for trial in trials if trial not in configs]}. Expected some of {sorted(configs)}')
+
+        tables, initial_variables = read_price_file(price_file)
+        self.name = name
+        self.seeds = list(seeds)
+        super().__init__({column: list((grid or {}).get(column, DEFAULT_GRID[column])) for column in TRIAL_COLUMNS},
+                         {int(trial): tuple(values) for trial, values in (configs or {}).items()}, sampling, {**BASE_PARAMS, **initial_variables, **(params or {})},
+                         netflow_type, netflow_data, netflow_offset, key_format)
+        self.trials = list(trials if trials is not None else sorted(self.configs) if configs else range(self.grid_size()))
+        self.summary_table = summary_table or tables['summary']
+        self.daily_table = daily_table or tables['daily']
+
+    @classmethod
+    def preset(cls, name:str, **overrides):
+        if name not in SWEEP_PRESETS:
+            raise ValueError(f'Unknown sweep preset: {name}. Expected one of {tuple(SWEEP_PRESETS)}')
+        return cls(**{**SWEEP_PRESETS[name], **{key: value for key, value in overrides.items() if value is not None}, 'name': name})
+
+    # Sweep of a YAML spec (see load_sweep_spec)
+    @classmethod
+    def from_spec(cls, path:str, **overrides):
+        return cls(**{**load_sweep_spec(path)[0], **{key: value for key, value in overrides.items() if value is not None}})
+
+    def grid_size(self) -> int:
+        return int(np.prod([len(values) for values in self.grid.values()]))
+
+    # What the workers get of the sweep: a SweepTrials, which they unpickle with src/worker.py only
+    def worker(self) -> SweepTrials:
+        return SweepTrials(self.grid, self.configs, self.sampling, self.params, self.netflow_type, self.netflow_data, self.netflow_offset, self.key_format)
+
+    # (seed, trials) work units of at most chunk_size trials (default: sized by src/planner.py from the horizon and the
+    # output volume). An optuna study is sequential, so it is a single unit.
+    def tasks(self, chunk_size:int=None, outputs:List[str]=('summary',)) -> List[Tuple[int, List[int]]]:
+        if self.sampling == 'optuna':
+            return [(seed, self.trials) for seed in self.seeds]
+        chunk_size = chunk_size or task_size(self, outputs, len(self.seeds) * len(self.trials))
+        return order_by_cost([(seed, trials) for seed in self.seeds for trials in split_evenly(self.trials, chunk_size)])
+
+    # Rows and columns that one trial adds to an output table
+    def output_size(self, output:str) -> Tuple[int, int]:
+        if output == 'summary':
+            return 1, len(SUMMARY_COLUMNS)
+        return self.params['horizon'] - 1, len(DAILY_COLUMNS)
+
+    # Bytes a worker holds per trial while it produces `outputs`: the trajectory (collected, then transposed by the batch engine)
+    # unless only the objective is reduced from the days, and the output rows
+    def trial_bytes(self, outputs:List[str]) -> int:
+        size = 0 if list(outputs) == ['summary'] else 2 * len(core_fields(REPORT_FIELDS)) * (self.params['horizon'] - 1) * 8
+        for output in outputs:
+            rows, columns = self.output_size(output)
+            size += rows * columns * 8
+        return size
+
+    # Daily rows (DAILY_COLUMNS) of trials read back from a summary table. shared: as a SharedFrame (see daily_rows).
+    def daily(self, trials:pd.DataFrame, shared:bool=False) -> pd.DataFrame:
+        return self.trial_daily(list(trials['key']), trial_configs(trials), shared)
+
+
+# (seed, trial values) of the rows of a summary table
+def trial_configs(trials:pd.DataFrame) -> List[Tuple[int, tuple]]:
+    return [(int(seed), tuple(values)) for seed, *values in trials[['seed', *TRIAL_COLUMNS]].itertuples(index=False)]
+
+
+# Keys and configurations of the summary rows of an Arrow record batch (see trial_configs)
+def batch_configs(batch:pa.RecordBatch) -> Tuple[List[str], List[Tuple[int, tuple]]]:
+    keys = [str(key) for key in batch.column('key').to_pylist()]
+    return keys, [(int(seed), tuple(values)) for seed, *values in zip(*(batch.column(column).to_pylist() for column in ('seed', *TRIAL_COLUMNS)))]
+
+
+# -- RUNNER ---
+# Daily tasks of a stream of summary rows (Arrow record batches), read on a background thread up to `prefetch` batches ahead
+# of the tasks the runner has taken. The keys of a seed are split in tasks of up to `chunk_size` (split_evenly) once the seed
+# is complete: at the end of each batch for every seed but the one of its last row, which may go on in the next batch. For a
+# stream ordered by seed these are the tasks of run_daily(), whatever the batch boundaries, so a resumed sweep gets the
+# same tasks again.
+class TrialStream():
+    def __init__(self, batches:Iterator[pa.RecordBatch], chunk_size:int, prefetch:int=1):
+        self.chunk_size = chunk_size
+        self.configs = {}  # key -> (seed, trial values) of every row read, for the worker jobs
+        self.ready = queue.Queue(prefetch)  # tasks of the batches read, None once the stream is exhausted
+        self.exhausted = False
+        self.thread = threading.Thread(target=self._read, args=(batches,), name='sweep-trials', daemon=True)
+        self.thread.start()
+
+    # Add the tasks of the next batch read to the ledger, waiting up to `timeout` seconds for it (no wait by default).
+    # Returns whether there were any; an error of the reader is raised here.
+    def add_next(self, ledger:SweepLedger, timeout:float=0) -> bool:
+        if self.exhausted:
+            return False
+        try:
+            tasks = self.ready.get(timeout=timeout) if timeout else self.ready.get_nowait()
+        except queue.Empty:
+            return False
+        if tasks is None:
+            self.exhausted = True
+            return False
+        if isinstance(tasks, Exception):
+            self.exhausted = True
+            raise tasks
+        ledger.add(tasks)
+        return bool(tasks)
+
+    def _read(self, batches:Iterator[pa.RecordBatch]):
+        keys = {}  # seed -> keys read and not in a task yet
+        try:
+            for batch in batches:
+                batch_keys, configs = batch_configs(batch)
+                for key, config in zip(batch_keys, configs):
+                    self.configs[key] = config
+                    keys.setdefault(config[0], []).append(key)
+                last = configs[-1][0] if configs else None
+                self.ready.put([(seed, part) for seed in list(keys) if seed != last for part in split_evenly(keys.pop(seed), self.chunk_size)])
+            self.ready.put([(seed, part) for seed, seed_keys in keys.items() for part in split_evenly(seed_keys, self.chunk_size)])
+            self.ready.put(None)
+        except Exception as error:
+            self.ready.put(error)
+
+
+# Run ledger tasks on a process pool. Whenever a worker is idle the next pending task is claimed from the ledger (work stealing,
+# no static seed ranges). job(seed, items) -> (function, *args) runs in a worker and returns {output name: rows}, e.g.
+# {'summary': ..., 'daily': ...}, large outputs as SharedFrames (only their descriptor is pickled). The rows are compressed and
+# written to sinks[output name] by an OutputPipeline while the workers simulate the next tasks, and a task is marked done once
+# all its rows are written. Up to `queue_size` tasks wait between each stage: when the sinks fall behind, no new task is
+# claimed until they catch up.
+# A failing task is recorded and the sweep goes on; a restart with the same ledger runs only the tasks that are not done.
+# With a LeaseBoard the leases of the running and unwritten tasks are renewed, and once no task is left to claim the host
+# waits for the other hosts to finish theirs (or for their leases to expire) before returning.
+# Progress goes to `telemetry` (src/telemetry.py, a console line every 10s by default); `days` is the number of simulated days
+# of a trial, for the day step rates.
+# `budget` (a WorkerBudget) caps the trials a worker simulates at once: a larger task runs as a sequence of parts, the rows of
+# each part go to the pipeline as soon as it is simulated, and the task is done once its last part is written. With the bounded
+# queues, memory stays constant however large the tasks and the sweep are. The ledger records every written part, so a task run
+# again after an interruption or a failure only simulates the parts that are not in the sinks yet (a LeaseBoard keeps the parts
+# in the outputs of its host instead, and drops them when the task is run again).
+# With a `stream` (TrialStream) the tasks are not known in advance: `tasks` is empty, and the tasks of each batch the stream
+# reads are added to the ledger once the earlier ones are all claimed, so the first tasks run while the next ones are read.
+def run_tasks(tasks:List[Tuple[int, list]], job, sinks:Dict[str, object], ledger:SweepLedger=None, workers:int=None, label:str='', config:dict=None,
+              queue_size:int=4, telemetry:SweepTelemetry=None, days:int=0, budget:WorkerBudget=None, stream:TrialStream=None) -> Dict[str, int]:
+    ledger = ledger or SweepLedger()
+    ledger.plan(tasks, label, config)
+    reset = ledger.reset_unfinished()
+    workers = workers or available_cpus()
+    counts = ledger.counts()
+    label = label or 'sweep'
+    planned = 'tasks streamed' if stream else f'{len(tasks)} tasks'
+    print(f"{label} | {planned}, {counts['done']} already done{f', {reset} restarted' if reset else ''} | {workers} workers")
+    telemetry = telemetry or SweepTelemetry()
+    telemetry.begin(label, counts, days)
+
+    budget = budget or WorkerBudget()
+    pipeline = OutputPipeline(list(sinks), queue_size, telemetry)
+    share_with_workers()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        running = {}  # future -> (task, items of the part, items left, part)
+
+        def submit(task:LedgerTask, items:list, part:int=0):
+            items, rest = budget.split(items)
+            running[pool.submit(run_timed, *job(task.seed, items))] = (task, items, rest, part)
+
+        while True:
+            _mark_written(ledger, telemetry, pipeline)
+            while len(running) < 2 * workers and not pipeline.full():  # one queued task per worker, so no worker waits for the next claim
+                task = ledger.claim()
+                if task is None and stream is not None and stream.add_next(ledger):
+                    continue
+                if task is None:
+                    break
+                items = ledger.unwritten(task)
+                if not len(items):  # every part was written before the run stopped
+                    ledger.done(task.id)
+                    continue
+                submit(task, items)
+            if telemetry.due():
+                waiting = not running and not pipeline.pending()
+                telemetry.progress(ledger.counts(), {'simulating': len(running), **pipeline.depths()}, queue_size, waiting)
+            # wake up for the next lease renewal or progress event
+            timeout = min(ledger.heartbeat_interval or telemetry.interval, telemetry.interval)
+            if not running:
+                if pipeline.pending():
+                    wait([pipeline.changed()], timeout=timeout)
+                    _mark_written(ledger, telemetry, pipeline)
+                    ledger.heartbeat(pipeline.pending())
+                    continue
+                if stream is not None and not stream.exhausted:
+                    stream.add_next(ledger, timeout)  # every task read so far is done: wait for the next batch
+                    continue
+                if ledger.finished():
+                    break
+                time.sleep(min(timeout, 5))  # tasks leased by other hosts
+                continue
+
+            # the pipeline wakes the runner too, which records a written part before simulating on
+            finished, _ = wait([*running, pipeline.changed()], timeout=timeout, return_when=FIRST_COMPLETED)
+            finished = [future for future in finished if future in running]
+            ledger.heartbeat([task for future, (task, *_) in running.items() if future not in finished] + pipeline.pending())
+            for future in finished:
+                task, items, rest, part = running.pop(future)
+                try:
+                    outputs, stats = future.result()
+                except BrokenProcessPool:
+                    raise  # a worker died: the ledger keeps the running tasks for the restart
+                except Exception as error:
+                    pipeline.abandon(task)
+                    ledger.fail(task.id, repr(error))
+                    print(f'seed {task.seed} status | task {task.id} FAILED: {error!r}')
+                    continue
+                telemetry.task(task, stats, items, part)
+                budget.measured(len(items), stats['buffer_bytes'])
+                if len(rest):
+                    submit(task, rest, part + 1)
+                split = part > 0 or len(rest) > 0
+                while not pipeline.put(task, ledger.task_sinks(task, sinks, part), outputs, timeout=ledger.heartbeat_interval, last=not len(rest),
+                                       items=items if split else None):
+                    _mark_written(ledger, telemetry, pipeline)
+                    ledger.heartbeat([task for task, *_ in running.values()] + pipeline.pending())  # the sinks are behind: keep the leases alive
+    pipeline.close()
+    _mark_written(ledger, telemetry, pipeline)
+
+    counts = ledger.counts()
+    telemetry.close(counts)
+    print(f"{label} | {counts['done']}/{sum(counts.values())} tasks done, {counts['failed']} failed")
+    merged = ledger.merge(sinks)
+    if merged:
+        print(f"{label} | {merged}")
+    if counts['failed']:
+        print(f"{label} | run the sweep again to retry the {counts['failed']} failed tasks")
+    return counts
+
+
+# Record the parts and tasks the pipeline has written
+def _mark_written(ledger:SweepLedger, telemetry:SweepTelemetry, pipeline:OutputPipeline):
+    tasks = pipeline.written()
+    done = {task.id for task in tasks}
+    for task, items in pipeline.written_parts():
+        if task.id not in done:
+            ledger.part_written(task.id, items)
+    for task in tasks:
+        ledger.done(task.id)
+        telemetry.written(task)
+
+
+# Objective of every trial of the sweep. memory_budget: bytes of buffers per worker (see run_tasks).
+def run_summary(sweep:Sweep, sink, workers:int=None, chunk_size:int=None, ledger:SweepLedger=None, queue_size:int=4,
+                telemetry:SweepTelemetry=None, memory_budget:int=None) -> Dict[str, int]:
+    return run_tasks(sweep.tasks(chunk_size, ['summary']), lambda seed, trials: (summary_task, sweep.worker(), seed, trials), {'summary': sink},
+                     ledger, workers, f"{sweep.name or 'sweep'} summary", vars(sweep), queue_size, telemetry, sweep.params['horizon'] - 1,
+                     WorkerBudget(memory_budget, sweep.trial_bytes(['summary'])))
+
+
+# Re-simulate the trials of a summary table and write their daily rows
+def run_daily(sweep:Sweep, trials:pd.DataFrame, sink, workers:int=None, chunk_size:int=None, ledger:SweepLedger=None, queue_size:int=4,
+                telemetry:SweepTelemetry=None, memory_budget:int=None) -> Dict[str, int]:
+    configs = dict(zip(trials['key'], trial_configs(trials)))  # workers get plain tuples rather than frames
+    chunk_size = chunk_size or task_size(sweep, ['daily'], len(trials))
+    tasks = order_by_cost([(seed, part) for seed, keys in trials.groupby('seed', sort=False)['key'].agg(list).items() for part in split_evenly(keys, chunk_size)])
+    return run_tasks(tasks, lambda seed, keys: (daily_task, sweep.worker(), keys, [configs[key] for key in keys]), {'daily': sink},
+                     ledger, workers, f"{sweep.name or 'sweep'} daily", vars(sweep), queue_size, telemetry, sweep.params['horizon'] - 1,
+                     WorkerBudget(memory_budget, sweep.trial_bytes(['daily'])))
+
+
+# Re-simulate the trials of a stream of summary rows (sinks.stream_trials) and write their daily rows. The first tasks are
+# simulated as soon as their rows are read, while the next batches are read in the background.
+def run_daily_stream(sweep:Sweep, batches:Iterator[pa.RecordBatch], sink, workers:int=None, chunk_size:int=None, ledger:SweepLedger=None, queue_size:int=4,
+                telemetry:SweepTelemetry=None, memory_budget:int=None, prefetch:int=1) -> Dict[str, int]:
+    stream = TrialStream(batches, chunk_size or task_size(sweep, ['daily'], len(sweep.seeds) * len(sweep.trials)), prefetch)
+    return run_tasks([], lambda seed, keys: (daily_task, sweep.worker(), keys, [stream.configs[key] for key in keys]), {'daily': sink},
+                     ledger, workers, f"{sweep.name or 'sweep'} daily", {**vars(sweep), 'stream': True}, queue_size, telemetry, sweep.params['horizon'] - 1,
+                     WorkerBudget(memory_budget, sweep.trial_bytes(['daily'])), stream)
+
+
+# Summary rows and daily rows of every trial, simulating each trial once
+def run_summary_and_daily(sweep:Sweep, summary_sink, daily_sink, workers:int=None, chunk_size:int=None, ledger:SweepLedger=None, queue_size:int=4,
+                telemetry:SweepTelemetry=None, memory_budget:int=None) -> Dict[str, int]:
+    return run_tasks(sweep.tasks(chunk_size, ['summary', 'daily']), lambda seed, trials: (summary_and_daily_task, sweep.worker(), seed, trials), {'summary': summary_sink, 'daily': daily_sink},
+                     ledger, workers, f"{sweep.name or 'sweep'} summary+daily", vars(sweep), queue_size, telemetry, sweep.params['horizon'] - 1,
+                     WorkerBudget(memory_budget, sweep.trial_bytes(['summary', 'daily'])))
+
+
+# Tables written by each mode of the command line
+MODE_OUTPUTS = {'summary': ['summary'], 'daily': ['daily'], 'both': ['summary', 'daily']}
+
+
+# '0:60' -> range(0, 60), '4,90,191' -> [4, 90, 191]
+def parse_ids(value:str) -> List[int]:
+    if value is None:
+        return None
+    if ':' in value:
+        start, stop = value.split(':')
+        return range(int(start), int(stop))
+    return [int(i) for i in value.split(',')]
+
+
+def main(argv:List[str]=None):
+    parser = argparse.ArgumentParser(description='Run a parameter sweep of the RBS model on every core of the machine')
+    parser.add_argument('mode', nargs='?', choices=tuple(MODE_OUTPUTS),
+                        help='summary: objective of every trial. daily: daily variables of the trials of a summary table. both: summary and daily rows '
+                             'of every trial in a single pass (default: the outputs of the spec, or summary)')
+    parser.add_argument('--preset', default='default', choices=tuple(SWEEP_PRESETS))
+    parser.add_argument('--spec', help='YAML sweep spec (replaces --preset)')
+    parser.add_argument('--dry-run', action='store_true', help='report the tasks, simulations, rows, bytes and time of the sweep, and stop')
+    parser.add_argument('--cold-start', action='store_true', help='measure the start-up time of a worker process and the backends it imports, and stop')
+    parser.add_argument('--seeds', help="seed range '0:60' or list '4,90,191' (default: the preset seeds)")
+    parser.add_argument('--trials', help="trial range '0:1000' or list (default: the preset trials)")
+    parser.add_argument('--workers', type=int, help='worker processes (default: available CPUs)')
+    parser.add_argument('--chunk-size', type=int, help='trials per task (default: sized from the horizon and the output volume)')
+    parser.add_argument('--queue-size', type=int, default=4, help='finished tasks buffered between the output stages (compress, upload) before simulations pause')
+    parser.add_argument('--memory-budget', type=float, default=512, help='MB of buffers per worker (trajectories and output rows): larger tasks are simulated and written in parts')
+    parser.add_argument('--sink', help=f'summary rows: {SINK_SPECS} (default: the sink of the spec, or bigquery)')
+    parser.add_argument('--daily-sink', help=f'daily rows: {SINK_SPECS} (default: the sink of the spec, or bigquery)')
+    parser.add_argument('--load-batch-mb', type=float, default=BIGQUERY_BATCH_BYTES / 1e6, help='bigquery sinks: MB of rows per load job')
+    parser.add_argument('--load-concurrency', type=int, default=BIGQUERY_LOADS, help='bigquery sinks: load jobs running at once')
+    parser.add_argument('--source', help='daily mode: summary rows from the same kinds of location but memory (default: the summary sink)')
+    parser.add_argument('--prefetch', type=int, default=1, help='daily mode: batches of summary rows read ahead of the simulations')
+    parser.add_argument('--price-file', default=PRICE_FILE)
+    parser.add_argument('--ledger', help='SQLite ledger of the sweep tasks, to resume an interrupted sweep (default: <preset>-<mode>.ledger.db)')
+    parser.add_argument('--shared-dir', help='run the sweep on several hosts coordinated through lease files in this shared directory (replaces --ledger)')
+    parser.add_argument('--host', help='name of this host in the shared directory (default: hostname)')
+    parser.add_argument('--telemetry', help='JSON-lines log of the progress events (tasks, trials/s, day steps/s, upload MB/s, queue depths, ETA)')
+    parser.add_argument('--progress-interval', type=float, default=10, help='seconds between progress lines')
+    parser.add_argument('--lease-ttl', type=float, default=600, help='seconds before the tasks of a silent host can be taken over')
+    args = parser.parse_args(argv)
+
+    if args.cold_start:
+        print(cold_start_line(measure_cold_start()))
+        return
+    sinks = {}
+    if args.spec:
+        sweep = Sweep.from_spec(args.spec, seeds=parse_ids(args.seeds), trials=parse_ids(args.trials), price_file=args.price_file)
+        _, outputs, sinks = load_sweep_spec(args.spec)
+        mode = args.mode or next(mode for mode, mode_outputs in MODE_OUTPUTS.items() if mode_outputs == sorted(outputs, key=SWEEP_OUTPUTS.index))
+    else:
+        sweep = Sweep.preset(args.preset, seeds=parse_ids(args.seeds), trials=parse_ids(args.trials), price_file=args.price_file)
+        mode = args.mode or 'summary'
+    summary_sink = args.sink or sinks.get('summary', 'bigquery')
+    daily_sink = args.daily_sink or sinks.get('daily', 'bigquery')
+    if args.dry_run:  # daily mode: as if the summary table had every trial of the sweep
+        outputs = MODE_OUTPUTS[mode]
+        encoders = {'summary': sink_encoder(summary_sink, sweep), 'daily': sink_encoder(daily_sink, sweep)}
+        tasks = sweep.tasks(args.chunk_size, outputs)
+        measured = measure_trial(sweep, outputs, encoders, max(len(items) for _, items in tasks))
+        print(SweepPlan(sweep, outputs, tasks, args.workers or available_cpus(), measured).report())
+        print(cold_start_line(measure_cold_start()))
+        return
+
+    telemetry = SweepTelemetry(args.telemetry, args.progress_interval)
+    if args.shared_dir:
+        ledger = LeaseBoard(args.shared_dir, args.host, args.lease_ttl)
+    else:
+        ledger = SweepLedger(args.ledger or f"{sweep.name or 'sweep'}-{mode}.ledger.db")
+    memory_budget = int(args.memory_budget * 1e6)
+    loads = {'batch_bytes': int(args.load_batch_mb * 1e6), 'concurrency': args.load_concurrency}
+    if mode == 'summary':
+        run_summary(sweep, open_sink(summary_sink, sweep.summary_table, sweep, **loads), args.workers, args.chunk_size, ledger, args.queue_size, telemetry, memory_budget)
+    elif mode == 'daily':
+        trials = stream_trials(args.source or summary_sink, sweep.summary_table, sweep.seeds, sweep.name)
+        run_daily_stream(sweep, trials, open_sink(daily_sink, sweep.daily_table, sweep, **loads), args.workers, args.chunk_size, ledger, args.queue_size,
+                         telemetry, memory_budget, args.prefetch)
+    else:
+        run_summary_and_daily(sweep, open_sink(summary_sink, sweep.summary_table, sweep, **loads), open_sink(daily_sink, sweep.daily_table, sweep, **loads),
+                              args.workers, args.chunk_size, ledger, args.queue_size, telemetry, memory_budget)
+
+
+if __name__ == '__main__':
+    main()
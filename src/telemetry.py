@@ -0,0 +1,188 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List
+
+
+# Progress of a running sweep, as structured events:
+#  - 'task' for every simulated task or part of a task (worker pid, trials, simulation seconds, MB of output rows)
+#  - 'progress' every `interval` seconds: ledger task counts (every host of a shared sweep), trials/s and day steps/s of this host
+#    (last interval and since the start), compress and upload MB/s, depths of the queues (simulations in flight, compress, write
+#    per output), per-worker rates, ETA, and whether the host is cpu-bound (its output queues have room), sink-bound (they are
+#    full) or waiting for the tasks of other hosts
+#  - 'done' with the totals
+# Every event goes to the JSON-lines log when there is one, progress and done events are also printed as a one-line summary
+# (the done line has the totals of the run).
+# Day steps are nominal (trials x days of the horizon): trials stopped early once absorbed count as full trials.
+class SweepTelemetry():
+    def __init__(self, log_path:str=None, interval:float=10.0):
+        self.log_path = log_path
+        self.interval = interval
+        self.log = None
+        self.lock = threading.Lock()  # the output stages report from their threads
+
+    # Start of a run: the ledger counts once unfinished tasks are reset, and the simulated days of a trial
+    def begin(self, label:str, counts:Dict[str, int], days:int=0):
+        self.label = label
+        self.days = days
+        self.log = open(self.log_path, 'a') if self.log_path else None
+        self.start = self.last = time.time()
+        self.done_at_start = counts['done']
+        self.done = {'tasks': 0, 'trials': 0}
+        self.window = {'trials': 0}
+        self.outputs = {}  # output name -> {'rows', 'encoded', 'encode_seconds', 'uploaded', 'upload_seconds'} since the start
+        self.window_outputs = {}  # output name -> {'encoded', 'uploaded'} bytes of the last interval
+        self.workers = {}  # pid -> {'tasks', 'trials', 'seconds', 'last_seen', 'peak_buffer'}
+
+    # Part `part` of a task (its `items`) is simulated
+    def task(self, task, stats:dict, items:list=None, part:int=0):
+        trials = len(task.items if items is None else items)
+        worker = self.workers.setdefault(stats['pid'], {'tasks': 0, 'trials': 0, 'seconds': 0.0, 'last_seen': 0.0, 'peak_buffer': 0})
+        worker['tasks'] += 1
+        worker['trials'] += trials
+        worker['seconds'] += stats['seconds']
+        worker['last_seen'] = stats['started'] + stats['seconds']
+        worker['peak_buffer'] = max(worker['peak_buffer'], stats['buffer_bytes'])
+        self.emit({'event': 'task', 'task': task.id, 'part': part, 'seed': task.seed, 'trials': trials, 'pid': stats['pid'], 'seconds': round(stats['seconds'], 4),
+                   'buffer_mb': round(stats['buffer_bytes'] / 1e6, 3)})
+
+    # A task is written (every output uploaded)
+    def written(self, task):
+        self.done['tasks'] += 1
+        self.done['trials'] += len(task.items)
+        self.window['trials'] += len(task.items)
+
+    def encoded(self, output:str, rows:int, size:int, seconds:float):
+        with self.lock:
+            totals = self.outputs.setdefault(output, {'rows': 0, 'encoded': 0, 'encode_seconds': 0.0, 'uploaded': 0, 'upload_seconds': 0.0})
+            totals['rows'] += rows
+            totals['encoded'] += size
+            totals['encode_seconds'] += seconds
+            self.window_outputs.setdefault(output, {'encoded': 0, 'uploaded': 0})['encoded'] += size
+
+    def uploaded(self, output:str, size:int, seconds:float):
+        with self.lock:
+            self.outputs[output]['uploaded'] += size
+            self.outputs[output]['upload_seconds'] += seconds
+            self.window_outputs.setdefault(output, {'encoded': 0, 'uploaded': 0})['uploaded'] += size
+
+    # Whether a progress event is due
+    def due(self) -> bool:
+        return time.time() - self.last >= self.interval
+
+    # counts: {status: tasks} of the ledger. depths: {queue: items}, full at `capacity`.
+    def progress(self, counts:Dict[str, int], depths:Dict[str, int], capacity:int, waiting:bool=False):
+        self.emit(self.snapshot(counts, depths, capacity, waiting))
+
+    def close(self, counts:Dict[str, int]):
+        self.emit({**self.snapshot(counts, {}, 1), 'event': 'done'})
+        if self.log:
+            self.log.close()
+            self.log = None
+
+    # Progress event of the interval since the last one
+    def snapshot(self, counts:Dict[str, int], depths:Dict[str, int], capacity:int, waiting:bool=False) -> dict:
+        now = time.time()
+        elapsed, window = max(now - self.start, 1e-9), max(now - self.last, 1e-9)
+        with self.lock:
+            window_outputs, self.window_outputs = self.window_outputs, {}
+            outputs = {name: dict(totals) for name, totals in self.outputs.items()}
+        task_rate = (counts['done'] - self.done_at_start) / elapsed  # every host
+        output_queues = [depth for name, depth in depths.items() if name != 'simulating']
+        if waiting:
+            bound = 'waiting'
+        elif output_queues and max(output_queues) >= capacity:
+            bound = 'sink'
+        else:
+            bound = 'cpu'
+        event = {
+            'event': 'progress', 'elapsed': round(elapsed, 1), 'tasks': counts, 'tasks_written': self.done['tasks'], 'trials_written': self.done['trials'],
+            'trials_per_second': round(self.window['trials'] / window, 2), 'trials_per_second_total': round(self.done['trials'] / elapsed, 2),
+            'day_steps_per_second': round(self.window['trials'] * self.days / window), 'queues': depths, 'bound': bound,
+            'compress_mb_per_second': {name: round(sizes['encoded'] / window / 1e6, 3) for name, sizes in window_outputs.items()},
+            'upload_mb_per_second': {name: round(sizes['uploaded'] / window / 1e6, 3) for name, sizes in window_outputs.items()},
+            'uploaded_mb': {name: round(totals['uploaded'] / 1e6, 3) for name, totals in outputs.items()},
+            'workers': {str(pid): {'tasks': worker['tasks'], 'trials_per_second': round(worker['trials'] / worker['seconds'], 2) if worker['seconds'] else 0.0,
+                                   'idle_seconds': round(now - worker['last_seen'], 1), 'peak_buffer_mb': round(worker['peak_buffer'] / 1e6, 3)}
+                        for pid, worker in self.workers.items()},
+            'eta_seconds': round((counts['pending'] + counts['running']) / task_rate) if task_rate > 0 else None,
+        }
+        self.window['trials'] = 0
+        self.last = now
+        return event
+
+    def emit(self, event:dict):
+        event = {'time': round(time.time(), 3), 'label': self.label, **event}
+        if self.log:
+            self.log.write(json.dumps(event) + '\n')
+            self.log.flush()
+        if event['event'] == 'progress':
+            print(summary_line(event), flush=True)
+        elif event['event'] == 'done':
+            print(done_line(event), flush=True)
+
+
+# One console line of a progress event
+def summary_line(event:dict) -> str:
+    eta = event['eta_seconds']
+    uploads = ', '.join(f'{name} {rate:.2f} MB/s' for name, rate in event['upload_mb_per_second'].items()) or '-'
+    queues = ' '.join(f'{name} {depth}' for name, depth in event['queues'].items())
+    counts = event['tasks']
+    return (f"{event['label']} | {counts['done']}/{sum(counts.values())} tasks done, {counts['running']} running | {event['trials_written']:,} trials written here | "
+            f"{event['trials_per_second']:.1f} trials/s, {event['day_steps_per_second']:,} day steps/s | upload {uploads} | queues {queues} | "
+            f"{event['bound']}-bound | {len(event['workers'])} workers | ETA {_format_eta(eta)}")
+
+
+# One console line of the done event: what this host wrote over the whole run
+def done_line(event:dict) -> str:
+    uploads = ', '.join(f'{name} {size:.2f} MB' for name, size in event['uploaded_mb'].items()) or '-'
+    return (f"{event['label']} | finished in {_format_eta(event['elapsed'])} | {event['trials_written']:,} trials written here, "
+            f"{event['trials_per_second_total']:.1f} trials/s | uploaded {uploads} | {len(event['workers'])} workers")
+
+
+def _format_eta(seconds:float) -> str:
+    if seconds is None:
+        return '-'
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}h{minutes:02d}m{seconds:02d}s' if hours else f'{minutes}m{seconds:02d}s'
+
+
+# -- COLD START ---
+# A worker process only needs the engine: pandas, Arrow, YAML and the BigQuery and Optuna clients are imported by the runner
+# the first time a sink, source, spec or study uses them. measure_cold_start() checks it on fresh interpreters.
+WORKER_MODULES = ('src.worker',)  # what a spawned worker imports to unpickle a task
+BACKEND_MODULES = ('pandas', 'pyarrow', 'yaml', 'google.cloud.bigquery', 'optuna')
+COLD_START_TARGET = 0.2  # seconds
+
+_COLD_START_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+for module in sys.argv[2].split(','):
+    __import__(module)
+print(json.dumps({'import_seconds': time.perf_counter() - start, 'backends': [module for module in sys.argv[3].split(',') if module in sys.modules]}))
+"""
+
+
+# Best of `repeats` fresh interpreters importing the worker modules: {'seconds' (interpreter start included), 'import_seconds', 'backends' loaded}
+def measure_cold_start(modules:List[str]=WORKER_MODULES, repeats:int=5, cwd:str=None) -> dict:
+    cwd = cwd or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', _COLD_START_SCRIPT, '', ','.join(modules), ','.join(BACKEND_MODULES)],
+                                cwd=cwd, capture_output=True, text=True, check=True).stdout
+        measured = {'seconds': time.perf_counter() - start, **json.loads(output)}
+        if best is None or measured['seconds'] < best['seconds']:
+            best = measured
+    return {'modules': list(modules), 'repeats': repeats, **best}
+
+
+def cold_start_line(measured:dict) -> str:
+    backends = ', '.join(measured['backends']) or 'none'
+    verdict = 'ok' if measured['seconds'] < COLD_START_TARGET else f'over the {COLD_START_TARGET * 1000:.0f} ms target'
+    return (f"worker cold start {measured['seconds'] * 1000:.0f} ms ({verdict}): import {', '.join(measured['modules'])} {measured['import_seconds'] * 1000:.0f} ms, "
+            f"backends loaded: {backends}")
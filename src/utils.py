@@ -1,12 +1,60 @@
-import random
 import math
 import numpy as np
 from typing import Dict, List, Tuple
 
+from src.rolling import Lags
+
+
+# Day attributes reported for every simulated day
+REPORT_FIELDS = ('day', 'net_flow', 'price', 'ma_target', 'lower_target_cushion', 'upper_target_cushion', 'lower_target_wall', 'upper_target_wall', 'liq_usd', 'liq_ohm', 'k', 'reserves', 'prev_reserves', 'reserves_in', 'reserves_out', 'ohm_traded', 'treasury', 'supply', 'mcap', 'floating_supply', 'floating_mcap', 'liq_ratio', 'reserves_ratio', 'liq_fmcap_ratio', 'fmcap_treasury_ratio', 'cum_ohm_purchased', 'cum_ohm_burnt', 'cum_ohm_minted', 'bid_capacity', 'ask_capacity', 'bid_capacity_cushion', 'ask_capacity_cushion', 'bid_capacity_target_cushion', 'ask_capacity_target_cushion', 'bid_capacity_target', 'ask_capacity_target', 'control_ask', 'control_bid', 'market_demand', 'market_supply', 'total_net', 'gohm_volatility', 'reward_rate')
+
+# Reported fields that the dynamics never read. Day computes them on access, and a Simulation derives them in bulk over the
+# whole trajectory the first time a column is requested, so the day loop only does the work the next day needs.
+# Maps every derived field to the core fields it is computed from.
+DERIVED_FIELDS = {
+    'mcap': ('supply', 'price'),
+    'floating_mcap': ('floating_supply', 'price'),
+    'liq_ratio': ('liq_usd', 'treasury'),
+    'reserves_ratio': ('reserves', 'liq_usd'),
+    'liq_fmcap_ratio': ('liq_usd', 'floating_supply', 'price'),
+    'total_net': ('market_demand', 'market_supply'),
+}
+
+
+# Fields to store so that every requested field can be read: the requested core fields plus the inputs of the requested derived ones
+def core_fields(fields:Tuple[str, ...]) -> Tuple[str, ...]:
+    core = [field for field in fields if field not in DERIVED_FIELDS]
+    for field in fields:
+        for source in DERIVED_FIELDS.get(field, ()):
+            if source not in core:
+                core.append(source)
+    return tuple(core)
+
+
+# Derived field over a trajectory (or a batch of lanes). column(name) returns the array of another field.
+def derive_field(name:str, column) -> np.ndarray:
+    with np.errstate(all='ignore'):
+        if name == 'mcap':
+            return column('supply') * column('price')
+        elif name == 'floating_mcap':
+            return column('floating_supply') * column('price')
+        elif name == 'liq_ratio':
+            treasury = column('treasury')
+            return np.where(treasury != 0, column('liq_usd') / treasury, 0)
+        elif name == 'reserves_ratio':
+            liq_usd = column('liq_usd')
+            return np.where(liq_usd != 0, column('reserves') / liq_usd, 0)
+        elif name == 'liq_fmcap_ratio':
+            floating_mcap = derive_field('floating_mcap', column)
+            return np.where(floating_mcap != 0, column('liq_usd') / floating_mcap, 0)
+        elif name == 'total_net':
+            return column('market_demand') + column('market_supply')
+    raise KeyError(name)
 
 class ModelParams():
-    def __init__(self, seed:int, netflow_type:str, horizon:int, ask_factor:float, bid_factor:float, cushion_factor:float, target_ma:float, lower_wall:float, upper_wall:float, lower_cushion:float, upper_cushion:float, reinstate_window:int, min_counter_reinstate:int, min_premium_target:int, max_outflow_rate:float, supply_amplitude:int, reserve_change_speed:float, max_liq_ratio:float, cycle_reweights:float, release_capture:float, demand_factor:float, supply_factor:float, initial_supply:float, initial_reserves:float, initial_liq_usd:float, arb_factor:float, initial_price:float, initial_target:float, target_price_function:str, short_cycle:int, long_cycle:int, long_sin_offset:float, long_cos_offset:float, with_reinstate_window:str, with_dynamic_reward_rate:str):
+    def __init__(self, seed:int, netflow_type:str, horizon:int, ask_factor:float, bid_factor:float, cushion_factor:float, target_ma:float, lower_wall:float, upper_wall:float, lower_cushion:float, upper_cushion:float, reinstate_window:int, min_counter_reinstate:int, min_premium_target:int, max_outflow_rate:float, supply_amplitude:int, reserve_change_speed:float, max_liq_ratio:float, cycle_reweights:float, release_capture:float, demand_factor:float, supply_factor:float, initial_supply:float, initial_reserves:float, initial_liq_usd:float, arb_factor:float, initial_price:float, initial_target:float, target_price_function:str, short_cycle:int, long_cycle:int, long_sin_offset:float, long_cos_offset:float, with_reinstate_window:str, with_dynamic_reward_rate:str, random_stream:str='seedsequence'):
         self.seed = seed
+        self.random_stream = random_stream
         self.horizon = horizon
         self.cycle_reweights = cycle_reweights
         self.reserve_change_speed = reserve_change_speed
@@ -47,7 +95,16 @@ class ModelParams():
 
 
 class Day():
-    def __init__(self, params:ModelParams, prev_arbs:Dict[int, Tuple[float, float]], prev_lags=Dict[int, Tuple[int, Dict[int, float]]], prev_day=None, historical_net_flows=None):
+    __slots__ = ('day', 'supply', 'floating_supply', 'reward_rate', 'price', 'prev_price', 'liq_usd', 'liq_ohm', 'k',
+                 'reserves_in', 'reserves_out', 'release_capture', 'ohm_traded', 'cum_ohm_purchased', 'cum_ohm_burnt', 'cum_ohm_minted', 'reserves', 'prev_reserves',
+                 'ma_target', 'lower_target_wall', 'upper_target_wall', 'lower_target_cushion', 'upper_target_cushion', 'prev_lower_target_wall', 'prev_upper_target_wall',
+                 'bid_capacity_target', 'ask_capacity_target', 'bid_capacity_target_cushion', 'ask_capacity_target_cushion', 'bid_capacity', 'ask_capacity', 'bid_capacity_cushion', 'ask_capacity_cushion',
+                 'bid_change_cushion_usd', 'bid_change_cushion_ohm', 'bid_change_usd', 'bid_change_ohm', 'ask_change_cushion_usd', 'ask_change_cushion_ohm', 'ask_change_usd', 'ask_change_ohm',
+                 'market_demand', 'market_supply', 'arb_factor', 'arb_demand', 'arb_supply', 'unwind_demand', 'unwind_supply', 'net_flow',
+                 'treasury', 'fmcap_treasury_ratio', 'total_demand', 'total_supply',
+                 'control_ask', 'control_bid', 'gohm_volatility')
+
+    def __init__(self, params:ModelParams, lags:Lags, prev_day=None, historical_net_flows=None, draws=None, net_flow_shock:float=None):
         
         # Initialize variables for the first day
         if prev_day is None:
@@ -99,10 +156,9 @@ class Day():
             self.unwind_supply = 0
 
             self.net_flow = 0
-            prev_arbs[self.day] = (self.arb_demand, self.arb_supply)
-            
-            self.bid_counter = [0] * params.reinstate_window
-            self.ask_counter = [0] * params.reinstate_window
+
+            self.control_bid = 0
+            self.control_ask = 0
 
         else:
             self.day = prev_day.day + 1
@@ -150,7 +206,7 @@ class Day():
             # -- RBS PRICE ---------------------------------------------------------------------------------------
 
             # Price Target
-            self.ma_target = calc_price_target(params=params, prev_day=prev_day, prev_lags=prev_lags)
+            self.ma_target = calc_price_target(params=params, prev_day=prev_day, lags=lags)
             self.prev_price = prev_day.price
 
             # Walls
@@ -162,15 +218,8 @@ class Day():
             self.upper_target_cushion = self.ma_target * (1 + params.upper_cushion)
 
             # Reinstate Window --> Inside the range counters
-            if prev_day.price > prev_day.ma_target:
-                self.bid_counter = prev_day.bid_counter[1:] + [1]
-            else:
-                self.bid_counter = prev_day.bid_counter[1:] + [0]
-
-            if prev_day.price < prev_day.ma_target:
-                self.ask_counter = prev_day.ask_counter[1:] + [1]
-            else:
-                self.ask_counter = prev_day.ask_counter[1:] + [0]
+            self.control_bid = lags.bid_window.push(prev_day.price > prev_day.ma_target)
+            self.control_ask = lags.ask_window.push(prev_day.price < prev_day.ma_target)
 
 
             # -- MARKET BEHAVIOR (MODEL INPUT) ---------------------------------------------------------------------------------------
@@ -181,15 +230,21 @@ class Day():
                 self.market_supply = 0
 
             else:  # Random market behavior  -->  assuming 10% of sell pressure of the newly emited tokens after each rebase
-                self.net_flow = random.uniform(prev_day.treasury * prev_day.total_supply, prev_day.treasury * prev_day.total_demand) - (prev_day.supply * prev_day.reward_rate * prev_day.price / 10)
-                #self.net_flow = random.uniform(prev_day.treasury * prev_day.total_supply, prev_day.treasury * prev_day.total_demand)
+                # draws: (net flow, demand, supply) uniforms of the day from the simulation's MarketStream. a + (b - a) * u is what random.uniform(a, b) computes.
+                low = prev_day.treasury * prev_day.total_supply
+                high = prev_day.treasury * prev_day.total_demand
+                self.net_flow = (low + (high - low) * draws[0]) - (prev_day.supply * prev_day.reward_rate * prev_day.price / 10)
+                #self.net_flow = low + (high - low) * draws[0]
 
                 if params.netflow_type == 'waves':
                     self.market_demand = params.demand_factor * short_sin(self.day, params.short_cycle) * long_sin(self.day, params.long_cycle, params.long_sin_offset)
                     self.market_supply = params.supply_factor * short_cos(self.day, params.short_cycle) * long_cos(self.day, params.long_cycle, params.long_cos_offset, params.supply_amplitude)
                 else:
-                    self.market_demand = params.demand_factor * random.uniform(0.5, 3)
-                    self.market_supply = params.supply_factor * random.uniform(0.5, 3)
+                    self.market_demand = params.demand_factor * (0.5 + 2.5 * draws[1])
+                    self.market_supply = params.supply_factor * (0.5 + 2.5 * draws[2])
+
+            if net_flow_shock:  # what-if shocks (see src/fork.py): extra inflow (> 0) or outflow (< 0) on top of the market
+                self.net_flow = self.net_flow + net_flow_shock
 
 
             # -- TREASURY MARKET OPERATIONS ---------------------------------------------------------------------------------------
@@ -204,7 +259,7 @@ class Day():
             natural_price = self.k and ((self.net_flow - self.reserves_in + prev_day.liq_usd) ** 2) / self.k or 0  # Price without any treasury market operations
 
             # BID: Real Bid Capacity - Cushion
-            if (sum(self.bid_counter) >= params.min_counter_reinstate or params.with_reinstate_window == 'No') and natural_price > self.lower_target_cushion:  # Refill capacity
+            if (self.control_bid >= params.min_counter_reinstate or params.with_reinstate_window == 'No') and natural_price > self.lower_target_cushion:  # Refill capacity
                 self.bid_capacity_cushion = self.bid_capacity_target_cushion
             elif natural_price < self.lower_target_cushion and natural_price >= self.lower_target_wall:  # Deploy cushion capcity
                 self.bid_capacity_cushion = prev_day.bid_capacity_cushion + self.net_flow - self.reserves_in + prev_day.liq_usd - (self.k * self.lower_target_cushion) ** (1/2)
@@ -229,7 +284,7 @@ class Day():
                 self.bid_change_cushion_ohm = self.lower_target_cushion and prev_day.bid_capacity_cushion / self.lower_target_cushion or 0
 
             # BID: Real Bid Capacity - Totals
-            if (sum(self.bid_counter) >= params.min_counter_reinstate or params.with_reinstate_window == 'No') and natural_price > self.lower_target_cushion:  # Refill capacity
+            if (self.control_bid >= params.min_counter_reinstate or params.with_reinstate_window == 'No') and natural_price > self.lower_target_cushion:  # Refill capacity
                 self.bid_capacity = self.bid_capacity_target
             elif natural_price < self.lower_target_wall:  # Deploy cushion capcity
                 self.bid_capacity = prev_day.bid_capacity + self.net_flow - self.reserves_in + prev_day.liq_usd - (self.k * self.lower_target_wall) ** (1/2)
@@ -258,7 +313,7 @@ class Day():
 
 
             # ASK: Real Ask Capacity - Cushion
-            if (sum(self.ask_counter) >= params.min_counter_reinstate or params.with_reinstate_window == 'No') and natural_price < self.upper_target_cushion:
+            if (self.control_ask >= params.min_counter_reinstate or params.with_reinstate_window == 'No') and natural_price < self.upper_target_cushion:
                 self.ask_capacity_cushion = self.ask_capacity_target_cushion
             elif natural_price > self.upper_target_cushion and natural_price <= self.upper_target_wall:
                 self.ask_capacity_cushion = self.upper_target_cushion and prev_day.ask_capacity_cushion - (self.net_flow - self.reserves_in + prev_day.liq_usd) / self.upper_target_cushion + (self.k / self.upper_target_cushion) ** (1/2) or 0
@@ -283,7 +338,7 @@ class Day():
                 self.ask_change_cushion_usd = prev_day.ask_capacity_cushion * self.upper_target_cushion
                             
             # ASK: Real Ask Capacity - Totals
-            if (sum(self.ask_counter) >= params.min_counter_reinstate or params.with_reinstate_window == 'No') and natural_price < self.upper_target_cushion:
+            if (self.control_ask >= params.min_counter_reinstate or params.with_reinstate_window == 'No') and natural_price < self.upper_target_cushion:
                 self.ask_capacity = self.ask_capacity_target
             elif natural_price > self.upper_target_wall:
                 self.ask_capacity = self.upper_target_wall and prev_day.ask_capacity - (self.net_flow - self.reserves_in + prev_day.liq_usd) / self.upper_target_wall + (self.k / self.upper_target_wall) ** (1/2) or 0
@@ -338,25 +393,53 @@ class Day():
             self.supply = self.floating_supply + self.liq_ohm
 
         self.treasury = self.liq_usd + self.reserves
-        self.mcap = self.supply * self.price
-        self.floating_mcap = self.floating_supply * self.price
-
-        self.liq_ratio = self.treasury and self.liq_usd / self.treasury or 0
-        self.reserves_ratio = self.liq_usd and self.reserves / self.liq_usd or 0
-        self.fmcap_treasury_ratio = self.treasury and self.floating_mcap / self.treasury or 0
-        self.liq_fmcap_ratio = self.floating_mcap and self.liq_usd / self.floating_mcap or 0
+        self.fmcap_treasury_ratio = self.treasury and self.floating_supply * self.price / self.treasury or 0
 
         self.total_demand = self.market_demand  # + self.arb_demand
         self.total_supply = self.market_supply  # + self.arb_supply
-        self.total_net = self.total_demand + self.total_supply
 
-        self.control_ask = sum(self.ask_counter)
-        self.control_bid = sum(self.bid_counter)
+        lags.push(self.price, self.price * (1 + self.reward_rate))
+        self.gohm_volatility = calc_gohm_volatility(lags=lags)
+
+
+    # State of the day as plain values (what a snapshot stores), and the Day rebuilt from it
+    def state(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__ if hasattr(self, name)}
+
+    @classmethod
+    def from_state(cls, state:dict):
+        day = cls.__new__(cls)
+        for name, value in state.items():
+            setattr(day, name, value)
+        return day
+
+
+    # -- DERIVED REPORTING FIELDS (computed on access, see DERIVED_FIELDS) ---------------------------------------------------------------------------------------
+
+    @property
+    def mcap(self):
+        return self.supply * self.price
+
+    @property
+    def floating_mcap(self):
+        return self.floating_supply * self.price
 
-        prev_lags['price'][1][self.day] = self.price
-        prev_lags['target'][1][self.day] = self.ma_target
-        prev_lags['gohm price variation'][1][self.day] = self.price * (1 + self.reward_rate)        
-        self.gohm_volatility = calc_gohm_volatility(prev_lags=prev_lags)
+    @property
+    def liq_ratio(self):
+        return self.treasury and self.liq_usd / self.treasury or 0
+
+    @property
+    def reserves_ratio(self):
+        return self.liq_usd and self.reserves / self.liq_usd or 0
+
+    @property
+    def liq_fmcap_ratio(self):
+        floating_mcap = self.floating_mcap
+        return floating_mcap and self.liq_usd / floating_mcap or 0
+
+    @property
+    def total_net(self):
+        return self.total_demand + self.total_supply
 
 
 
@@ -402,60 +485,52 @@ def rr_framework(supply:int, with_dynamic_reward_rate:str, rr_controller:int, ve
                 return r
 
 
+# A price closing at 0 is absorbing: k only depends on the previous price (`prev_day.price and ... or 0`), so from the
+# next day on k, liq_ohm, the price and both market caps stay at 0 up to the horizon, whatever the flows.
+# Liquidity and reserves keep moving with the net flows. Accepts a Day or a BatchDay (True once every lane is absorbed).
+def is_absorbed(day) -> bool:
+    return bool(np.all(day.price == 0))
+
+
+# Rolling state for a simulation of these params
+def initial_lags(params:ModelParams):
+    price_window = int(params.target_ma) + 1
+    if params.target_price_function == 'price_cycle_avg':
+        price_window = max(price_window, int(params.short_cycle) + 2)
+    return Lags(params.target_ma, params.reinstate_window, params.initial_price, price_window=price_window)
+
+
 # Target price controller
-def calc_price_target(params:ModelParams, prev_day:Day, prev_lags:Dict[int, Tuple[int, Dict[int, float]]]):
+def calc_price_target(params:ModelParams, prev_day:Day, lags:Lags):
     if params.target_price_function == 'price_moving_avg':
-        s = 0
-        days = len(prev_lags['price'][1]) - 1
-        days_ma = int(params.target_ma)
-        if days > params.target_ma:
-            for i in range(days - days_ma, days):
-                s += prev_lags['price'][1][i+1]
-            return s / days_ma
-        elif days == 0:
+        if lags.prices.count == 1:
             return prev_day.ma_target
         else:
-            for i in range (0, days):
-                s += prev_lags['price'][1][i+1]
-            s += prev_lags['price'][1][1] * (params.target_ma - days)
-            return s / params.target_ma
-            
-    elif params.target_price_function == 'avg_lags':  # Deprecated
-        if prev_day.day % (params.short_cycle) == 0:
-            s = 0
-            lag_keys = set(prev_lags.keys()) - set(['price', 'target', 'natural', 'avg'])
-            for key in lag_keys:
-                days = prev_lags[key][1].keys()
-                s += prev_lags[key][1][max(days)]
-            avg_lag = s / len(lag_keys)
-            return (prev_day.natural_target + avg_lag) / 2
-        else:
-            return prev_day.ma_target
+            return lags.moving_average()
 
     elif params.target_price_function == 'price_cycle_avg':  # Deprecated
         if prev_day.day % (params.short_cycle) == 0:
-            s = 0
-            days = len(prev_lags['price'][1]) - 1
+            days = lags.prices.count - 1
             days_reweight = int(params.short_cycle)
             if days > params.short_cycle:
-                for i in range(days - days_reweight, days):
-                    s += prev_lags['price'][1][i]
-                return s / days_reweight
+                return lags.prices.sum(days_reweight, skip=2) / days_reweight
             else:
                  return prev_day.ma_target
         else:
             return prev_day.ma_target
 
+    else:
+        raise ValueError(f'Unknown target_price_function: {params.target_price_function}')
+
 
 # gOHM volatility
-def calc_gohm_volatility(prev_lags:Dict[int, Tuple[int, Dict[int, float]]]):
-    days = len(prev_lags['gohm price variation'][1]) - 1
-    data = list(prev_lags['gohm price variation'][1].values())
-    if days > 6:
-        if np.mean(data[-6:]) == 0:
+def calc_gohm_volatility(lags:Lags):
+    if lags.gohm_prices.count > 7:
+        mean = lags.gohm_prices.mean()
+        if mean == 0:
            return 0
         else:
-            return np.std(data[-6:])/np.mean(data[-6:])
+            return lags.gohm_prices.std() / mean
     else:
         return 0
 
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import os
+import random
+import time
+import numpy as np
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from src.utils import ModelParams
+from src.init_functions import initial_params
+from src.simulation import simulate, simulate_iter
+from src.batch import simulate_batch, simulate_batch_iter
+from src.reducers import AbsorbedDay, Objective, reduce_days, simulation_objective
+from src.handoff import SharedFrame, output_frame, output_nbytes
+
+if TYPE_CHECKING:  # annotations only, the code imports them lazily
+    import pandas as pd
+
+
+# What the processes of the pool import: the engine and numpy, nothing of the runner (sinks, ledgers, pipeline, command line).
+# src/sweep.py plans a sweep and hands its tasks over as (function of this module, SweepTrials, ...).
+
+# -- RESULT COLUMNS ---
+# Trial configuration columns of the summary table, in the order the trial sampler draws them
+TRIAL_COLUMNS = ('maxLiqRatio', 'askFactor', 'cushionFactor', 'wall', 'cushion', 'mintSyncPremium', 'withReinstateWindow', 'withDynamicRR')
+# absorbedDay: first day the price closed at 0 (absorbed up to the horizon, see src/reducers.py), 0 if it never did
+SUMMARY_COLUMNS = ('key', 'seed', 'value') + TRIAL_COLUMNS + ('absorbedDay',)
+
+# ModelParams set by each trial column (bids and asks, walls and cushions are symmetric)
+TRIAL_PARAMS = {
+    'maxLiqRatio': ('max_liq_ratio',),
+    'askFactor': ('ask_factor', 'bid_factor'),
+    'cushionFactor': ('cushion_factor',),
+    'wall': ('lower_wall', 'upper_wall'),
+    'cushion': ('lower_cushion', 'upper_cushion'),
+    'mintSyncPremium': ('min_premium_target',),
+    'withReinstateWindow': ('with_reinstate_window',),
+    'withDynamicRR': ('with_dynamic_reward_rate',),
+}
+
+# Daily variables table: column -> simulated field, or function of the trajectory columns
+DAILY_FIELDS = {
+    'day': 'day', 'netFlow': 'net_flow', 'price': 'price', 'realTarget': 'ma_target',
+    'lowerTargetCushion': 'lower_target_cushion', 'upperTargetCushion': 'upper_target_cushion', 'lowerTargetWall': 'lower_target_wall', 'upperTargetWall': 'upper_target_wall',
+    'liqUSD': 'liq_usd', 'liqOHM': 'liq_ohm', 'poolK': 'k', 'reservesUSD': 'reserves',
+    'reserveChange': lambda column: 100 * column('reserves') / column('prev_reserves'),
+    'reservesIN': 'reserves_in', 'reservesOUT': 'reserves_out', 'tradedOHM': 'ohm_traded', 'treasury': 'treasury', 'supply': 'supply', 'marketcap': 'mcap',
+    'floatingSupply': 'floating_supply', 'floatingMarketcap': 'floating_mcap', 'liqRatio_liqTreasury': 'liq_ratio',
+    'liqRatio_liqReserves': lambda column: column('liq_usd') / column('reserves'),
+    'reserveRatio': 'reserves_ratio', 'liqFloatingMCRatio': 'liq_fmcap_ratio', 'floatingMCTreasuryPremium': 'fmcap_treasury_ratio',
+    'cumPurchasedOHM': 'cum_ohm_purchased', 'cumBurntOHM': 'cum_ohm_burnt', 'bidCapacity': 'bid_capacity', 'askCapacity': 'ask_capacity',
+    'bidCapacityCushion': 'bid_capacity_cushion', 'askCapacityCushion': 'ask_capacity_cushion', 'bidCapacityTargetCushion': 'bid_capacity_target_cushion',
+    'askCapacityTargetCushion': 'ask_capacity_target_cushion', 'bidCapacityTarget': 'bid_capacity_target', 'askCapacityTarget': 'ask_capacity_target',
+    'askCount': 'control_ask', 'bidCount': 'control_bid', 'marketDemand': 'market_demand', 'marketSupply': 'market_supply', 'netTotal': 'total_net',
+    'gohm7dVolatility': 'gohm_volatility',
+}
+DAILY_COLUMNS = ('key',) + tuple(DAILY_FIELDS)
+
+
+# -- TRIALS ---
+# Enforced net flows, loaded once per worker process
+_NET_FLOWS = {}
+
+
+# The part of a sweep (src/sweep.py Sweep) that simulates trials: how the configuration of a (seed, trial) is picked, the fixed
+# ModelParams and the net flows. A Sweep hands a copy of it to the workers (Sweep.worker()), so they never import the runner.
+#  - sampling 'random': random.seed(seed * trial + trial) then one random.choice per grid column, as model_distributions did
+#  - sampling 'grid': trial i is the i-th combination of the grid values
+#  - sampling 'configs': trial i is configs[i], a tuple of TRIAL_COLUMNS values
+#  - sampling 'optuna': one study per seed (maximizing the objective) with len(trials) trials
+# Enforced net flows are replayed as flow i-1 on day i. netflow_offset delays them: the testnet script replayed flow 0 on
+# days 1 and 2 and flow i-2 on day i (netflow_offset 1), and its stored results need that offset to be reproduced.
+class SweepTrials():
+    def __init__(self, grid:Dict[str, list], configs:Dict[int, tuple], sampling:str, params:Dict[str, object], netflow_type:str='random',
+                 netflow_data:str=None, netflow_offset:int=0, key_format:str='{seed}_{trial}'):
+        self.grid = grid
+        self.sampling = sampling
+        self.configs = configs
+        self.params = params
+        self.netflow_type = netflow_type
+        self.netflow_data = netflow_data
+        self.netflow_offset = netflow_offset
+        self.key_format = key_format
+
+    # Values of the trial columns for a (seed, trial)
+    def trial_values(self, seed:int, trial:int) -> tuple:
+        if self.sampling == 'configs':
+            return self.configs[trial]
+        if self.sampling == 'grid':
+            values = []
+            for choices in reversed(list(self.grid.values())):
+                trial, i = divmod(trial, len(choices))
+                values.append(choices[i])
+            return tuple(reversed(values))
+        rng = random.Random(seed*trial + trial)
+        return tuple(rng.choice(choices) for choices in self.grid.values())
+
+    def key(self, seed:int, trial:int) -> str:
+        return self.key_format.format(seed=seed, trial=trial)
+
+    def net_flows(self) -> List[float]:
+        if self.netflow_type != 'enforced':
+            return None
+        if self.netflow_data not in _NET_FLOWS:
+            _NET_FLOWS[self.netflow_data] = initial_params(netflow_type=self.netflow_type, netflow_data=self.netflow_data)[1]
+        flows = _NET_FLOWS[self.netflow_data]
+        return flows[:1] * self.netflow_offset + flows[:len(flows) - self.netflow_offset]
+
+    def model_params(self, seed:int, values:tuple) -> ModelParams:
+        params = {**self.params, 'seed': seed, 'netflow_type': self.netflow_type}
+        for column, value in zip(TRIAL_COLUMNS, values):
+            for name in TRIAL_PARAMS[column]:
+                params[name] = value
+        return ModelParams(**params)
+
+    # Whether the trials of a seed can be stepped together by the batch engine
+    def batchable(self) -> bool:
+        return self.netflow_type in ('random', 'waves') and self.params['target_price_function'] == 'price_moving_avg'
+
+    # Summary rows (SUMMARY_COLUMNS) of some trials of a seed
+    def summary(self, seed:int, trials:List[int]) -> pd.DataFrame:
+        return output_frame(self.summary_columns(seed, trials))
+
+    # Summary rows as plain columns {column: values}, which a worker hands over without importing pandas
+    def summary_columns(self, seed:int, trials:List[int]) -> Dict[str, list]:
+        if self.sampling == 'optuna':
+            return self._optuna_summary(seed, len(trials))
+
+        values = [self.trial_values(seed, trial) for trial in trials]
+        params_list = [self.model_params(seed, trial_values) for trial_values in values]
+        if self.batchable():
+            reduced = reduce_days(simulate_batch_iter(params_list), [Objective(), AbsorbedDay()])
+            objective, absorbed = (np.broadcast_to(reduced[name], len(trials)) for name in ('objective', 'absorbed_day'))
+        else:
+            reduced = [reduce_days(simulate_iter(params, self.net_flows()), [Objective(), AbsorbedDay()]) for params in params_list]
+            objective, absorbed = ([trial[name] for trial in reduced] for name in ('objective', 'absorbed_day'))
+        return self._summary_columns(seed, trials, values, objective, absorbed)
+
+    # Daily rows of trials given by key and (seed, trial values), see src/sweep.py trial_configs(). shared: as a SharedFrame (see daily_rows).
+    def trial_daily(self, keys:List[str], configs:List[Tuple[int, tuple]], shared:bool=False):
+        return daily_rows(keys, self._simulate([self.model_params(seed, values) for seed, values in configs]), shared)
+
+    # Summary rows and daily rows of some trials of a seed, from a single simulation of every trial.
+    # shared: the worker form, summary rows as plain columns and daily rows as a SharedFrame.
+    def summary_and_daily(self, seed:int, trials:List[int], shared:bool=False) -> Dict[str, pd.DataFrame]:
+        if self.sampling == 'optuna':
+            raise ValueError('Optuna sweeps only produce summary rows: the study picks the trials while it runs')
+        values = [self.trial_values(seed, trial) for trial in trials]
+        simulations = self._simulate([self.model_params(seed, trial_values) for trial_values in values])
+        summary = self._summary_columns(seed, trials, values, [simulation_objective(simulation) for simulation in simulations],
+                                        [simulation.absorbed_day or 0 for simulation in simulations])
+        daily = daily_rows(summary['key'], simulations, shared)
+        return {'summary': summary if shared else output_frame(summary), 'daily': daily}
+
+    def _simulate(self, params_list:List[ModelParams]) -> list:
+        if self.batchable():
+            return simulate_batch(params_list)
+        return [simulate(params, self.net_flows()) for params in params_list]
+
+    def _summary_columns(self, seed:int, trials:List[int], values:List[tuple], objective, absorbed) -> Dict[str, list]:
+        columns = {'key': [self.key(seed, trial) for trial in trials], 'seed': np.full(len(trials), seed), 'value': np.asarray(objective, dtype=float)}
+        for i, column in enumerate(TRIAL_COLUMNS):
+            columns[column] = [trial_values[i] for trial_values in values]
+        columns['absorbedDay'] = np.asarray(absorbed, dtype=np.int64)
+        return columns
+
+    def _optuna_summary(self, seed:int, n_trials:int) -> Dict[str, list]:
+        import optuna  # only the optuna sweeps need it
+
+        def objective(trial):
+            values = tuple(_suggest(trial, column, choices) for column, choices in self.grid.items())
+            reduced = reduce_days(simulate_iter(self.model_params(seed, values), self.net_flows()), [Objective(), AbsorbedDay()])
+            trial.set_user_attr('absorbed_day', int(reduced['absorbed_day']))
+            return reduced['objective']
+
+        study = optuna.create_study(study_name=f'study{seed}', storage=f'sqlite:///study{seed}.db', direction='maximize')
+        study.optimize(objective, n_trials=n_trials)
+        values = [tuple(trial.params[column] for column in TRIAL_COLUMNS) for trial in study.trials]
+        return self._summary_columns(seed, [trial.number for trial in study.trials], values, [trial.value for trial in study.trials],
+                                     [trial.user_attrs.get('absorbed_day', 0) for trial in study.trials])
+
+
+# Optuna search space of a grid column: categorical for strings, stepped int or float ranges otherwise
+def _suggest(trial, column:str, choices:list):
+    if any(isinstance(choice, str) for choice in choices):
+        return trial.suggest_categorical(column, choices)
+    step = round(choices[1] - choices[0], 10) if len(choices) > 1 else 1
+    if all(isinstance(choice, int) for choice in choices):
+        return trial.suggest_int(column, choices[0], choices[-1], step=step)
+    return trial.suggest_float(column, choices[0], choices[-1], step=step)
+
+
+# Daily variables of one trial, built from whole trajectory columns
+def daily_frame(key:str, simulation) -> pd.DataFrame:
+    return daily_rows([key], [simulation])
+
+
+# Daily variables of several trials, written column by column into one block of rows: a DataFrame, or with shared=True
+# a SharedFrame that a worker hands to the runner through shared memory
+def daily_rows(keys:List[str], simulations:list, shared:bool=False):
+    rows = sum(simulation.days for simulation in simulations)
+    if shared:
+        block = SharedFrame(rows, {'key': 'int32', **{column: 'float64' for column in DAILY_FIELDS}}, {'key': [str(key) for key in keys]})
+        columns = {column: block.column(column) for column in DAILY_COLUMNS}
+    else:
+        block = None
+        columns = {'key': np.empty(rows, dtype=object), **{column: np.empty(rows) for column in DAILY_FIELDS}}
+
+    start = 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for i, (key, simulation) in enumerate(zip(keys, simulations)):
+            stop = start + simulation.days
+            columns['key'][start:stop] = i if shared else str(key)
+            for column, field in DAILY_FIELDS.items():
+                columns[column][start:stop] = simulation.column(field) if isinstance(field, str) else field(simulation.column)
+            start = stop
+    if shared:
+        return block
+    import pandas as pd  # workers hand rows over with shared=True and never get here
+    return pd.DataFrame(columns, copy=False)
+
+
+# -- TASKS ---
+# Worker jobs: they only use the engine, the rows are turned into frames by the runner (src/handoff.py output_frame)
+def summary_task(trials:SweepTrials, seed:int, trial_ids:List[int]) -> Dict[str, Dict[str, list]]:
+    return {'summary': trials.summary_columns(seed, trial_ids)}
+
+
+def daily_task(trials:SweepTrials, keys:List[str], configs:List[Tuple[int, tuple]]) -> Dict[str, SharedFrame]:
+    return {'daily': trials.trial_daily(keys, configs, shared=True)}
+
+
+def summary_and_daily_task(trials:SweepTrials, seed:int, trial_ids:List[int]) -> Dict[str, object]:
+    return trials.summary_and_daily(seed, trial_ids, shared=True)
+
+
+# Run a task function in a worker, timing it: (outputs, {pid, started, seconds, buffer_bytes of the output rows})
+def run_timed(function, *args):
+    started = time.time()
+    start = time.perf_counter()
+    outputs = function(*args)
+    stats = {'pid': os.getpid(), 'started': started, 'seconds': time.perf_counter() - start}
+    return outputs, {**stats, 'buffer_bytes': sum(output_nbytes(output) for output in outputs.values())}